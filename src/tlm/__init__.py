@@ -34,9 +34,14 @@ import os
 import sys
 
 from . import exceptionlogger
+from . import renderworker
 from . import towalinkmanager
 
 
+CONFDIR = '/etc/towalink'
+OPTIONS_WITH_ARGUMENT = ['-m', '-l', '--loglevel', '--workers', '--format']
+
+
 def usage():
     """Show information on command line arguments"""
     name = os.path.basename(sys.argv[0])
@@ -46,6 +51,13 @@ def usage():
     print('  -?, --help                        show program usage')
     print('  -l, --loglevel debug|info|error   set the level of debug information')
     print('                                    default: info')
+    print('  --pipeline                        commit: render, version and mirror nodes in overlapping stages')
+    print('  --resume                          commit: continue an interrupted commit')
+    print('  --workers <number>                commit: render node configs using the given number of worker processes')
+    print('  --force-mirror                    commit: mirror configs even to nodes known to be in sync')
+    print('  --activate                        commit: activate the latest config in the same transfer as mirroring')
+    print('  --format text|json|ndjson         list/show/query: output format (text or json); default: text')
+    print('                                    export: output format (ndjson or json); default: ndjson')
     print('  <operation>                       operation to execute on the entity, e.g. "show"')
     print('  <entity>                          entity on which the operation is performed')
     print('  <arguments...>                    additional arguments depending on entity and operation')
@@ -57,11 +69,19 @@ def usage():
     print('          %s show site <sitename>' % name)
     print('          %s show node <nodename>.<sitename>' % name)
     print('          %s show node <nodeid>' % name)
+    print('          %s query <predicate> [<predicate>...], e.g. "wg_mtu<1400" or "!attach_mgmt_address"' % name)
     print('          %s show_all site <sitename>' % name)
     print('          %s show_all node <nodename>.<sitename>' % name)
     print('          %s show_all node <nodeid>' % name)
+    print('          %s show select <selector>' % name)
+    print('          %s show select group:<group>,site:<pattern>,node:<pattern>,<attr>=<pattern>' % name)
+    print('          %s export [all|site <sitename>|select <selector>]' % name)
+    print('          %s --format json show node <nodename>.<sitename>' % name)
     print('          %s create site <sitename>' % name)
     print('          %s create node <nodename>.<sitename>' % name)
+    print('          %s import <inventory.yaml|inventory.csv>' % name)
+    print('          %s batch <file with one operation per line, e.g. "set node <nodeid> <attr> <value>">' % name)
+    print('          %s batch -   (reads the operations from stdin)' % name)
     print('          %s remove site <sitename>' % name)
     print('          %s remove node <nodename>.<sitename>' % name)
     print('          %s remove node <nodeid>' % name)
@@ -69,23 +89,34 @@ def usage():
     print('          %s set site <sitename> <attr> <value>' % name)
     print('          %s set node <nodename>.<sitename> <attr> <value>' % name)
     print('          %s set node <nodeid> <attr> <value>' % name)
+    print('          %s set select <selector> <attr> <value>' % name)
     print('          %s list changed' % name)
     print('          %s commit -m mymessage all' % name)
     print('          %s commit -m mymessage site <sitename>' % name)
     print('          %s commit -m mymessage node <nodename>.<sitename>' % name)
+    print('          %s commit -m mymessage select <selector>' % name)
+    print('          %s commit --pipeline -m mymessage all' % name)
+    print('          %s commit --resume' % name)
+    print('          %s commit --workers 4 all' % name)
+    print('          %s commit --force-mirror node <nodename>.<sitename>' % name)
+    print('          %s commit --activate -m mymessage site <sitename>' % name)
     print('          %s activate all' % name)
     print('          %s activate site <sitename> <version>' % name)
     print('          %s activate node <nodename>.<sitename> <version>' % name)
+    print('          %s activate select <selector> <version>' % name)
     print('          %s attach node <nodename>.<sitename>' % name)
     print('          %s ansible all <arguments...>' % name)
     print('          %s ansible site <sitename> <arguments...>' % name)
     print('          %s ansible node <nodename>.<sitename> <arguments...>' % name)
     print('          %s ansible node <nodeid> <arguments...>' % name)
+    print('          %s ansible select <selector> <arguments...>' % name)
     print('          %s ansible-playbook all <arguments...>' % name)
     print('          %s ansible-playbook site <sitename> <arguments...>' % name)
     print('          %s ansible-playbook node <nodename>.<sitename> <arguments...>' % name)
     print('          %s ansible-playbook node <nodeid> <arguments...>' % name)
+    print('          %s ansible-playbook select <selector> <arguments...>' % name)
     print('          %s git <git arguments...>' % name)
+    print('          %s render-worker <coordinator host>:<port> <token>' % name)
     print()
 
 def show_usage_and_exit(text = None):
@@ -96,6 +127,22 @@ def show_usage_and_exit(text = None):
     usage()
     sys.exit(2)
 
+def reorder_options(argv):
+    """Move the options given directly after the operation in front of it; options may also precede the operation
+
+    A lone "-" (e.g. stdin for "tlm batch -") is an argument and "--" ends the options.
+    """
+    def skip_options(i):
+        while (i < len(argv)) and argv[i].startswith('-') and (argv[i] not in ['-', '--']):
+            i += 2 if (argv[i] in OPTIONS_WITH_ARGUMENT) else 1
+        return i
+
+    op = skip_options(1)
+    if (op >= len(argv)) or (argv[op] in ['git', '-', '--']):
+        return argv
+    i = skip_options(op + 1)
+    return argv[:op] + argv[op + 1:i] + [ argv[op] ] + argv[i:]
+
 def parseopts():
     """Check and parse the command line arguments"""
 
@@ -136,6 +183,20 @@ def parseopts():
                 expected_args = 5
             if type == 'nodeany':
                 expected_args = -1
+        elif type in ['select', 'selectconf', 'selectversion', 'selectany']:
+            if len(args) < 3:
+                show_usage_and_exit('additional argument for specifying the node selector expected')
+            expected_args = 3
+            if type == 'selectversion':
+                if len(args) < 4:
+                    args.append('latest')
+                expected_args = 4
+            if type == 'selectconf':
+                if len(args) < 5:
+                    show_usage_and_exit('missing argument(s); attribute and value need to be specified')
+                expected_args = 5
+            if type == 'selectany':
+                expected_args = -1
         elif type == 'nodename':
             if len(args) < 3:
                 show_usage_and_exit('additional argument for specifying node expected')
@@ -165,23 +226,44 @@ def parseopts():
         else:
             raise ValueError('unsupported number of arguments')
 
-    # Workaround to convert "tlm commit -m message" into "tlm -m message commit" so that it can then be parsed regularly
-    if (len(sys.argv) > 3) and (sys.argv[2] == '-m'):
-        sys.argv = [ sys.argv[0], sys.argv[2], sys.argv[3], sys.argv[1] ] + sys.argv[4:]
+    # Workaround to convert "tlm commit -m message --pipeline all" into "tlm -m message --pipeline commit all" so that it can then be parsed regularly
+    sys.argv = reorder_options(sys.argv)
     # Parse arguments using "getopt"
     try:
-        opts, args = getopt.getopt(sys.argv[1:], 'm:l:?', ['help', 'loglevel='])
+        opts, args = getopt.getopt(sys.argv[1:], 'm:l:?', ['help', 'loglevel=', 'pipeline', 'resume', 'workers=', 'format=', 'force-mirror', 'activate'])
     except getopt.GetoptError as ex:
         # Print help information and exit
         show_usage_and_exit(ex) # will print something like "option -a not recognized"
     # Evaluate parsed arguments
     message = None
+    pipeline = False
+    resume = False
+    workers = 0
+    force_mirror = False
+    activate = False
+    output_format = None
     loglevel = logging.INFO
     for o, a in opts:
         if o in ('-?', '--help'):
             show_usage_and_exit()
         elif o == '-m':
             message = a
+        elif o == '--pipeline':
+            pipeline = True
+        elif o == '--resume':
+            resume = True
+        elif o == '--force-mirror':
+            force_mirror = True
+        elif o == '--activate':
+            activate = True
+        elif o == '--workers':
+            if not a.isnumeric():
+                show_usage_and_exit('number of render workers expected')
+            workers = int(a)
+        elif o == '--format':
+            if a not in ['text', 'json', 'ndjson']:
+                show_usage_and_exit('output format "text", "json" or "ndjson" expected')
+            output_format = a
         elif o in ('-l', '--loglevel'):
             a = a.lower()
             if a == 'debug':
@@ -199,21 +281,42 @@ def parseopts():
     if len(args) == 0:
         show_usage_and_exit('Welcome to Towalink!')
     operation = args[0]
-    if not operation in ['list', 'show', 'show-all', 'show_all', 'query', 'add', 'create', 'del', 'delete', 'remove', 'set', 'commit', 'activate', 'attach', 'ansible', 'ansible-playbook', 'ansible_playbook', 'git']:
+    if not operation in ['list', 'show', 'show-all', 'show_all', 'query', 'add', 'create', 'import', 'batch', 'export', 'del', 'delete', 'remove', 'set', 'commit', 'activate', 'attach', 'ansible', 'ansible-playbook', 'ansible_playbook', 'git', 'render-worker', 'render_worker']:
         show_usage_and_exit(f'provided operation [{operation}] is invalid')
     # Deal with synonyms    
-    if operation == 'query':
+    if (operation == 'query') and (len(args) > 1) and (args[1] in ['global', 'site', 'node', 'select']):
         operation = 'show'
     if operation == 'create':
         operation = 'add'
     if (operation == 'delete') or (operation == 'remove'):
         operation = 'del'
+    # Resuming a commit does not need an entity
+    if (operation == 'commit') and resume:
+        if len(args) > 1:
+            show_usage_and_exit('"tlm commit --resume" continues the interrupted commit; no entity expected')
+        args.append('resume')
+    elif resume:
+        show_usage_and_exit('"--resume" may only be provided for "tlm commit"')
+    # Batch operations are read from stdin unless a file is given
+    if (operation == 'batch') and (len(args) == 1):
+        args.append('-')
+    # Exports cover all nodes unless an entity is given
+    if (operation == 'export') and (len(args) == 1):
+        args.append('all')
     # Two arguments are obligatory
     if len(args) < 2:
         show_usage_and_exit('not enough arguments provided for this operation')
     # Evaluate operation
     if operation == 'git':
         method = 'git'
+    elif operation == 'import':
+        method = 'import_inventory'
+    elif operation == 'batch':
+        method = 'batch'
+    elif operation == 'query':
+        method = 'query'
+    elif operation in ['render-worker', 'render_worker']:
+        method = 'render_worker'
     else:  # case when three arguments are expected: <operation> <entity> [identifier]
         method = operation + '_' + args[1]
     entity_id = None
@@ -228,10 +331,18 @@ def parseopts():
         entity_id = expect_arg('site')
     elif method == 'show_node':
         entity_id = expect_arg('node')
+    elif method == 'show_select':
+        entity_id = expect_arg('select')
     elif (method == 'show-all_site') or (method == 'show_all_site'):
         entity_id = expect_arg('site')
     elif (method == 'show-all_node') or (method == 'show_all_node'):
         entity_id = expect_arg('node')
+    elif method == 'export_all':
+        expect_arg(None)
+    elif method == 'export_site':
+        entity_id = expect_arg('site')
+    elif method == 'export_select':
+        entity_id = expect_arg('select')
     elif method == 'add_site':
         entity_id = expect_arg('site')
     elif method == 'add_node':
@@ -246,6 +357,8 @@ def parseopts():
         entity_id, attr, value = expect_arg('siteconf')
     elif method == 'set_node':
         entity_id, attr, value = expect_arg('nodeconf')
+    elif method == 'set_select':
+        entity_id, attr, value = expect_arg('selectconf')
     elif method == 'list_changed':
         expect_arg(None)
     elif method == 'commit_all':
@@ -254,12 +367,18 @@ def parseopts():
         entity_id = expect_arg('site')
     elif method == 'commit_node':
         entity_id = expect_arg('node')
+    elif method == 'commit_select':
+        entity_id = expect_arg('select')
+    elif method == 'commit_resume':
+        expect_arg(None)
     elif method == 'activate_all':
         expect_arg(None)
     elif method == 'activate_site':
         entity_id, version = expect_arg('siteversion')
     elif method == 'activate_node':
         entity_id, version = expect_arg('nodeversion')
+    elif method == 'activate_select':
+        entity_id, version = expect_arg('selectversion')
     elif method == 'attach_node':
         entity_id = expect_arg('node')
     elif method == 'ansible_all':
@@ -268,15 +387,33 @@ def parseopts():
         _ = expect_arg('siteany')
     elif method == 'ansible_node':
         _ = expect_arg('nodeany')
+    elif method == 'ansible_select':
+        _ = expect_arg('selectany')
     elif (method == 'ansible-playbook_all') or (method == 'ansible_playbook_all'):
         _ = expect_arg('globalany')
     elif (method == 'ansible-playbook_site') or (method == 'ansible_playbook_site'):
         _ = expect_arg('siteany')
     elif (method == 'ansible-playbook_node') or (method == 'ansible_playbook_node'):
         _ = expect_arg('nodeany')
+    elif (method == 'ansible-playbook_select') or (method == 'ansible_playbook_select'):
+        _ = expect_arg('selectany')
     elif method == 'git':
         _ = expect_arg('globalany')
         arguments = args[1:]  # forward all git arguments
+    elif method == 'import_inventory':
+        if len(args) != 2:
+            show_usage_and_exit('exactly one inventory file expected')
+        arguments = args[1:]
+    elif method == 'query':
+        arguments = args[1:]  # all predicates need to be satisfied
+    elif method == 'batch':
+        if len(args) != 2:
+            show_usage_and_exit('at most one batch file expected')
+        arguments = args[1:]
+    elif method == 'render_worker':
+        if len(args) != 3:
+            show_usage_and_exit('coordinator address and token expected')
+        arguments = args[1:]
     else:
         show_usage_and_exit('the provided combination of operation and entity is not supported')
     method = method.replace('-', '_')  # dashes are not supported in method names in Python
@@ -286,16 +423,51 @@ def parseopts():
             kwarguments['message'] = message
         else:
             show_usage_and_exit('"-m" may only be provided for "tlm commit"')
-    return loglevel, method, arguments, kwarguments
+    if pipeline or (workers > 0):
+        if operation != 'commit':
+            show_usage_and_exit('"--pipeline" and "--workers" may only be provided for "tlm commit"')
+        if pipeline and (workers > 0):
+            show_usage_and_exit('"--pipeline" and "--workers" can\'t be combined')
+        if pipeline:
+            kwarguments['pipeline'] = True
+        else:
+            kwarguments['workers'] = workers
+    if force_mirror:
+        if operation != 'commit':
+            show_usage_and_exit('"--force-mirror" may only be provided for "tlm commit"')
+        kwarguments['force_mirror'] = True
+    if activate:
+        if operation != 'commit':
+            show_usage_and_exit('"--activate" may only be provided for "tlm commit"')
+        kwarguments['activate'] = True
+    if output_format is None:
+        output_format = 'ndjson' if (operation == 'export') else 'text'
+    elif operation == 'export':
+        if output_format == 'text':
+            show_usage_and_exit('"tlm export" supports the output formats "ndjson" and "json"')
+    elif operation in ['list', 'show', 'show-all', 'show_all', 'query']:
+        if output_format == 'ndjson':
+            show_usage_and_exit(f'"tlm {operation}" supports the output formats "text" and "json"')
+    elif output_format != 'text':
+        show_usage_and_exit('"--format" may only be provided for "tlm list", "tlm show", "tlm query" and "tlm export"')
+    return loglevel, method, arguments, kwarguments, output_format
 
 def main():
     """Main function"""
-    loglevel, method, method_args, method_kwargs = parseopts()
+    loglevel, method, method_args, method_kwargs, output_format = parseopts()
     logging.basicConfig(format='%(asctime)s %(levelname)s %(module)s: %(message)s', level=loglevel)  # use %(name)s instead of %(module) to include hierarchy information, see https://docs.python.org/2/library/logging.html
     logger = logging.getLogger(__name__)
-    tlm = towalinkmanager.TLM()
+    if method == 'render_worker':
+        # Render workers just need the config directory; they don't control the installation
+        address, token = method_args
+        exceptionlogger.call(renderworker.run_worker, CONFDIR, address, token, reraise_exceptions=True)
+        return
+    tlm = towalinkmanager.TLM(output_format=output_format)
     method = getattr(tlm, method)
-    exceptionlogger.call(method, *method_args, **method_kwargs, reraise_exceptions=True)
+    try:
+        exceptionlogger.call(method, *method_args, **method_kwargs, reraise_exceptions=True)
+    finally:
+        tlm.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+"""Class for allocating node addresses out of one or more network pools"""
+
+import ipaddress
+import logging
+
+
+logger = logging.getLogger(__name__)
+FIRST_INDEX = 11  # node identifiers (and thus addresses) smaller than eleven are reserved
+
+
+class AddressAllocator(object):
+    """Class for allocating node addresses out of one or more network pools
+
+    The pools form a contiguous sequence of usable host offsets (network and broadcast addresses are
+    skipped for IPv4). A node gets the address at the position of its node identifier in this sequence,
+    so that the first pool yields the same addresses as adding the node identifier to the network address.
+    Allocations are kept in an index (node identifier -> address and address -> node identifier) that is
+    persisted in the generated config, so that existing nodes keep their addresses if pools are added.
+    """
+
+    def __init__(self, name, pools, first_index=FIRST_INDEX):
+        """Object initialization"""
+        self.name = name
+        self.first_index = first_index
+        if isinstance(pools, str):
+            pools = [pools]
+        if len(pools) == 0:
+            raise ValueError(f'No network configured for [{name}]')
+        try:
+            self.networks = [ ipaddress.ip_network(str(pool), strict=True) for pool in pools ]
+        except ValueError as e:
+            raise ValueError(f'Invalid network configured for [{name}]: {e}')
+        for i, net in enumerate(self.networks):
+            if net.version != self.networks[0].version:
+                raise ValueError(f'Networks configured for [{name}] mix IPv4 and IPv6')
+            for other in self.networks[:i]:
+                if net.overlaps(other):
+                    raise ValueError(f'Networks [{net}] and [{other}] configured for [{name}] overlap')
+        self._by_node = dict()  # node identifier -> address (as integer)
+        self._by_address = dict()  # address (as integer) -> node identifier
+        self._next_free = first_index  # position from which to search for free addresses
+
+    @staticmethod
+    def get_usable_range(net):
+        """Returns the first and last usable host offset of the given network"""
+        if (net.version == 4) and (net.prefixlen < 31):
+            return 1, net.num_addresses - 2  # skip network and broadcast address
+        return 1, net.num_addresses - 1
+
+    def get_network(self, address):
+        """Returns the pool the given address (as integer) belongs to; None if it is outside the configured pools"""
+        for net in self.networks:
+            first, last = self.get_usable_range(net)
+            if int(net.network_address) + first <= address <= int(net.network_address) + last:
+                return net
+        return None
+
+    def get_address_at(self, position):
+        """Returns the address (as integer) at the given position of the sequence of usable addresses; None if beyond the pools"""
+        for net in self.networks:
+            first, last = self.get_usable_range(net)
+            if position <= last:
+                return int(net.network_address) + position
+            position -= last
+        return None
+
+    def load(self, index):
+        """Loads persisted allocations (dictionary node identifier -> address) that are within the configured pools"""
+        for node_id, address in index.items():
+            try:
+                address = int(ipaddress.ip_address(str(address)))
+            except ValueError:
+                continue
+            if (self.get_network(address) is None) or (address in self._by_address):
+                logger.info(f'Dropping allocation of address [{ipaddress.ip_address(address)}] for node [{node_id}] in [{self.name}]')
+                continue
+            self._by_node[int(node_id)] = address
+            self._by_address[address] = int(node_id)
+
+    def get_index(self):
+        """Returns the allocations as dictionary (node identifier -> address) to be persisted"""
+        return { node_id: str(ipaddress.ip_address(address)) for node_id, address in self._by_node.items() }
+
+    def find_free(self):
+        """Returns the first free address (as integer)"""
+        while True:
+            address = self.get_address_at(self._next_free)
+            if address is None:
+                raise ValueError(f'The networks configured for [{self.name}] are exhausted; please configure an additional network')
+            self._next_free += 1
+            if address not in self._by_address:
+                return address
+
+    def allocate(self, node_id):
+        """Allocates an address for the given node (if not done yet); returns the address (as integer)"""
+        address = self._by_node.get(node_id)
+        if address is not None:
+            return address
+        address = self.get_address_at(node_id)
+        if address is None:
+            raise ValueError(f'Node identifier [{node_id}] does not fit into the networks configured for [{self.name}]; please configure an additional network')
+        if address in self._by_address:
+            address = self.find_free()
+            logger.warning(f'Address designated for node [{node_id}] in [{self.name}] is in use; allocated [{ipaddress.ip_address(address)}] instead')
+        self._by_node[node_id] = address
+        self._by_address[address] = node_id
+        return address
+
+    def release(self, node_id):
+        """Releases the address allocated for the given node"""
+        address = self._by_node.pop(node_id, None)
+        if address is not None:
+            del self._by_address[address]
+
+    def get(self, node_id):
+        """Returns a tuple of pool network and host offset of the address of the given node (allocating it if needed)"""
+        address = self.allocate(node_id)
+        net = self.get_network(address)
+        return net, address - int(net.network_address)
+
+    def get_node(self, address):
+        """Returns the node the given address is allocated to; None if not allocated"""
+        return self._by_address.get(int(ipaddress.ip_address(address)))
@@ -20,10 +20,10 @@ import subprocess
 logger = logging.getLogger(__name__)
 
 
-def execute(command):
-    """Executes the given command interactively"""
+def execute(command, env=None):
+    """Executes the given command interactively (env: environment variables for the command; None to inherit them)"""
     logger.debug(f'Executing [{command}]')
-    subprocess.check_call(shlex.split(command))
+    subprocess.check_call(shlex.split(command), env=env)
 
 def provision_node(node_fullname, address):
     """Calls the Ansible node provisioning for the given address"""
@@ -58,7 +58,7 @@ def provision_node(node_fullname, address):
     #print('Ansible result', result) # ***
     #return result
 
-def exec_ansible_fornodes(nodes, *ansible_args, playbook=False):
+def exec_ansible_fornodes(nodes, *ansible_args, playbook=False, env=None):
     """Executes ansible or ansible-playbook for the given dictionary of nodes (fullname->mgmt_address)"""
     nodes_in = {k: v for k, v in nodes.items() if v is not None}
     nodes_out = {k: v for k, v in nodes.items() if v is None}
@@ -69,7 +69,7 @@ def exec_ansible_fornodes(nodes, *ansible_args, playbook=False):
     addresses = ','.join(nodes_in.values())
     command = f'{command} -i "{addresses}," ' + ' '.join(ansible_args)
     try:
-        execute(command)
+        execute(command, env=env)
         return 0
     except subprocess.CalledProcessError as e:
         logger.warning(f'Calling Ansible returned with non-zero return code [{e.returncode}: {str(e)}]')
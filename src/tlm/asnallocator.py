@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+"""Class for allocating the BGP autonomous system numbers of nodes"""
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+ASN_BASE = 65000  # default base of the 2-byte private range 64512-65534
+ASN_MAX_2BYTE = 65534
+ASN_BASE_4BYTE = 4200000000  # start of the 4-byte private range 4200000000-4294967294
+ASN_MAX_4BYTE = 4294967294
+
+
+class ASNAllocator(object):
+    """Class for allocating the BGP autonomous system numbers of nodes
+
+    Node x gets (base + x) as long as this stays within the range of the base (2-byte private range for
+    the default base), i.e. existing installations keep their numbers. Nodes beyond that get numbers
+    from the 4-byte private range. The numbers are kept in a lookup table computed once per run.
+    """
+
+    def __init__(self, base=ASN_BASE):
+        """Object initialization"""
+        self.base = int(base)
+        self._asns = dict()  # node identifier -> autonomous system number
+
+    def compute(self, node_id):
+        """Computes the autonomous system number of the given node"""
+        limit = ASN_MAX_2BYTE if (self.base <= ASN_MAX_2BYTE) else ASN_MAX_4BYTE
+        if self.base + node_id <= limit:
+            return self.base + node_id
+        if ASN_BASE_4BYTE + node_id <= ASN_MAX_4BYTE:
+            return ASN_BASE_4BYTE + node_id
+        raise ValueError(f'No autonomous system number available for node [{node_id}]')
+
+    def allocate_all(self, node_ids):
+        """Fills the lookup table for the given nodes"""
+        self._asns = { node_id: self.compute(node_id) for node_id in node_ids }
+
+    def get(self, node_id):
+        """Returns the autonomous system number of the given node"""
+        asn = self._asns.get(node_id)
+        if asn is None:
+            asn = self._asns[node_id] = self.compute(node_id)
+        return asn
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+"""Class for recording the progress of a commit so that an interrupted commit can be resumed"""
+
+import collections
+import contextlib
+import json
+import logging
+import os
+import threading
+
+
+logger = logging.getLogger(__name__)
+JOURNAL_FILENAME = 'commit_journal'
+STAGE_RENDERED = 'rendered'
+STAGE_VERSIONED = 'versioned'
+STAGE_COMMITTED = 'committed'
+STAGE_MIRRORED = 'mirrored'
+
+
+class CommitJournal(object):
+    """Class for recording the progress of a commit so that an interrupted commit can be resumed
+
+    The journal is a file with one JSON record per line. The first record describes the commit
+    (nodes, hash of the generated config, message), each further record marks a node as having
+    passed a stage. Records are appended and flushed immediately, so that the journal survives
+    interruptions at any point.
+    """
+
+    def __init__(self, path):
+        """Object initialization"""
+        self.filename = os.path.join(path, JOURNAL_FILENAME)
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Resets the journal data held in memory"""
+        self.node_ids = list()
+        self.generated_hash = None
+        self.message = None
+        self.stages = collections.defaultdict(set)  # node_id -> set of stages passed
+        self.changed = set()  # identifiers of nodes for which a new version was created
+        self.committed = False
+
+    def exists(self):
+        """Checks whether there is a journal of an unfinished commit"""
+        return os.path.isfile(self.filename)
+
+    def load(self):
+        """Loads the journal of an unfinished commit; returns False if there is none"""
+        self.clear()
+        try:
+            with open(self.filename, 'r') as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return False
+        for i, line in enumerate(lines):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning(f'Ignoring incomplete record in line {i+1} of commit journal')  # e.g. interrupted while writing
+                continue
+            if i == 0:
+                self.node_ids = record.get('nodes', list())
+                self.generated_hash = record.get('generated_hash')
+                self.message = record.get('message')
+            else:
+                self.apply(record)
+        return True
+
+    def apply(self, record):
+        """Applies a journal record to the data held in memory"""
+        stage = record.get('stage')
+        node_id = record.get('node')
+        if stage == STAGE_COMMITTED:
+            self.committed = True
+        elif node_id is not None:
+            self.stages[node_id].add(stage)
+            if record.get('changed'):
+                self.changed.add(node_id)
+
+    def start(self, node_ids, generated_hash, message=None):
+        """Starts a new journal for a commit of the given nodes"""
+        self.clear()
+        self.node_ids = list(node_ids)
+        self.generated_hash = generated_hash
+        self.message = message
+        with open(self.filename, 'w') as f:
+            f.write(json.dumps({'nodes': self.node_ids, 'generated_hash': generated_hash, 'message': message}) + '\n')
+
+    def record(self, node_id, stage, **kwargs):
+        """Records that the given node passed the given stage"""
+        record = dict(kwargs, node=node_id, stage=stage)
+        with self.lock:
+            self.apply(record)
+            with open(self.filename, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+    def has_passed(self, node_id, stage):
+        """Checks whether the given node already passed the given stage"""
+        return stage in self.stages.get(node_id, set())
+
+    def forget(self, node_id, stage):
+        """Forgets that the given node passed the given stage (e.g. since its output got lost)"""
+        self.stages[node_id].discard(stage)
+
+    def get_pending(self, stage):
+        """Returns the identifiers of the nodes that did not pass the given stage yet"""
+        return [ node_id for node_id in self.node_ids if not self.has_passed(node_id, stage) ]
+
+    def finish(self):
+        """Removes the journal after the commit has been completed"""
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.filename)
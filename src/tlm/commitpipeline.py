@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+"""Class for committing node configs in a pipeline of overlapping stages"""
+
+import logging
+import queue
+import threading
+
+from . import commitjournal
+from . import gitcaller
+
+
+logger = logging.getLogger(__name__)
+QUEUE_SIZE = 32  # maximum number of nodes waiting in front of a stage
+RENDER_WORKERS = 1  # rendering is CPU-bound; more threads don't help due to the GIL
+VERSION_WORKERS = 1
+MIRROR_WORKERS = 4
+
+
+class CommitPipeline(object):
+    """Class for committing node configs in a pipeline of overlapping stages
+
+    Each node passes the stages render -> compare/version -> mirror on its own. The stages are linked
+    by bounded queues and served by pools of worker threads, so that mirroring of the first nodes
+    overlaps with rendering of later ones. The git commit is done once the last node has been versioned.
+    Node objects are just accessed by the render stage (which may release them in streaming mode); the
+    data needed for mirroring is passed on from there.
+    """
+
+    def __init__(self, co, confdir, message=None, journal=None, render_workers=RENDER_WORKERS, version_workers=VERSION_WORKERS, mirror_workers=MIRROR_WORKERS, queue_size=QUEUE_SIZE, force_mirror=False, activate=False):
+        """Object initialization"""
+        self.co = co  # instance of ConfigOrchestrator
+        self.confdir = confdir
+        self.message = message
+        self.journal = journal  # instance of CommitJournal for recording progress (optional)
+        self.queue_size = queue_size
+        self.force_mirror = force_mirror  # mirror even nodes known to be in sync
+        self.activate = activate  # activate the latest config version along with mirroring
+        self.stages = [ ('render', self.stage_render, render_workers),
+                        ('version', self.stage_version, version_workers),
+                        ('mirror', self.stage_mirror, mirror_workers) ]
+        self.lock = threading.Lock()
+        self.changed = set()  # identifiers of the nodes with a new config version
+        self.mgmt_targets = dict()  # node_id -> (full name, management address) for the mirror stage
+        self.engine = None  # transfer engine of the mirror stage
+        self.failed = dict()  # node_id -> (stage name, exception) of nodes that did not pass all stages
+
+    def has_passed(self, node_id, stage):
+        """Checks whether the journal states that the given node already passed the given stage"""
+        return (self.journal is not None) and self.journal.has_passed(node_id, stage)
+
+    def record(self, node_id, stage, **kwargs):
+        """Records in the journal that the given node passed the given stage"""
+        if self.journal is not None:
+            self.journal.record(node_id, stage, **kwargs)
+
+    def stage_render(self, node_id):
+        """Renders the config of the given node"""
+        mgmt_target = self.co.get_mgmt_target(node_id)  # before the node may be released by rendering
+        with self.lock:
+            self.mgmt_targets[node_id] = mgmt_target
+        if not self.has_passed(node_id, commitjournal.STAGE_RENDERED):
+            self.co.update_node(node_id)
+            self.record(node_id, commitjournal.STAGE_RENDERED)
+        return True
+
+    def stage_version(self, node_id):
+        """Compares the rendered config of the given node with its latest version and stores it as new version if changed"""
+        if self.has_passed(node_id, commitjournal.STAGE_VERSIONED):
+            changed = node_id in self.journal.changed
+        else:
+            changed = self.co.process_new_configversion(node_id)
+            self.record(node_id, commitjournal.STAGE_VERSIONED, changed=changed)
+        if changed:
+            with self.lock:
+                self.changed.add(node_id)
+        return True
+
+    def mirror(self, node_id):
+        """Transfer function of the mirror stage"""
+        with self.lock:
+            mgmt_target = self.mgmt_targets.pop(node_id)
+        return self.co.mirror_node(node_id, self.engine.timeout, force=self.force_mirror, activate=self.activate, mgmt_target=mgmt_target)
+
+    def stage_mirror(self, node_id):
+        """Mirrors the config versions of the given node to the node device"""
+        if not self.has_passed(node_id, commitjournal.STAGE_MIRRORED):
+            result = self.engine.transfer(self.mirror, node_id)
+            if result.failed:
+                raise ValueError(f'mirroring failed: {result.status}' + ('' if (result.message is None) else f' ({result.message})'))
+            self.record(node_id, commitjournal.STAGE_MIRRORED)
+        return True
+
+    def stages_done_version(self):
+        """Called once all nodes passed the version stage"""
+        if (len(self.changed) > 0) and not ((self.journal is not None) and self.journal.committed):
+            gitcaller.Git.call_git_commit(self.confdir, self.message)
+            self.record(None, commitjournal.STAGE_COMMITTED)
+
+    def stages_done_mirror(self):
+        """Called once all nodes passed the mirror stage"""
+        self.co.mirror_state.save()
+
+    def worker(self, name, func, inqueue, outqueue):
+        """Processes nodes from the input queue and passes the successfully processed ones to the output queue"""
+        while True:
+            node_id = inqueue.get()
+            if node_id is None:  # end of input
+                break
+            try:
+                func(node_id)
+            except Exception as e:
+                logger.error(f'Commit stage [{name}] failed for node [{node_id}]: [{e}]')
+                with self.lock:
+                    self.failed[node_id] = (name, e)
+                continue
+            if outqueue is not None:
+                outqueue.put(node_id)
+
+    def closer(self, name, threads, outqueue, num_next_workers):
+        """Waits for the workers of a stage to finish and signals the end of input to the next stage"""
+        for thread in threads:
+            thread.join()
+        callback = getattr(self, f'stages_done_{name}', None)
+        if callback is not None:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f'Finishing commit stage [{name}] failed: [{e}]')
+        if outqueue is not None:
+            for i in range(num_next_workers):
+                outqueue.put(None)
+
+    def run(self, node_ids):
+        """Runs the given nodes through all stages; returns the dictionaries of changed and of failed nodes"""
+        queues = [ queue.Queue(maxsize=self.queue_size) for stage in self.stages ]
+        self.engine = self.co.transfer_engine  # transfers of the mirror stage use the pool of mirror workers
+        closers = list()
+        for i, (name, func, num_workers) in enumerate(self.stages):
+            inqueue = queues[i]
+            outqueue = queues[i+1] if (i + 1 < len(self.stages)) else None
+            num_next_workers = self.stages[i+1][2] if (outqueue is not None) else 0
+            threads = [ threading.Thread(target=self.worker, args=(name, func, inqueue, outqueue), name=f'commit-{name}-{j}', daemon=True) for j in range(num_workers) ]
+            for thread in threads:
+                thread.start()
+            closer = threading.Thread(target=self.closer, args=(name, threads, outqueue, num_next_workers), name=f'commit-{name}-closer', daemon=True)
+            closer.start()
+            closers.append(closer)
+        # Feed the first stage; blocks while the pipeline is full
+        for node_id in node_ids:
+            queues[0].put(node_id)
+        for i in range(self.stages[0][2]):
+            queues[0].put(None)
+        for closer in closers:
+            closer.join()
+        return { node_id: self.co.cm.nodes[node_id] for node_id in sorted(self.changed) }, self.failed
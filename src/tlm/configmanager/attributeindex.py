@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+"""Class for a columnar index of the attributes of the complete node configs"""
+
+import array
+import bisect
+import fnmatch
+import logging
+import re
+
+
+logger = logging.getLogger(__name__)
+PREDICATE_REGEX = re.compile(r'^\s*(!?)\s*([^!=<>\s]+)\s*(?:(!=|<=|>=|=|<|>)\s*(.*?))?\s*$')
+
+
+def parse_predicate(predicate):
+    """Returns a tuple of attribute, operator and value for the given predicate
+
+    Supported are "<attr>=<pattern>", "<attr>!=<pattern>" (patterns may contain shell-style wildcards),
+    "<attr><<value>", "<attr><=<value>", "<attr>><value>", "<attr>>=<value>" (compared numerically if possible)
+    as well as "<attr>" (attribute is set; operator None) and "!<attr>" (attribute is not set; operator "!").
+    """
+    match = PREDICATE_REGEX.match(str(predicate))
+    if match is None:
+        raise ValueError(f'Invalid predicate [{predicate}]; expected e.g. "<attr>=<value>", "<attr><<value>", "<attr>" or "!<attr>"')
+    negation, attr, operator, value = match.groups()
+    if negation:
+        if operator is not None:
+            raise ValueError(f'Invalid predicate [{predicate}]; "!" can just be used for checking that an attribute is not set')
+        return attr, '!', None
+    return attr, operator, value
+
+def format_value(value):
+    """Returns the given attribute value as string for matching it against a pattern"""
+    if isinstance(value, bool):
+        return str(value).lower()  # as written in TOML
+    return str(value)
+
+def compare(value, operator, operand):
+    """Returns whether the given (set) attribute value satisfies the given comparison"""
+    if isinstance(value, (list, tuple)):
+        return any([ compare(item, operator, operand) for item in value ])
+    if operator == '=':
+        return fnmatch.fnmatchcase(format_value(value), operand)
+    try:
+        value, operand = float(value), float(operand)
+    except (TypeError, ValueError):
+        value = format_value(value)
+    if operator == '<':
+        return value < operand
+    if operator == '<=':
+        return value <= operand
+    if operator == '>':
+        return value > operand
+    if operator == '>=':
+        return value >= operand
+    raise ValueError(f'Unsupported operator [{operator}]')
+
+
+class AttributeIndex(object):
+    """Class for a columnar index of the attributes of the complete node configs
+
+    The index holds the node identifiers as one column and a column per attribute with the attribute's
+    value for each node (None if not set). It is built once from the complete configs of the loaded nodes
+    so that predicates are evaluated by scanning just the columns of the attributes they refer to.
+    """
+
+    def __init__(self, nodes):
+        """Object initialization (nodes is a dictionary node identifier -> NodeConfig)"""
+        self.node_ids = array.array('I', sorted(nodes.keys()))
+        self.columns = dict()  # attribute -> list of values (one per node)
+        for row, node_id in enumerate(self.node_ids):
+            for attr, value in nodes[node_id].complete_cfg.items():
+                column = self.columns.get(attr)
+                if column is None:
+                    column = self.columns[attr] = [None] * len(self.node_ids)
+                column[row] = value
+        logger.debug(f'Attribute index of [{len(self.node_ids)}] nodes with [{len(self.columns)}] attributes built')
+
+    def get_value(self, node_id, attr):
+        """Returns the value of the given attribute of the given node (None if not set)"""
+        column = self.columns.get(attr)
+        if column is None:
+            return None
+        row = self.get_row(node_id)
+        return None if (row is None) else column[row]
+
+    def get_row(self, node_id):
+        """Returns the row of the given node (None if not indexed)"""
+        row = bisect.bisect_left(self.node_ids, node_id)  # the node identifiers are sorted
+        if (row < len(self.node_ids)) and (self.node_ids[row] == node_id):
+            return row
+        return None
+
+    def match_rows(self, attr, operator, value, rows=None):
+        """Returns the list of rows (all rows or just the given ones) satisfying the given predicate"""
+        if rows is None:
+            rows = range(len(self.node_ids))
+        column = self.columns.get(attr)
+        if column is None:  # attribute not set for any node
+            return list(rows) if (operator in ['!', '!=']) else list()
+        if operator is None:
+            return [ row for row in rows if column[row] is not None ]
+        if operator == '!':
+            return [ row for row in rows if column[row] is None ]
+        if operator == '!=':
+            return [ row for row in rows if (column[row] is None) or not compare(column[row], '=', value) ]
+        return [ row for row in rows if (column[row] is not None) and compare(column[row], operator, value) ]
+
+    def filter(self, node_ids, attr, operator, value):
+        """Returns the set of the given node identifiers whose nodes satisfy the given predicate"""
+        rows = [ row for row in map(self.get_row, node_ids) if row is not None ]
+        return { self.node_ids[row] for row in self.match_rows(attr, operator, value, rows) }
+
+    def query(self, predicates):
+        """Returns the sorted list of identifiers of the nodes satisfying all given predicates (as returned by "parse_predicate")"""
+        rows = None
+        for attr, operator, value in predicates:
+            rows = self.match_rows(attr, operator, value, rows)
+        if rows is None:
+            rows = range(len(self.node_ids))
+        return [ self.node_ids[row] for row in rows ]
@@ -9,8 +9,12 @@ import os
 import shutil
 import socket
 
+from . import attributeindex
 from . import generatedconfig
+from . import linktable
 from . import nodeconfig
+from . import nodeidallocator
+from . import nodeselector
 from . import siteconfig
 from . import tomlconfighierarchy
 
@@ -21,6 +25,10 @@ NODE_DIR_PREFIX = 'node_'
 SITE_DIR_PREFIX = 'site_'
 CONFNAME = 'config.toml' # name of the config file
 WG_MTU_DEFAULT = 1420
+BGP_TOPOLOGY_MESH = 'mesh'  # BGP sessions between all nodes sharing a group
+BGP_TOPOLOGY_ROUTE_REFLECTOR = 'route_reflector'  # BGP sessions just between the hubs of a group and its other nodes
+SITE_TOPOLOGY_MESH = 'mesh'  # links between all nodes
+SITE_TOPOLOGY_GATEWAY = 'gateway'  # links between all nodes of a site and between the gateway nodes of the sites
 
 
 class ConfigManager():
@@ -30,6 +38,9 @@ class ConfigManager():
     def __init__(self, confdir='/etc/towalink'):
         """Constructor"""
         self.confdir = confdir
+        self.batch = False  # whether saving changes and creating/removing directories is deferred until the end of a batch
+        self._pending_removals = list()  # directories to be removed at the end of the batch
+        self._pending_creations = list()  # directories to be created at the end of the batch
         self.load_all()
         self.set_defaults()
 
@@ -55,10 +66,25 @@ class ConfigManager():
                 site_nodes.append(node)
             # Remember site object
             self.sites[site_dir[len(SITE_DIR_PREFIX):]] = siteconfig.SiteConfig(site_dir_abs, site_nodes)
+        self.globalconf.set_children(list(self.sites.values()))  # site configs inherit from the global config
         self.generated = generatedconfig.GeneratedConfig(os.path.join(self.confdir, self.generated_dir))
+        self._nodeids = None
+        self._selector = None
+        self._attribute_index = None
 
-    def save_all(self):
-        """Saves all the changed config"""
+    @property
+    def nodeids(self):
+        """Returns the allocator of node identifiers (built from the loaded nodes on first access)"""
+        if self._nodeids is None:
+            self._nodeids = nodeidallocator.NodeIdAllocator(self.nodes.keys())
+        return self._nodeids
+
+    def save_all(self, atomic=False):
+        """Saves all the changed config (all changed files are written to temporary files first and then replace the config files if atomic=True)"""
+        if atomic:
+            self.save_all_atomic()
+            return
+        self.globalconf.save_config()
         num_sites = 0
         for site in self.sites.values():
             if site.save_config():
@@ -72,24 +98,135 @@ class ConfigManager():
         if self.generated.save_config():
             logger.info(f'Generated config saved due to change')
 
-    def update_generated_config(self):
-        """Make sure that the automatically generated config is current"""
+    def save_all_atomic(self):
+        """Saves all the changed config files in one step; if writing any of them fails, none is changed"""
+        staged = list()
+        try:
+            for confobj in [self.globalconf] + list(self.sites.values()) + list(self.nodes.values()) + [self.generated]:
+                tmpname = confobj.stage_config()
+                if tmpname is not None:
+                    staged.append((confobj, tmpname))
+        except OSError:
+            for confobj, tmpname in staged:
+                os.remove(tmpname)
+            raise
+        for confobj, tmpname in staged:
+            confobj.commit_staged_config(tmpname)
+        if len(staged) > 0:
+            logger.info(f'[{len(staged)}] changed config files saved')
+
+    def begin_batch(self):
+        """Defers saving changed configs and creating/removing sites and nodes until "end_batch" is called"""
+        self.batch = True
+        self._pending_removals = list()
+        self._pending_creations = list()
+
+    def end_batch(self):
+        """Removes the directories of deleted sites and nodes, creates the ones of added sites and nodes and saves all changes made since "begin_batch" in one step"""
+        for path in self._pending_removals:
+            shutil.rmtree(path, ignore_errors=True)
+        for path in self._pending_creations:
+            os.makedirs(path, exist_ok=True)
+        self._pending_removals = list()
+        self._pending_creations = list()
+        self.save_all(atomic=True)
+        self.batch = False
+
+    def exists(self, path):
+        """Checks whether the given site or node directory exists (considering the pending changes of a batch)"""
+        if path in self._pending_creations:
+            return True
+        if any([ (path == removed) or path.startswith(removed + os.sep) for removed in self._pending_removals ]):
+            return False
+        return os.path.exists(path)
+
+    def create_dir(self, path):
+        """Creates the given site or node directory (deferred until the end of a batch)"""
+        if self.batch:
+            self._pending_creations.append(path)
+        else:
+            os.makedirs(path)
+
+    def remove_dir(self, path):
+        """Removes the given site or node directory (deferred until the end of a batch)"""
+        if self.batch:
+            self._pending_creations = [ created for created in self._pending_creations if not ((created == path) or created.startswith(path + os.sep)) ]
+            self._pending_removals.append(path)
+        else:
+            shutil.rmtree(path)
+
+    def get_hubs(self, records):
+        """Returns a dictionary group -> set of identifiers of its hub nodes (the ones flagged as route reflector or else the one with the lowest identifier)"""
+        hubs = collections.defaultdict(set)
+        candidates = dict()
+        for node_key, node in records:
+            for group in node.groups:
+                if node.route_reflector:
+                    hubs[group].add(node_key)
+                elif (group not in candidates) or (node_key < candidates[group]):
+                    candidates[group] = node_key
+        for group, node_key in candidates.items():
+            if group not in hubs:
+                hubs[group].add(node_key)
+        return hubs
+
+    def get_site_gateways(self, records):
+        """Returns the set of identifiers of the site gateway nodes (the ones flagged as site gateway or else the one with the lowest identifier of each site)"""
+        gateways = set()
+        flagged_sites = set()
+        candidates = dict()
+        for node_key, node in records:
+            if node.site_gateway:
+                gateways.add(node_key)
+                flagged_sites.add(node.sitename)
+            elif (node.sitename not in candidates) or (node_key < candidates[node.sitename]):
+                candidates[node.sitename] = node_key
+        gateways.update([ node_key for sitename, node_key in candidates.items() if sitename not in flagged_sites ])
+        return gateways
+
+    def get_site_topology(self):
+        """Returns the configured site topology"""
+        topology = str(self.globalconf.get_item('site_topology', SITE_TOPOLOGY_MESH))
+        if topology not in [SITE_TOPOLOGY_MESH, SITE_TOPOLOGY_GATEWAY]:
+            raise ValueError(f'Invalid value [{topology}] for "site_topology"; expected "{SITE_TOPOLOGY_MESH}" or "{SITE_TOPOLOGY_GATEWAY}"')
+        return topology
+
+    def get_bgp_topology(self):
+        """Returns the configured BGP topology"""
+        topology = str(self.globalconf.get_item('bgp_topology', BGP_TOPOLOGY_MESH))
+        if topology not in [BGP_TOPOLOGY_MESH, BGP_TOPOLOGY_ROUTE_REFLECTOR]:
+            raise ValueError(f'Invalid value [{topology}] for "bgp_topology"; expected "{BGP_TOPOLOGY_MESH}" or "{BGP_TOPOLOGY_ROUTE_REFLECTOR}"')
+        return topology
+
+    def update_generated_config(self, link_keys=True):
+        """Make sure that the automatically generated config is current (link_keys=False if there are no per-link key pairs)"""
         neighbors = collections.defaultdict(list)
-        for node1_key, node2_key in itertools.combinations(self.nodes.keys(), 2):
-            node1 = self.nodes[node1_key]
-            node2 = self.nodes[node2_key]
-            active = len(node1.groups.intersection(node2.groups)) > 0
-            node1_wgmtu = node1.complete_cfg.get('wg_mtu', WG_MTU_DEFAULT)
-            node2_wgmtu = node2.complete_cfg.get('wg_mtu', WG_MTU_DEFAULT)
+        table = linktable.LinkTable()
+        records = [ (node_key, node.record) for node_key, node in self.nodes.items() ]
+        hubs = self.get_hubs(records) if (self.get_bgp_topology() == BGP_TOPOLOGY_ROUTE_REFLECTOR) else None
+        gateways = self.get_site_gateways(records) if (self.get_site_topology() == SITE_TOPOLOGY_GATEWAY) else None
+        for (node1_key, node1), (node2_key, node2) in itertools.combinations(records, 2):
+            if (gateways is not None) and (node1.sitename != node2.sitename) and not ((node1_key in gateways) and (node2_key in gateways)):
+                self.generated.delete_linkdata(node1_key, node2_key)  # no link between sites other than between their gateways
+                continue
+            shared_groups = node1.groups & node2.groups
+            wg_active = len(shared_groups) > 0
+            active = wg_active
+            if active and (hubs is not None):  # just BGP sessions between hubs and the other nodes of their groups
+                active = any([ (node1_key in hubs[group]) or (node2_key in hubs[group]) for group in shared_groups ])
+            node1_wgmtu = WG_MTU_DEFAULT if (node1.wg_mtu is None) else node1.wg_mtu
+            node2_wgmtu = WG_MTU_DEFAULT if (node2.wg_mtu is None) else node2.wg_mtu
             wg_mtu = min(node1_wgmtu, node2_wgmtu)  # set link MTU to smallest common denominator of both Nodes
             if wg_mtu == WG_MTU_DEFAULT:
                 wg_mtu = None
             if active:
                 neighbors[node1_key].append(node2_key)
                 neighbors[node2_key].append(node1_key)
-            self.generated.set_linkdata(node1_key, node2_key, active=active, wg_mtu=wg_mtu)
+            wg_mtu = self.generated.set_linkdata(node1_key, node2_key, active=active, wg_mtu=wg_mtu, wg_keys=link_keys, wg_active=wg_active)
+            table.add(node1_key, node2_key, active, wg_active, wg_mtu)
         self.generated.set_neighbors(neighbors)
         self.generated.save_config()    
+        self.generated.set_link_table(table)
         
     def get_nodes(self):
         """Returns a dictionary of nodes (id-><flat data>)"""
@@ -106,44 +243,140 @@ class ConfigManager():
         with open(filename, 'a'):
             os.utime(filename, None)
             
+    def set_nodes_changed(self):
+        """Invalidates the indexes over the nodes and their configs (after nodes were added or deleted or configs were changed)"""
+        self._selector = None
+        self._attribute_index = None
+
+    @property
+    def selector(self):
+        """Returns the node selector (its indexes are built from the loaded nodes on first use)"""
+        if self._selector is None:
+            self._selector = nodeselector.NodeSelector(self)
+        return self._selector
+
+    @property
+    def attribute_index(self):
+        """Returns the columnar index of the attributes of the complete node configs (built on first use after loading)"""
+        if self._attribute_index is None:
+            self._attribute_index = attributeindex.AttributeIndex(self.nodes)
+        return self._attribute_index
+
+    def query_nodes(self, predicates):
+        """Returns the sorted list of identifiers of the nodes satisfying all given predicates (e.g. "wg_mtu<1400")"""
+        return self.attribute_index.query([ attributeindex.parse_predicate(predicate) for predicate in predicates ])
+
+    def select_nodes(self, selector):
+        """Returns the sorted list of identifiers of the nodes matching the given selector"""
+        return self.selector.select(selector)
+
     def get_free_nodeid(self):
         """Returns a valid node identifier that is not in use"""
-        i = 11 # reserve identifiers smaller than eleven
-        while i in self.nodes:
-            i += 1
-        return i
-
-    def add_site(self, site):
-        """Adds a site"""
-        if site in self.sites:
+        return self.nodeids.get_free()
+
+    def check_site(self, site):
+        """Raises a ValueError if the given site cannot be added"""
+        if (site in self.sites) or self.exists(os.path.join(self.confdir, SITE_DIR_PREFIX + site)):
             raise ValueError('The specified site does already exist')
         if site.isnumeric():
             raise ValueError('The name of the site must not be numeric')        
+
+    def check_node(self, nodename, site):
+        """Raises a ValueError if the given node cannot be added to the given site"""
+        if nodename.isnumeric():
+            raise ValueError('The name of the node must not be numeric')        
+        if self.exists(os.path.join(self.confdir, SITE_DIR_PREFIX + site, NODE_DIR_PREFIX + nodename)):
+            raise ValueError(f'The node [{nodename}.{site}] does already exist')
+
+    def set_attributes(self, confobj, attrs):
+        """Sets the given attributes in the given configuration object and saves it (unless within a batch)"""
+        for attr, value in attrs.items():
+            confobj.set_item(attr, value)
+        self.set_nodes_changed()
+        if not self.batch:
+            confobj.save_config()
+
+    def add_site(self, site, attrs=None, reload=True):
+        """Adds a site (just registering the new site instead of reloading all configs if reload=False)"""
+        self.check_site(site)
         sitedir = os.path.join(self.confdir, SITE_DIR_PREFIX + site)
-        os.makedirs(sitedir)
-        self.touch(os.path.join(sitedir, CONFNAME))
-        self.load_all()
+        self.create_dir(sitedir)
+        if self.batch:
+            self.sites[site] = siteconfig.SiteConfig(sitedir, list(), load=False)
+            self.sites[site].parse_config('')  # the config file is written at the end of the batch
+            self.globalconf.add_child(self.sites[site])
+        else:
+            self.touch(os.path.join(sitedir, CONFNAME))
+            if reload:
+                self.load_all()
+            else:
+                self.sites[site] = siteconfig.SiteConfig(sitedir, list())
+                self.globalconf.add_child(self.sites[site])
+        if attrs:
+            self.set_attributes(self.sites[site], attrs)
 
-    def add_node(self, nodename):
-        """Adds a node"""
+    def add_node(self, nodename, attrs=None, reload=True):
+        """Adds a node (just registering the new node instead of reloading all configs if reload=False)"""
         nodename, _, site = nodename.partition('.')
         if not site in self.sites:
             raise ValueError('The specified site does not exist')
-        if nodename.isnumeric():
-            raise ValueError('The name of the node must not be numeric')        
+        self.check_node(nodename, site)
         nodedir = os.path.join(self.confdir, SITE_DIR_PREFIX + site, NODE_DIR_PREFIX + nodename)
-        os.makedirs(nodedir)
-        id = self.get_free_nodeid()
-        with open(os.path.join(nodedir, CONFNAME), 'a') as f:
-            f.writelines(['# Node identifier that is unique over the whole Towalink installation\n' , f'node_id={id}'])
-        self.load_all()
+        self.create_dir(nodedir)
+        id = self.nodeids.allocate()
+        data = ''.join(['# Node identifier that is unique over the whole Towalink installation\n' , f'node_id={id}'])
+        if not self.batch:
+            with open(os.path.join(nodedir, CONFNAME), 'a') as f:
+                f.write(data)
+        if reload and not self.batch:
+            self.load_all()
+            node = self.nodes[id]
+        else:
+            node = nodeconfig.NodeConfig(nodedir, load=not self.batch)
+            if self.batch:
+                node.parse_config(data)  # the config file is written at the end of the batch
+            self.nodes[id] = node
+            self.set_nodes_changed()
+            self.sites[site].add_child(node)  # the list of site nodes is also the list of the site's children
+        if attrs:
+            self.set_attributes(node, attrs)
+        return id
+
+    def import_inventory(self, inv):
+        """Adds the sites and nodes of the given inventory in a single pass; returns the number of sites and nodes added"""
+        # Check the whole inventory before creating anything
+        new_sites = [ site for site in inv.sites if site not in self.sites ]
+        for site in new_sites:
+            self.check_site(site)
+        for fullname, attrs in inv.nodes.items():
+            nodename, _, site = fullname.partition('.')
+            self.check_node(nodename, site)
+            if ATTR_NODE_ID in attrs:
+                raise ValueError(f'Node [{fullname}] must not specify "{ATTR_NODE_ID}"; node identifiers are allocated automatically')
+        # Create sites and nodes
+        for site, attrs in inv.sites.items():
+            if site in new_sites:
+                self.add_site(site, attrs, reload=False)
+            elif attrs:
+                self.set_attributes(self.sites[site], attrs)
+        for fullname, attrs in inv.nodes.items():
+            self.add_node(fullname, attrs, reload=False)
+        logger.info(f'[{len(new_sites)}] sites and [{len(inv.nodes)}] nodes imported')
+        return len(new_sites), len(inv.nodes)
 
     def del_site(self, site):
         """Deletes a site"""
         if not site in self.sites:
             raise ValueError('The specified site does not exist')
         sitedir = os.path.join(self.confdir, SITE_DIR_PREFIX + site)
-        shutil.rmtree(sitedir)
+        if self.batch:
+            self.globalconf.children.remove(self.sites.pop(site))
+            for node_id in [ node_id for node_id, node in self.nodes.items() if node.sitename == site ]:
+                del self.nodes[node_id]
+            self.set_nodes_changed()
+            self.remove_dir(sitedir)
+            return
+        self.remove_dir(sitedir)
         self.load_all()
 
     def del_node(self, node):
@@ -160,9 +393,17 @@ class ConfigManager():
         if not site in self.sites:
             raise ValueError('The specified site does not exist')
         nodedir = os.path.join(self.confdir, SITE_DIR_PREFIX + site, NODE_DIR_PREFIX + node)
-        if not os.path.exists(nodedir):    
+        if not self.exists(nodedir):
             raise ValueError('The specified node does not exist')
-        shutil.rmtree(nodedir)
+        if self.batch:
+            for node_id, nodeobj in list(self.nodes.items()):
+                if (nodeobj.name == node) and (nodeobj.sitename == site):
+                    del self.nodes[node_id]
+                    self.sites[site].site_nodes.remove(nodeobj)
+            self.set_nodes_changed()
+            self.remove_dir(nodedir)
+            return
+        self.remove_dir(nodedir)
         self.load_all()
 
     def set_defaults(self):
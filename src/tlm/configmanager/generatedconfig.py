@@ -2,14 +2,16 @@
 
 """Class for managing the generated config"""
 
+import hashlib
 import logging
 import os
 import pprint
 import secrets
 import string
 
-from . import wireguard
+from . import linktable
 from . import tomlconfighierarchy
+from . import wireguard
 
 
 logger = logging.getLogger(__name__)
@@ -23,16 +25,53 @@ class GeneratedConfig(tomlconfighierarchy.TOMLConfigHierarchy):
         """Object initialization"""
         filename = os.path.join(path, self.confname)
         super().__init__(filename)
+        self._link_table = None
         if os.path.isfile(filename):
             self.load_config()
         self.wireguard = wireguard.WireGuard()
 
+    def set_config_changed(self):
+        """Marks the config to have pending changes not yet saved"""
+        super().set_config_changed()
+        self._link_table = None
+
+    @property
+    def link_table(self):
+        """Returns a read-only table of the links between nodes (without key material)"""
+        if self._link_table is None:
+            self._link_table = linktable.LinkTable.from_links(self.cfg.get('links', dict()))
+        return self._link_table
+
+    def set_link_table(self, table):
+        """Sets the table of the links between nodes after the links have been updated"""
+        table.set_readonly()
+        self._link_table = table
+
+    def get_linkdata(self, node1_key, node2_key):
+        """Returns a dictionary of all data of the link between the given nodes"""
+        if node1_key > node2_key:
+            node2_key, node1_key = node1_key, node2_key
+        data = self.cfg.get('links', dict()).get(f'{node1_key}-{node2_key}')
+        if data is None:
+            return dict()
+        return data.unwrap() if hasattr(data, 'unwrap') else dict(data)
+
     def save_config(self):
         """Saves the current configuration to file"""
         dirname = os.path.dirname(self._filename)
         if self._is_changed and not os.path.exists(dirname):
             os.makedirs(dirname)
-        super().save_config()
+        return super().save_config()
+
+    def get_hash(self):
+        """Returns a hash of the saved generated config"""
+        h = hashlib.sha256()
+        try:
+            with open(self._filename, 'rb') as f:
+                h.update(f.read())
+        except FileNotFoundError:
+            pass
+        return h.hexdigest()
 
     def generate_wireguard_keypair(self):
         """Returns a WireGuard key pair"""
@@ -53,30 +92,57 @@ class GeneratedConfig(tomlconfighierarchy.TOMLConfigHierarchy):
         for node_key, neighborlist in neighbors.items():
             self.set_item(f'neighbors.{node_key}', neighborlist)
 
-    def set_linkdata(self, node1_key, node2_key, active, wg_mtu):
-        """Ensures that all data of a link is present as needed"""
+    def get_nodedata(self, node_key):
+        """Returns a dictionary of the generated data of the given node"""
+        data = self.cfg.get('nodes', dict()).get(str(node_key))
+        if data is None:
+            return dict()
+        return data.unwrap() if hasattr(data, 'unwrap') else dict(data)
+
+    def set_nodedata(self, node_key):
+        """Ensures that the data of a node (key pair of its single WireGuard interface) is present"""
+        if self.get_nodedata(node_key).get('wg_private') is None:
+            wg_private, wg_public = self.generate_wireguard_keypair()
+            self.set_item(f'nodes.{node_key}.wg_private', wg_private)
+            self.set_item(f'nodes.{node_key}.wg_public', wg_public)
+
+    def delete_linkdata(self, node1_key, node2_key):
+        """Removes the link between the given nodes if present"""
+        if node1_key > node2_key:
+            node2_key, node1_key = node1_key, node2_key
+        if f'{node1_key}-{node2_key}' in self.cfg.get('links', dict()):
+            self.delete_item(f'links.{node1_key}-{node2_key}')
+
+    def set_linkdata(self, node1_key, node2_key, active, wg_mtu, wg_keys=True, wg_active=None):
+        """Ensures that all data of a link is present as needed (key pairs only if wg_keys); returns the MTU stored for the link
+
+        "active" refers to the BGP session and "wg_active" (defaulting to "active") to the WireGuard link.
+        """
         if node1_key > node2_key: # make sure that the first identifier is the smaller one
             node2_key, node1_key = node1_key, node2_key
+        if wg_active is None:
+            wg_active = active
         linkname = f'{node1_key}-{node2_key}'
         self.set_item(f'links.{linkname}.active', active)
-        self.set_item(f'links.{linkname}.wg_active', active)
-        if active and (self.get_item(f'links.{linkname}.wg_private_{node1_key}') is None):
+        self.set_item(f'links.{linkname}.wg_active', wg_active)
+        if wg_active and wg_keys and (self.get_item(f'links.{linkname}.wg_private_{node1_key}') is None):
             wg_private, wg_public = self.generate_wireguard_keypair()
             self.set_item(f'links.{linkname}.wg_private_{node1_key}', wg_private)
             self.set_item(f'links.{linkname}.wg_public_{node1_key}', wg_public)
-        if active and (self.get_item(f'links.{linkname}.wg_private_{node2_key}') is None):
+        if wg_active and wg_keys and (self.get_item(f'links.{linkname}.wg_private_{node2_key}') is None):
             wg_private, wg_public = self.generate_wireguard_keypair()
             self.set_item(f'links.{linkname}.wg_private_{node2_key}', wg_private)
             self.set_item(f'links.{linkname}.wg_public_{node2_key}', wg_public)
-        if active and (self.get_item(f'links.{linkname}.wg_preshared') is None):
+        if wg_active and (self.get_item(f'links.{linkname}.wg_preshared') is None):
             wg_preshared = self.generate_wireguard_psk()
             self.set_item(f'links.{linkname}.wg_preshared', wg_preshared)
         if active and (self.get_item(f'links.{linkname}.bgp_password') is None):
             bgp_password = ''.join(secrets.choice(string.ascii_uppercase + string.ascii_lowercase + string.digits) for _ in range(16))
             self.set_item(f'links.{linkname}.bgp_password', bgp_password)
-        if active or (self.get_item(f'links.{linkname}.wg_mtu') is not None):  # set initially only when active but update existing value always
+        if wg_active or (self.get_item(f'links.{linkname}.wg_mtu') is not None):  # set initially only when active but update existing value always
             self.set_item(f'links.{linkname}.wg_mtu', wg_mtu)
-
+            return wg_mtu
+        return None
 
 if __name__ == '__main__':
     logging.basicConfig(format='%(asctime)s %(levelname)s %(module)s: %(message)s', level=logging.INFO)  # use %(name)s instead of %(module) to include hierarchy information, see 
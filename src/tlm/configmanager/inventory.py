@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""Class for reading an inventory of sites and nodes to be imported"""
+
+import ast
+import collections.abc
+import csv
+import logging
+import os
+import yaml
+
+# Use the libyaml bindings if available
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+
+logger = logging.getLogger(__name__)
+COLUMN_SITE = 'site'
+COLUMN_NODE = 'node'
+
+
+def parse_value(value):
+    """Converts the given string value (e.g. of a CSV cell) in the same way as "tlm set" does"""
+    value = value.strip()
+    if (len(value) > 1) and (value[0] == '[') and (value[-1] == ']'):
+        return ast.literal_eval(value)
+    if value.isnumeric():
+        return int(value)
+    if value in ['true', 'false']:
+        return value == 'true'
+    return value
+
+
+class Inventory(object):
+    """Class for reading an inventory of sites and nodes to be imported
+
+    YAML inventories map "sites" to a dictionary of site names each mapping to the site's attributes;
+    the nodes of a site are given as dictionary of node names (mapping to the node's attributes) in
+    the site's "nodes" attribute. CSV inventories have the columns "site" and "node" followed by a
+    column per attribute; rows with an empty "node" column provide the attributes of the site.
+    """
+
+    def __init__(self, filename=None):
+        """Object initialization"""
+        self.sites = dict()  # site name -> attributes
+        self.nodes = dict()  # "<nodename>.<sitename>" -> attributes
+        if filename is not None:
+            self.load(filename)
+
+    def add_site(self, site, attrs=None):
+        """Adds the given site (attributes of a site given more than once are merged)"""
+        site = str(site)
+        if (len(site) == 0) or ('.' in site):
+            raise ValueError(f'Invalid site name [{site}] in inventory')
+        self.sites.setdefault(site, dict()).update(attrs or dict())
+
+    def add_node(self, node, site, attrs=None):
+        """Adds the given node of the given site"""
+        node = str(node)
+        if (len(node) == 0) or ('.' in node):
+            raise ValueError(f'Invalid node name [{node}] in inventory')
+        self.add_site(site)
+        fullname = f'{node}.{site}'
+        if fullname in self.nodes:
+            raise ValueError(f'Node [{fullname}] is given more than once in inventory')
+        self.nodes[fullname] = dict(attrs or dict())
+
+    def load(self, filename):
+        """Loads the inventory from the given YAML or CSV file (depending on the file extension)"""
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == '.csv':
+            self.load_csv(filename)
+        elif extension in ['.yaml', '.yml']:
+            self.load_yaml(filename)
+        else:
+            raise ValueError(f'Unsupported inventory file [{filename}]; expected ".yaml", ".yml" or ".csv"')
+        logger.debug(f'Inventory with [{len(self.sites)}] sites and [{len(self.nodes)}] nodes read from [{filename}]')
+
+    def load_yaml(self, filename):
+        """Loads the inventory from the given YAML file"""
+        with open(filename, 'r') as f:
+            data = yaml.load(f, Loader=SafeLoader) or dict()
+        sites = data.get('sites', dict()) if isinstance(data, collections.abc.Mapping) else None
+        if not isinstance(sites, collections.abc.Mapping):
+            raise ValueError(f'Inventory [{filename}] does not map "sites" to a dictionary of sites')
+        for site, attrs in sites.items():
+            attrs = dict(attrs or dict())
+            nodes = attrs.pop('nodes', None) or dict()
+            if not isinstance(nodes, collections.abc.Mapping):
+                raise ValueError(f'Nodes of site [{site}] in inventory [{filename}] are not given as dictionary')
+            self.add_site(site, attrs)
+            for node, node_attrs in nodes.items():
+                self.add_node(node, site, node_attrs)
+
+    def load_csv(self, filename):
+        """Loads the inventory from the given CSV file"""
+        with open(filename, 'r', newline='') as f:
+            reader = csv.DictReader(f)
+            if (reader.fieldnames is None) or (COLUMN_SITE not in reader.fieldnames):
+                raise ValueError(f'Inventory [{filename}] lacks the column "{COLUMN_SITE}"')
+            for row in reader:
+                site = (row.pop(COLUMN_SITE) or '').strip()
+                node = (row.pop(COLUMN_NODE, None) or '').strip()
+                attrs = { key.strip(): parse_value(value) for key, value in row.items() if (key is not None) and (value is not None) and (len(value.strip()) > 0) }
+                if len(node) > 0:
+                    self.add_node(node, site, attrs)
+                else:
+                    self.add_site(site, attrs)
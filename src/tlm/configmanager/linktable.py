@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""Class for an array-backed table of the links between nodes"""
+
+import array
+import logging
+
+
+logger = logging.getLogger(__name__)
+FLAG_ACTIVE = 1
+FLAG_WG_ACTIVE = 2
+
+
+class LinkTable(object):
+    """Class for an array-backed table of the links between nodes
+
+    Each link is a row of the columns node1/node2 (node identifiers, node1 < node2), flags (active,
+    wg_active) and MTU (0 if not set). Key material and passwords stay in the generated config.
+    """
+
+    def __init__(self):
+        """Object initialization"""
+        self._node1 = array.array('I')
+        self._node2 = array.array('I')
+        self._flags = array.array('B')
+        self._mtu = array.array('H')
+        self._rows = dict()  # (node1 << 32 | node2) -> row
+        self._node_rows = None  # node identifier -> array of rows; built on demand
+        self._readonly = False
+
+    def __len__(self):
+        return len(self._flags)
+
+    def __iter__(self):
+        """Yields tuples of node1, node2, active, wg_active and wg_mtu for all links"""
+        for row in range(len(self._flags)):
+            yield self.get_row(row)
+
+    @staticmethod
+    def get_key(node1, node2):
+        """Returns the key of the link between the given nodes"""
+        if node1 > node2:
+            node1, node2 = node2, node1
+        return (node1 << 32) | node2
+
+    @classmethod
+    def from_links(cls, links):
+        """Returns a read-only table of the given links (dictionary linkname -> link data as in the generated config)"""
+        table = cls()
+        for linkname, data in links.items():
+            node1_key, _, node2_key = str(linkname).partition('-')
+            table.add(int(node1_key), int(node2_key), data.get('active', False), data.get('wg_active', False), data.get('wg_mtu'))
+        table.set_readonly()
+        return table
+
+    def set_readonly(self):
+        """Makes the table read-only"""
+        self._readonly = True
+
+    def add(self, node1, node2, active, wg_active, wg_mtu=None):
+        """Adds the link between the given nodes or updates it if already present"""
+        if self._readonly:
+            raise ValueError('The link table is read-only')
+        if node1 > node2:
+            node1, node2 = node2, node1
+        flags = (FLAG_ACTIVE if active else 0) | (FLAG_WG_ACTIVE if wg_active else 0)
+        mtu = 0 if (wg_mtu is None) else int(wg_mtu)
+        key = (node1 << 32) | node2
+        row = self._rows.get(key)
+        if row is None:
+            self._rows[key] = len(self._flags)
+            self._node1.append(node1)
+            self._node2.append(node2)
+            self._flags.append(flags)
+            self._mtu.append(mtu)
+            self._node_rows = None
+        else:
+            self._flags[row] = flags
+            self._mtu[row] = mtu
+
+    def get_row(self, row):
+        """Returns a tuple of node1, node2, active, wg_active and wg_mtu for the given row"""
+        flags = self._flags[row]
+        mtu = self._mtu[row]
+        return self._node1[row], self._node2[row], bool(flags & FLAG_ACTIVE), bool(flags & FLAG_WG_ACTIVE), (mtu if mtu > 0 else None)
+
+    def get(self, node1, node2):
+        """Returns a tuple of node1, node2, active, wg_active and wg_mtu for the link between the given nodes (None if not present)"""
+        row = self._rows.get(self.get_key(node1, node2))
+        return None if (row is None) else self.get_row(row)
+
+    def get_node_rows(self):
+        """Returns a dictionary mapping each node identifier to the rows of the links it is part of"""
+        if self._node_rows is None:
+            self._node_rows = dict()
+            for row in range(len(self._flags)):
+                for node in (self._node1[row], self._node2[row]):
+                    rows = self._node_rows.get(node)
+                    if rows is None:
+                        rows = self._node_rows[node] = array.array('I')
+                    rows.append(row)
+        return self._node_rows
+
+    def iter_node_links(self, node_id):
+        """Yields tuples of peer identifier, active, wg_active and wg_mtu for the links of the given node ordered by peer"""
+        rows = self.get_node_rows().get(node_id, ())
+        result = list()
+        for row in rows:
+            node1, node2, active, wg_active, wg_mtu = self.get_row(row)
+            result.append((node2 if (node1 == node_id) else node1, active, wg_active, wg_mtu))
+        yield from sorted(result)
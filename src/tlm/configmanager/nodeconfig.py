@@ -6,6 +6,7 @@ import config
 import logging
 import os
 
+from . import noderecord
 from . import tomlconfighierarchy
 
 
@@ -19,15 +20,34 @@ class NodeConfig(tomlconfighierarchy.TOMLConfigHierarchy):
     """Class for managing a node's config"""
     confname = 'config.toml' # name of the config file
 
-    def __init__(self, path):
-        """Object initialization"""
+    def __init__(self, path, load=True):
+        """Object initialization (load=False for a node that is not yet present on disk)"""
         super().__init__(os.path.join(path, self.confname), 2)
         path = os.path.abspath(path)
         self._name = os.path.basename(path)
         self._sitename = os.path.basename(os.path.dirname(path))[5:]
         assert self._name.startswith(NODE_DIR_PREFIX)
         self._name = self._name[len(NODE_DIR_PREFIX):]
-        self.load_config()
+        self._hostname = None
+        self._record = None
+        if load:
+            self.load_config()
+
+    def set_config_changed(self):
+        """Marks the config to have pending changes not yet saved"""
+        super().set_config_changed()
+        self._hostname = None
+
+    def set_complete_cfg_changed(self):
+        """Marks any cached complete config invalid"""
+        super().set_complete_cfg_changed()
+        self._record = None
+
+    def release(self):
+        """Releases the memory held for the loaded and the complete configuration but keeps the compact record"""
+        record = self._record
+        super().release()
+        self._record = record
 
     def add_ephemeral_attributes(self):
         """Adds attributes to the complete config"""
@@ -40,6 +60,24 @@ class NodeConfig(tomlconfighierarchy.TOMLConfigHierarchy):
     def name(self):
         return self._name
 
+    @property
+    def sitename(self):
+        return self._sitename
+
+    @property
+    def hostname(self):
+        """Returns the hostname using which the node can be reached by its peers"""
+        if self._hostname is None:
+            self._hostname = str(self.get('node_hostname', 'localhost'))
+        return self._hostname
+
+    @property
+    def record(self):
+        """Returns a compact read-only record of the node attributes needed for generating and rendering configs"""
+        if self._record is None:
+            self._record = noderecord.NodeRecord.from_config(self)
+        return self._record
+
     @property
     def groups(self):
         groups = self.complete_cfg.get(ATTR_GROUPS, [DEFAULT_GROUP])
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""Class for allocating node identifiers using a bitmap of the identifiers in use"""
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+FIRST_NODE_ID = 11  # node identifiers smaller than eleven are reserved
+
+
+class NodeIdAllocator(object):
+    """Class for allocating node identifiers using a bitmap of the identifiers in use
+
+    Bit i of the bitmap is set if node identifier i is in use. Free identifiers are searched bytewise
+    starting from the lowest byte that may still contain a free identifier.
+    """
+
+    def __init__(self, node_ids=(), first_id=FIRST_NODE_ID):
+        """Object initialization"""
+        self.first_id = first_id
+        self._bitmap = bytearray()
+        self._next_byte = first_id >> 3  # no free identifier below this byte
+        for node_id in range(first_id):  # reserved identifiers
+            self.reserve(node_id)
+        for node_id in node_ids:
+            self.reserve(node_id)
+
+    def is_used(self, node_id):
+        """Returns whether the given node identifier is in use"""
+        byte = node_id >> 3
+        return (byte < len(self._bitmap)) and bool(self._bitmap[byte] & (1 << (node_id & 7)))
+
+    def reserve(self, node_id):
+        """Marks the given node identifier as in use"""
+        byte = node_id >> 3
+        if byte >= len(self._bitmap):
+            self._bitmap.extend(bytes(byte - len(self._bitmap) + 1))
+        self._bitmap[byte] |= 1 << (node_id & 7)
+
+    def release(self, node_id):
+        """Marks the given node identifier as free"""
+        if (node_id < self.first_id) or not self.is_used(node_id):
+            return
+        byte = node_id >> 3
+        self._bitmap[byte] &= ~(1 << (node_id & 7)) & 0xFF
+        self._next_byte = min(self._next_byte, byte)
+
+    def get_free(self):
+        """Returns the lowest node identifier that is not in use"""
+        byte = self._next_byte
+        while (byte < len(self._bitmap)) and (self._bitmap[byte] == 0xFF):
+            byte += 1
+        self._next_byte = byte
+        if byte == len(self._bitmap):
+            return byte << 3
+        bits = self._bitmap[byte]
+        bit = 0
+        while bits & (1 << bit):
+            bit += 1
+        return (byte << 3) | bit
+
+    def allocate(self):
+        """Returns the lowest node identifier that is not in use and marks it as in use"""
+        node_id = self.get_free()
+        self.reserve(node_id)
+        return node_id
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s %(levelname)s %(module)s: %(message)s', level=logging.INFO)  # use %(name)s instead of %(module) to include hierarchy information, see
+    allocator = NodeIdAllocator([11, 12, 14])
+    print([ allocator.allocate() for i in range(5) ])
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+"""Class for a compact read-only record of a node's attributes"""
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+# Settings that need to be the same for all nodes as addresses, ASNs and ports are allocated installation-wide
+ALLOCATION_SETTINGS = ('loopbacknet_ipv4', 'loopbacknet_ipv6', 'internode_transfernet_ipv4', 'internode_transfernet_ipv6', 'bgp_as_base', 'wg_listenport_base')
+
+
+def get_plain_setting(value):
+    """Returns the given setting as hashable plain value (lists become tuples of strings)"""
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return tuple([ str(item) for item in value ])
+    if isinstance(value, bool):
+        return bool(value)
+    if isinstance(value, int):
+        return int(value)
+    return str(value)
+
+
+class NodeRecord(object):
+    """Class for a compact read-only record of the node attributes needed for generating and rendering configs"""
+    __slots__ = ('node_id', 'name', 'sitename', 'hostname', 'groups', 'wg_mtu', 'wg_allowedips', 'route_reflector', 'site_gateway', 'allocation_settings')
+
+    def __init__(self, node_id, name, sitename, hostname, groups, wg_mtu=None, wg_allowedips=(), route_reflector=False, site_gateway=False, allocation_settings=()):
+        """Object initialization"""
+        object.__setattr__(self, 'node_id', node_id)
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'sitename', sitename)
+        object.__setattr__(self, 'hostname', hostname)
+        object.__setattr__(self, 'groups', frozenset(groups))
+        object.__setattr__(self, 'wg_mtu', wg_mtu)
+        object.__setattr__(self, 'wg_allowedips', tuple(wg_allowedips))
+        object.__setattr__(self, 'route_reflector', bool(route_reflector))
+        object.__setattr__(self, 'site_gateway', bool(site_gateway))
+        object.__setattr__(self, 'allocation_settings', tuple(allocation_settings))  # values in the order of ALLOCATION_SETTINGS
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Node records are read-only')
+
+    def __repr__(self):
+        return f'NodeRecord({self.node_id}, {self.fullname})'
+
+    @classmethod
+    def from_config(cls, node):
+        """Returns the record for the given NodeConfig object"""
+        cfg = node.complete_cfg
+        wg_mtu = cfg.get('wg_mtu')
+        return cls(node_id=cfg.get('node_id'), name=node.name, sitename=node.sitename, hostname=node.hostname,
+                   groups=node.groups, wg_mtu=None if (wg_mtu is None) else int(wg_mtu),
+                   wg_allowedips=[ str(item) for item in node.get_as_list(cfg.get('wg_allowedips', list())) ],
+                   route_reflector=cfg.get('bgp_route_reflector', False), site_gateway=cfg.get('site_gateway', False),
+                   allocation_settings=[ get_plain_setting(cfg.get(setting)) for setting in ALLOCATION_SETTINGS ])
+
+    def get_allocation_setting(self, setting):
+        """Returns the value of the given allocation setting in the node's complete config (None if not set)"""
+        index = ALLOCATION_SETTINGS.index(setting)
+        return self.allocation_settings[index] if (index < len(self.allocation_settings)) else None
+
+    @property
+    def fullname(self):
+        return self.name + '.' + self.sitename
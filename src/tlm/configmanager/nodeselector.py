@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+"""Class for resolving node selectors using indexes over the loaded config"""
+
+import collections
+import fnmatch
+import logging
+
+from . import attributeindex
+
+logger = logging.getLogger(__name__)
+INDEXED_KINDS = ['group', 'site', 'node']
+
+
+class NodeSelector(object):
+    """Class for resolving node selectors using indexes over the loaded config
+
+    A selector consists of comma-separated terms that all need to match:
+    "group:<pattern>", "site:<pattern>", "node:<pattern>" (matching the node name or "<nodename>.<sitename>"),
+    "id:<nodeid>" as well as predicates on the complete node config like "<attr>=<pattern>" (see
+    "attributeindex.parse_predicate"). Patterns may contain shell-style wildcards. Terms of the indexed kinds
+    are resolved first so that predicates are just evaluated for the remaining nodes.
+    """
+
+    def __init__(self, cm):
+        """Object initialization"""
+        self.cm = cm
+        self._indexes = None
+
+    def build_indexes(self):
+        """Builds the indexes kind -> value -> set of node identifiers for the indexed kinds"""
+        self._indexes = { kind: collections.defaultdict(set) for kind in INDEXED_KINDS }
+        for node_id, node in self.cm.nodes.items():
+            record = node.record
+            for group in record.groups:
+                self._indexes['group'][group].add(node_id)
+            self._indexes['site'][record.sitename].add(node_id)
+            self._indexes['node'][record.name].add(node_id)
+            self._indexes['node'][record.fullname].add(node_id)
+
+    @property
+    def indexes(self):
+        if self._indexes is None:
+            self.build_indexes()
+        return self._indexes
+
+    @staticmethod
+    def parse(selector):
+        """Returns a list of terms (kind, operator, value) for the given selector"""
+        terms = list()
+        for term in str(selector).split(','):
+            term = term.strip()
+            if len(term) == 0:
+                continue
+            kind, sep, value = term.partition(':')
+            if sep and (kind in INDEXED_KINDS + ['id']):
+                if (kind == 'id') and not value.isnumeric():
+                    raise ValueError(f'Invalid node identifier in selector term [{term}]')
+                terms.append((kind, ':', value))
+                continue
+            try:
+                terms.append(attributeindex.parse_predicate(term))
+            except ValueError:
+                raise ValueError(f'Invalid selector term [{term}]; expected e.g. "group:<name>", "site:<pattern>", "node:<pattern>" or "<attr>=<value>"')
+        if len(terms) == 0:
+            raise ValueError('Empty selector')
+        return terms
+
+    def match_index(self, kind, pattern):
+        """Returns the set of identifiers of the nodes whose indexed value of the given kind matches the given pattern"""
+        index = self.indexes[kind]
+        if pattern in index:
+            return set(index[pattern])
+        result = set()
+        for value in fnmatch.filter(index.keys(), pattern):
+            result |= index[value]
+        return result
+
+    def select(self, selector):
+        """Returns the sorted list of identifiers of the nodes matching the given selector"""
+        terms = self.parse(selector)
+        candidates = None
+        for kind, operator, value in terms:
+            if operator != ':':
+                continue
+            if kind == 'id':
+                matches = { int(value) } & self.cm.nodes.keys()
+            else:
+                matches = self.match_index(kind, value)
+            candidates = matches if (candidates is None) else (candidates & matches)
+        if candidates is None:
+            candidates = set(self.cm.nodes.keys())
+        for attr, operator, value in terms:
+            if operator == ':':
+                continue
+            candidates = self.cm.attribute_index.filter(candidates, attr, operator, value)
+        logger.debug(f'Selector [{selector}] matches [{len(candidates)}] nodes')
+        return sorted(candidates)
@@ -17,20 +17,17 @@ class SiteConfig(tomlconfighierarchy.TOMLConfigHierarchy):
     """Class for managing a site's config"""
     confname = 'config.toml' # name of the config file
 
-    def __init__(self, path, site_nodes=None):
-        """Object initialization"""
+    def __init__(self, path, site_nodes=None, load=True):
+        """Object initialization (load=False for a site that is not yet present on disk)"""
         super().__init__(os.path.join(path, self.confname), 1)
         self.site_nodes = site_nodes
+        if site_nodes is not None:
+            self.set_children(site_nodes)  # node configs inherit from the site config
         self._name = os.path.basename(os.path.abspath(path))
         assert self._name.startswith(SITE_DIR_PREFIX)
         self._name = self._name[len(SITE_DIR_PREFIX):]
-        self.load_config()
-
-    def set_effective_cfg_changed(self):
-        """Marks any cached effective config invalid"""
-        super().set_effective_cfg_changed()
-        for child in self.site_nodes:
-            child.set_effective_cfg_changed()
+        if load:
+            self.load_config()
 
     def add_ephemeral_attributes(self):
         """Adds attributes to the complete config"""
@@ -30,13 +30,13 @@ class TOMLConfig(object):
         return self._cfg
 
     def __getitem__(self, key):
-        return self._cfg[key]
+        return self.cfg[key]
 
     def __iter__(self):
-        return iter(self._cfg)
+        return iter(self.cfg)
 
     def __len__(self):
-        return len(self._cfg)
+        return len(self.cfg)
 
     def set_filename(self, filename):
         """Sets the file to read the configuration from"""
@@ -60,6 +60,18 @@ class TOMLConfig(object):
             self._cfg = dict()  # cover the case of an empty file
         self._is_changed = False
 
+    def parse_config(self, data):
+        """Sets the configuration parsed from the given TOML text; it is marked as changed so that it gets saved"""
+        self._cfg = tomlkit.parse(data)
+        self.set_config_changed()
+
+    def unload_config(self):
+        """Releases the loaded configuration unless it has unsaved changes (it is loaded again on next access)"""
+        if self._is_changed:
+            return False
+        self._cfg = None
+        return True
+
     def save_config(self, filename=None):
         """Saves the current configuration to file"""
         if filename is None:
@@ -77,10 +89,26 @@ class TOMLConfig(object):
         self._is_changed = False
         return True
 
+    def stage_config(self):
+        """Writes the current configuration to a temporary file next to the config file; returns its name (None if nothing changed)"""
+        if not self._is_changed:
+            return None
+        tmpname = self._filename + '.tmp'
+        logger.debug('Staging config file [{0}]'.format(self._filename))
+        with open(tmpname, 'w') as tomlfile:
+            tomlfile.write(tomlkit.dumps(self._cfg))
+        return tmpname
+
+    def commit_staged_config(self, tmpname):
+        """Atomically replaces the config file by the given temporary file written by stage_config"""
+        os.replace(tmpname, self._filename)
+        self._is_changed = False
+        return True
+
     def get(self, itemname, default=None):
         """Return a specific item from the configuration or the provided default value if not present (low level)"""
         try:
-            return self._cfg.get(itemname, default)
+            return self.cfg.get(itemname, default)
         except tomlkit.exceptions.NonExistentKey:
             return None
             
@@ -90,8 +118,8 @@ class TOMLConfig(object):
         cfg = self.cfg
         for part in parts:
             cfg_new = cfg.get(part, dict())
-            if part.isnumeric() and isinstance(cfg_new, dict) and (len(cfg_new) == 0):
-                cfg_new = cfg.get(float(part), dict())
+            if part.isnumeric() and isinstance(cfg_new, dict) and (len(cfg_new) == 0) and not hasattr(cfg, 'unwrap'):
+                cfg_new = cfg.get(float(part), dict())  # keys of loaded TOML tables are always strings (and tomlkit rejects others)
             cfg = cfg_new
         if (cfg is None) or ((isinstance(cfg, dict)) and (len(cfg) == 0)):
             cfg = default
@@ -100,7 +128,10 @@ class TOMLConfig(object):
     def set_item(self, itemname, value, replace=True):
         """Set a specific item in the configuration"""
         if self._cfg is None: # default needed when setting first item
-            self._cfg = dict()
+            if os.path.isfile(self._filename):
+                self.load_config()  # config has been unloaded before
+            else:
+                self._cfg = dict()
         parts = itemname.split('.')
         cfg = self._cfg
         for i, part in enumerate(parts):
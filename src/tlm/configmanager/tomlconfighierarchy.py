@@ -2,10 +2,12 @@
 
 """Class for reading and writing TOML config files inheriting defaults from parent directories"""
 
+import collections.abc
 import config
 import logging
 import os
 import pprint
+import types
 
 from . import tomlconfig
 
@@ -13,6 +15,23 @@ from . import tomlconfig
 logger = logging.getLogger(__name__)
 
 
+def freeze(value):
+    """Returns the given nested dictionary as read-only mapping (nested mappings are made read-only as well)"""
+    if isinstance(value, config.Configuration):  # TOML table
+        value = dict(value.items())
+    if isinstance(value, collections.abc.Mapping):
+        return types.MappingProxyType({ k: freeze(v) for k, v in value.items() })
+    return value
+
+def thaw(value):
+    """Returns a mutable deep copy of the given (possibly read-only) nested mapping"""
+    if isinstance(value, collections.abc.Mapping):
+        return { k: thaw(v) for k, v in value.items() }
+    if isinstance(value, list):
+        return [ thaw(item) for item in value ]
+    return value
+
+
 class TOMLConfigHierarchy(tomlconfig.TOMLConfig):
     """Class for reading and writing a TOML config file, the complete config taking defaults from configs in parent directories"""
     _complete_cfg = None
@@ -21,57 +40,105 @@ class TOMLConfigHierarchy(tomlconfig.TOMLConfig):
         """Object initialization"""
         super().__init__(filename)
         self.num_parent_directories = num_parent_directories
+        self.parent = None  # config this one inherits from
+        self.children = list()  # configs inheriting from this one
+        self._complete_cfg_view = None  # cached read-only view of the complete config
+        self._complete_cfg_nested = None  # cached read-only nested view of the complete config
+
+    def set_children(self, children):
+        """Sets the list of configs inheriting from this one"""
+        self.children = children
+        for child in children:
+            child.parent = self
+
+    def add_child(self, child):
+        """Adds a config inheriting from this one"""
+        self.children.append(child)
+        child.parent = self
 
     def set_complete_cfg_changed(self):
-        """Marks any cached complete config invalid"""
+        """Marks any cached complete config invalid (including the ones of the configs inheriting from this one)"""
         self._complete_cfg = None
+        self._complete_cfg_view = None
+        self._complete_cfg_nested = None
+        for child in self.children:
+            child.set_complete_cfg_changed()
         
     def set_config_changed(self):
         """Marks the config to have pending changes not yet saved"""
         super().set_config_changed()
         self.set_complete_cfg_changed()
 
+    def save_config(self, filename=None):
+        """Saves the current configuration to file"""
+        saved = super().save_config(filename)
+        if saved:
+            self.set_complete_cfg_changed()  # the complete config is read from the saved files
+        return saved
+
+    def commit_staged_config(self, tmpname):
+        """Atomically replaces the config file by the given temporary file written by stage_config"""
+        committed = super().commit_staged_config(tmpname)
+        self.set_complete_cfg_changed()  # the complete config is read from the saved files
+        return committed
+
+    def release(self):
+        """Releases the memory held for the loaded and the complete configuration (both are loaded again on next access)"""
+        self.set_complete_cfg_changed()
+        self.unload_config()
+
     def add_ephemeral_attributes(self):
         """Adds attributes to the complete config"""
         self._complete_cfg['config_filename'] = self._filename
 
+    def get_level_config(self, level):
+        """Returns the configuration of the given level of the hierarchy (0: this one, 1: parent, ...) for building the complete config
+
+        Configs with unsaved changes (e.g. within a batch) or without file are taken from memory, all others are read from file.
+        """
+        confobj = self
+        for i in range(level):
+            confobj = confobj.parent if (confobj is not None) else None
+        if (confobj is not None) and (confobj._is_changed or not os.path.isfile(confobj._filename)):
+            cfg = confobj.cfg
+            return config.config_from_dict(cfg.unwrap() if hasattr(cfg, 'unwrap') else thaw(cfg))
+        path, filename = os.path.split(self._filename)
+        filename = os.path.join(path, *([ '..' ] * level), filename)
+        if os.path.isfile(filename):
+            return config.config_from_toml(filename, read_from_file=True)
+        return config.config_from_dict(dict())
+
     def load_complete_cfg(self):
         """Loads the complete configuration"""
-        if os.path.isfile(self._filename):
-            path, filename = os.path.split(self._filename)
-            if self.num_parent_directories == 0:
-                self._complete_cfg = config.ConfigurationSet(
-                    config.config_from_toml(self._filename, read_from_file=True),
-                )
-            elif self.num_parent_directories == 1:
-                self._complete_cfg = config.ConfigurationSet(
-                    config.config_from_toml(self._filename, read_from_file=True),
-                    config.config_from_toml(os.path.join(path, '..', filename), read_from_file=True),
-                )
-            elif self.num_parent_directories == 2:
-                self._complete_cfg = config.ConfigurationSet(
-                    config.config_from_toml(self._filename, read_from_file=True),
-                    config.config_from_toml(os.path.join(path, '..', filename), read_from_file=True),
-                    config.config_from_toml(os.path.join(path, '..', '..', filename), read_from_file=True)
-                )
-            else:
-                raise ValueError('Unsupported value for "num_parent_directories"')
-        else:
-            self._complete_cfg = config.ConfigurationSet(
-                config.config_from_dict(dict())
-            )
+        if self.num_parent_directories not in [0, 1, 2]:
+            raise ValueError('Unsupported value for "num_parent_directories"')
+        self._complete_cfg = config.ConfigurationSet(
+            *[ self.get_level_config(level) for level in range(self.num_parent_directories + 1) ]
+        )
         self.add_ephemeral_attributes()
 
     @property
     def complete_cfg(self):
-        """Returns a dictionary of the complete configuration"""
-        if self._complete_cfg is None:
-            self.load_complete_cfg()
-        return dict(self._complete_cfg)
+        """Returns a read-only dictionary of the complete configuration"""
+        if self._complete_cfg_view is None:
+            if self._complete_cfg is None:
+                self.load_complete_cfg()
+            self._complete_cfg_view = types.MappingProxyType(dict(self._complete_cfg))
+        return self._complete_cfg_view
         
     @property
     def complete_cfg_nested(self):
-        """Returns an ordered nested dictionary of the complete configuration"""
+        """Returns a read-only ordered nested dictionary of the complete configuration"""
+        if self._complete_cfg_nested is None:
+            self._complete_cfg_nested = freeze(self.build_complete_cfg_nested())
+        return self._complete_cfg_nested
+
+    def copy_complete_cfg_nested(self):
+        """Returns a mutable ordered nested dictionary of the complete configuration"""
+        return thaw(self.complete_cfg_nested)
+
+    def build_complete_cfg_nested(self):
+        """Builds an ordered nested dictionary of the complete configuration"""
         result = dict()
         for itemname, value in sorted(self.complete_cfg.items()):
             parts = itemname.split('.')
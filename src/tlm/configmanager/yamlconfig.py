@@ -2,14 +2,40 @@
 
 """Class for reading a yaml configuration file"""
 
-import collections
+import collections.abc
+import json
 import logging
 import yaml
 
+# Use the libyaml bindings if available; they produce the same output as the pure Python implementation
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
 
 logger = logging.getLogger(__name__)
 
 
+def get_plain(value):
+    """Returns the given value converted to plain Python types (e.g. tomlkit items) so that it can be serialized canonically"""
+    if hasattr(value, 'unwrap'):  # tomlkit item
+        value = value.unwrap()
+    if isinstance(value, collections.abc.Mapping):
+        return { get_plain(k): get_plain(v) for k, v in value.items() }
+    if isinstance(value, (list, tuple)):
+        return [ get_plain(item) for item in value ]
+    if isinstance(value, bool):
+        return bool(value)
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, float):
+        return float(value)
+    if isinstance(value, str):
+        return str(value)
+    return value
+
+
 class YAMLConfig(object):
     """Class for reading a yaml configuration file"""
     _cfg = dict()  # the configuration dictionary
@@ -49,7 +75,7 @@ class YAMLConfig(object):
             self.set_filename(filename)
         try:
             with open(self._filename, 'r') as ymlfile:
-                self._cfg = yaml.load(ymlfile, Loader=yaml.SafeLoader)
+                self._cfg = yaml.load(ymlfile, Loader=SafeLoader)
         except FileNotFoundError:
             logger.warning('Config file [{0}] not found; just using defaults'.format(self._filename))
         if self._cfg is None:
@@ -66,12 +92,25 @@ class YAMLConfig(object):
         logger.debug('Saving config file [{0}]'.format(filename))
         try:
             with open(filename, 'w') as ymlfile:
-                yaml.dump(self._cfg, ymlfile, default_flow_style=False)
+                ymlfile.write(self.dump())
         except OSError as e:
             logger.warning('Could not write config file [{0}], [{1}]'.format(filename, str(e)))
         self._is_changed = False
         return True
 
+    def dump(self):
+        """Returns the configuration in canonical YAML format (plain types, sorted keys, block style)"""
+        return yaml.dump(get_plain(self._cfg), Dumper=SafeDumper, default_flow_style=False, sort_keys=True)
+
+    def save_json(self, filename):
+        """Saves the current configuration to the given file in JSON format (sidecar of the YAML file that is faster to parse)"""
+        logger.debug('Saving config file [{0}]'.format(filename))
+        try:
+            with open(filename, 'w') as jsonfile:
+                json.dump(get_plain(self._cfg), jsonfile, sort_keys=True, separators=(',', ':'))
+        except OSError as e:
+            logger.warning('Could not write config file [{0}], [{1}]'.format(filename, str(e)))
+
     def get(self, itemname, default=None):
         """Return a specific item from the configuration or the provided default value if not present (low level)"""
         return self._cfg.get(itemname, default)
@@ -146,7 +185,7 @@ class YAMLConfig(object):
             """d: dictionary to examine; r: dictionary to store the result in; p: current prefix to add"""
             for name, value in d.items():
                 key = name if (p == '') else '.'.join([p, name])
-                if isinstance(value, collections.Mapping):
+                if isinstance(value, collections.abc.Mapping):
                     flatten(value, r, key)
                 else:
                     r[key] = value
@@ -154,3 +193,4 @@ class YAMLConfig(object):
         result = dict()
         flatten(self.cfg, result)
         return result
+
@@ -9,42 +9,74 @@ import os
 import pprint
 import shutil
 
+from . import addressallocator
+from . import asnallocator
 from . import configfilecopier
 from .configmanager import configmanager
+from .configmanager import noderecord
 from .configmanager import yamlconfig
 from . import directorycomparer
 from . import filesync
 from . import jinjatransformer
 from . import management_interface
+from . import mirrorstate
+from . import portallocator
+from . import sshpool
+from . import transferengine
+from . import rendercache
 
 
 logger = logging.getLogger(__name__)
 NAME_TEMPOUTPUT_DIRECTORY = 'tmp'
 NAME_OUTPUT_DIRECTORY = 'new'
+NAME_RENDERCACHE_DIRECTORY = 'rendercache'
 NODE_CONFIG_PATH = '/etc/towalink/configs'
+MIRROR_VERSIONS = 0  # default for the number of latest config versions mirrored to the nodes (0 for all)
+# Settings just controlling the controller; they are not part of the effective node configs
+CONTROLLER_SETTINGS = ('update_streaming', 'render_listen_address', 'wg_interface_mode', 'bgp_topology', 'bgp_route_reflector',
+                       'site_topology', 'site_gateway', 'max_parallel_transfers', 'transfer_timeout', 'mirror_versions',
+                       'ssh_multiplexing', 'ssh_control_persist', 'ssh_control_dir')
 WG_INTERFACE = 'tlwg_mgmt'
 WG_LISTENPORT = 51820
+WG_INTERFACE_MODE_LINK = 'link'  # one WireGuard interface per link
+WG_INTERFACE_MODE_SINGLE = 'single'  # one WireGuard interface per node with a peer section per link
+WG_MESH_INTERFACE = 'tlwg_mesh'  # name of the interface in single interface mode
+TEMPLATE_WG_LINK = 'tlwg.conf.jinja'
+TEMPLATE_WG_MULTI = 'tlwg_multi.conf.jinja'
+SKELETON_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'skeleton')
+# Address kinds allocated per node: kind -> (global config setting listing the network pool(s), default)
+ADDRESS_POOLS = { 'loopback_ipv4': ('loopbacknet_ipv4', '192.88.99.0/24'),  # block was formerly used for IPv6 to IPv4 relay
+                  'loopback_ipv6': ('loopbacknet_ipv6', 'fd3e:970c:e7ec:edb5::0/64'),  # UL block was generated randomly
+                  'transfer_ipv4': ('internode_transfernet_ipv4', None),  # defaults to the loopback networks
+                  'transfer_ipv6': ('internode_transfernet_ipv6', 'fe80::0/64') }
 
 
 class ConfigOrchestrator():
     """Class for managing the complete config directory hierarchy"""
 
-    def __init__(self, confdir='/etc/towalink'):
-        """Initializer"""
+    def __init__(self, confdir='/etc/towalink', manage_interface=True):
+        """Initializer (manage_interface=False is used by processes just rendering configs)"""
         self.confdir = confdir
         self.prepare_confdir()
         self.confdir_effective = os.path.join(self.confdir, 'effective')
         self.cm = configmanager.ConfigManager(confdir)
+        self._address_allocators = None
+        self._asn_allocator = None
+        self._port_allocator = None
+        self._ssh_pool = None
+        self._mirror_state = None
         if not os.path.exists(self.confdir_effective):
             os.makedirs(self.confdir_effective)
-        self.mgmt_if = management_interface.MgmtInterface(WG_INTERFACE)
-        self.mgmt_if.ensure_service()
-        self.cm.ensure_config(controller_wg_public=self.mgmt_if.wg_public)
+        self.mgmt_if = None
+        if manage_interface:
+            self.mgmt_if = management_interface.MgmtInterface(WG_INTERFACE)
+            self.mgmt_if.ensure_service()
+            self.cm.ensure_config(controller_wg_public=self.mgmt_if.wg_public)
             
     def prepare_confdir(self):
         """Makes sure that the config directory exists and has proper defaults"""
         if not os.path.exists(self.confdir):
-            shutil.copytree(os.path.join(os.path.dirname(os.path.realpath(__file__)), 'skeleton'), self.confdir)
+            shutil.copytree(SKELETON_DIR, self.confdir)
 
     @staticmethod
     def get_ipaddress_byoffset(network, offset, add_prefixlen=True, keep_prefixlen=False):
@@ -59,6 +91,99 @@ class ConfigOrchestrator():
         else:
             return str(ip)
 
+    def get_allocation_setting(self, setting, default=None):
+        """Returns the value of the given setting that all nodes need to agree on (as addresses, ASNs and ports are allocated installation-wide)"""
+        values = set([ node.record.get_allocation_setting(setting) for node in self.cm.nodes.values() ])
+        if len(values) > 1:
+            values = ', '.join(sorted([ f'[{value}]' for value in values ], key=str))
+            raise ValueError(f'Setting "{setting}" differs between nodes ({values}); it needs to be the same for all nodes')
+        value = values.pop() if (len(values) > 0) else noderecord.get_plain_setting(self.cm.globalconf.get_item(setting))
+        return default if (value is None) else value
+
+    @property
+    def address_allocators(self):
+        """Returns a dictionary of address kind -> AddressAllocator, loaded with the allocations persisted in the generated config"""
+        if self._address_allocators is None:
+            allocators = dict()
+            for kind, (setting, default) in ADDRESS_POOLS.items():
+                if default is None:
+                    default = self.get_allocation_setting(*ADDRESS_POOLS['loopback_ipv4'])
+                pools = self.get_allocation_setting(setting, default)
+                allocator = addressallocator.AddressAllocator(setting, list(pools) if isinstance(pools, tuple) else pools)
+                allocator.load(self.cm.generated.cfg.get('addresses', dict()).get(kind, dict()))
+                allocators[kind] = allocator
+            self._address_allocators = allocators
+        return self._address_allocators
+
+    def allocate_addresses(self):
+        """Allocates the addresses of all nodes (releasing the ones of deleted nodes) and persists them in the generated config"""
+        for kind, allocator in self.address_allocators.items():
+            for node_id in set(allocator.get_index().keys()) - set(self.cm.nodes.keys()):
+                allocator.release(node_id)
+                self.cm.generated.delete_item(f'addresses.{kind}.{node_id}')
+            for node_id in sorted(self.cm.nodes.keys()):
+                allocator.allocate(node_id)
+            for node_id, address in allocator.get_index().items():
+                self.cm.generated.set_item(f'addresses.{kind}.{node_id}', address)
+
+    def get_node_address(self, kind, node_id, add_prefixlen=True, keep_prefixlen=False):
+        """Returns the address of the given kind (e.g. "loopback_ipv4") allocated for the given node"""
+        network, offset = self.address_allocators[kind].get(node_id)
+        return self.get_ipaddress_byoffset(str(network), offset, add_prefixlen=add_prefixlen, keep_prefixlen=keep_prefixlen)
+
+    @property
+    def asn_allocator(self):
+        """Returns the ASNAllocator with the lookup table of the autonomous system numbers of all nodes"""
+        if self._asn_allocator is None:
+            self._asn_allocator = asnallocator.ASNAllocator(self.get_allocation_setting('bgp_as_base', asnallocator.ASN_BASE))
+            self._asn_allocator.allocate_all(self.cm.nodes.keys())
+        return self._asn_allocator
+
+    @property
+    def port_allocator(self):
+        """Returns the PortAllocator loaded with the port allocations persisted in the generated config"""
+        if self._port_allocator is None:
+            self._port_allocator = portallocator.PortAllocator(self.get_allocation_setting('wg_listenport_base', portallocator.PORT_BASE))
+            self._port_allocator.load(self.cm.generated.cfg.get('wg_ports', dict()))
+        return self._port_allocator
+
+    def allocate_ports(self):
+        """Allocates the WireGuard listen ports of all active links and persists the ones deviating from the default in the generated config"""
+        links = [ (node1, node2) for node1, node2, active, wg_active, wg_mtu in self.cm.generated.link_table if wg_active ]
+        self.port_allocator.allocate_links(links)
+        ports = { str(node): { str(peer): port for peer, port in sorted(peers.items()) } for node, peers in sorted(self.port_allocator.get_ports().items()) }
+        existing = self.cm.generated.get('wg_ports')
+        if existing is None:
+            existing = dict()
+        elif hasattr(existing, 'unwrap'):
+            existing = existing.unwrap()
+        if ports != existing:
+            self.cm.generated.set_item('wg_ports', ports)
+
+    def ensure_node_keypairs(self):
+        """Makes sure that each node has a key pair for its single WireGuard interface"""
+        for node_key in list(self.cm.generated.cfg.get('nodes', dict()).keys()):
+            if int(node_key) not in self.cm.nodes:
+                self.cm.generated.delete_item(f'nodes.{node_key}')
+        for node_id in sorted(self.cm.nodes.keys()):
+            self.cm.generated.set_nodedata(node_id)
+
+    def update_generated_config(self):
+        """Makes sure that the automatically generated config (address allocations, links and ports) is current"""
+        single_interface = self.wg_single_interface
+        if single_interface and (self.cm.get_site_topology() == configmanager.SITE_TOPOLOGY_GATEWAY):
+            # The peers' AllowedIPs just cover their own addresses, i.e. traffic passing the gateways would be dropped
+            raise ValueError(f'"wg_interface_mode" "{WG_INTERFACE_MODE_SINGLE}" cannot be combined with "site_topology" "{configmanager.SITE_TOPOLOGY_GATEWAY}"')
+        self.allocate_addresses()
+        if single_interface:
+            self.ensure_node_keypairs()
+        self.cm.update_generated_config(link_keys=not single_interface)
+        if not single_interface:  # a single interface just uses the base port
+            table = self.cm.generated.link_table
+            self.allocate_ports()
+            self.cm.generated.set_link_table(table)  # not affected by the ports
+        self.cm.generated.save_config()
+
     def copy_config_files(self, sourcefolder, destfolder):
         """Copies the config files out of the given source folder hierarchy to the given destination folder"""
         cfc = configfilecopier.ConfigFileCopier()
@@ -88,14 +213,39 @@ class ConfigOrchestrator():
             latest = 'v' + str(latest)
         return latest, next
 
-    def render_template_files(self, data, dir):
-        """Renders the Jinja template files in the given directory using the provided data dictionary"""
+    def render_template_files(self, data, dir, cachedir=None):
+        """Renders the Jinja template files in the given directory using the provided data dictionary
+
+        If a cache directory is given, templates whose input variables did not change since the previous rendering are not rendered again.
+        """
         jt = jinjatransformer.JinjaTransformer(templatedir=dir, globalvars=dict({'grains': dict({'id': 'test'})}))
+        cache = None if cachedir is None else rendercache.RenderCache(cachedir)
+        wg_interface = data.get('wg_interface')
+        if (wg_interface is not None) and not os.path.isfile(os.path.join(dir, TEMPLATE_WG_MULTI)):
+            # Config directories created by earlier versions lack this template
+            shutil.copyfile(os.path.join(SKELETON_DIR, TEMPLATE_WG_MULTI), os.path.join(dir, TEMPLATE_WG_MULTI))
         # Normal Jinga template files
-        jt.render_templatefiles_to_files(dir, data=data, filter_ignore=['tlwg.conf.jinja'])
+        jt.render_templatefiles_to_files(dir, data=data, filter_ignore=[TEMPLATE_WG_LINK, TEMPLATE_WG_MULTI], cache=cache)
         # Wireguard interface configs
         for wglink in data.get('wg_links', dict()).values():
-            jt.render_templatefile_to_file('tlwg.conf.jinja', os.path.join(dir, wglink['wg_ifname']+'.conf'), data=wglink)
+            jt.render_templatefile_to_file(TEMPLATE_WG_LINK, os.path.join(dir, wglink['wg_ifname']+'.conf'), data=wglink, cache=cache)
+        if wg_interface is not None:
+            jt.render_templatefile_to_file(TEMPLATE_WG_MULTI, os.path.join(dir, wg_interface['wg_ifname']+'.conf'), data=wg_interface, cache=cache)
+        if cache is not None:
+            cache.save()
+
+    @property
+    def wg_single_interface(self):
+        """Returns whether each node uses a single WireGuard interface for all its links"""
+        mode = str(self.cm.globalconf.get_item('wg_interface_mode', WG_INTERFACE_MODE_LINK))
+        if mode not in [WG_INTERFACE_MODE_LINK, WG_INTERFACE_MODE_SINGLE]:
+            raise ValueError(f'Invalid value [{mode}] for "wg_interface_mode"; expected "{WG_INTERFACE_MODE_LINK}" or "{WG_INTERFACE_MODE_SINGLE}"')
+        return mode == WG_INTERFACE_MODE_SINGLE
+
+    @property
+    def streaming(self):
+        """Returns whether node configs are rendered in memory-bounded streaming mode"""
+        return bool(self.cm.globalconf.get_item('update_streaming', False))
 
     def update_node(self, node_id):
         """Updates all config files of a single node"""
@@ -106,26 +256,24 @@ class ConfigOrchestrator():
         if not os.path.exists(nodedir):
             os.makedirs(nodedir)
         # Create effective config for the node to be saved in YAML format
-        cfg_effective = yamlconfig.YAMLConfig(d=node.complete_cfg_nested, filename=os.path.join(nodedir, 'config.yaml'))
+        cfg_effective = yamlconfig.YAMLConfig(d=node.copy_complete_cfg_nested(), filename=os.path.join(nodedir, 'config.yaml'))
         # Set defaults, remove config items not to be transferred to effective node config (remember if needed)
-        loopbacknet_ipv4 = cfg_effective.get_item('loopbacknet_ipv4', '192.88.99.0/24') # block was formerly used for IPv6 to IPv4 relay
-        cfg_effective.delete_item('loopbacknet_ipv4')
-        loopbacknet_ipv6 = cfg_effective.get_item('loopbacknet_ipv6', 'fd3e:970c:e7ec:edb5::0/64') # UL block was generated randomly
+        cfg_effective.delete_item('loopbacknet_ipv4')  # addresses are allocated by the address allocators
         cfg_effective.delete_item('loopbacknet_ipv6')
-        bgp_as_base = cfg_effective.get_item('bgp_as_base', 65000)
-        cfg_effective.delete_item('bgp_as_base')
-        internode_transfernet_ipv4 = cfg_effective.get_item('internode_transfernet_ipv4', loopbacknet_ipv4)
+        cfg_effective.delete_item('bgp_as_base')  # autonomous system numbers are allocated by the ASN allocator
         cfg_effective.delete_item('internode_transfernet_ipv4')
-        internode_transfernet_ipv6 = cfg_effective.get_item('internode_transfernet_ipv6', 'fe80::0/64')
         cfg_effective.delete_item('internode_transfernet_ipv6')
-        wg_listenport_base = cfg_effective.get_item('wg_listenport_base', 51820)
-        cfg_effective.delete_item('wg_listenport_base')
+        cfg_effective.delete_item('wg_listenport_base')  # ports are allocated by the port allocator
         cfg_effective.delete_item('config_filename')
-        cfg_effective.set_item('loopback_ipv4', self.get_ipaddress_byoffset(loopbacknet_ipv4, offset=node_id, keep_prefixlen=False))
-        cfg_effective.set_item('loopback_ipv6', self.get_ipaddress_byoffset(loopbacknet_ipv6, offset=node_id, keep_prefixlen=False))
-        cfg_effective.set_item('bgp_as', bgp_as_base + node_id)
-        cfg_effective.set_item('bgp_ipv4', self.get_ipaddress_byoffset(loopbacknet_ipv4, offset=node_id, add_prefixlen=False))
-        cfg_effective.set_item('bgp_ipv6', self.get_ipaddress_byoffset(loopbacknet_ipv6, offset=node_id, add_prefixlen=False))
+        for setting in CONTROLLER_SETTINGS:
+            cfg_effective.delete_item(setting)
+        effective_json = cfg_effective.get_item('effective_json', False)
+        cfg_effective.delete_item('effective_json')
+        cfg_effective.set_item('loopback_ipv4', self.get_node_address('loopback_ipv4', node_id, keep_prefixlen=False))
+        cfg_effective.set_item('loopback_ipv6', self.get_node_address('loopback_ipv6', node_id, keep_prefixlen=False))
+        cfg_effective.set_item('bgp_as', self.asn_allocator.get(node_id))
+        cfg_effective.set_item('bgp_ipv4', self.get_node_address('loopback_ipv4', node_id, add_prefixlen=False))
+        cfg_effective.set_item('bgp_ipv6', self.get_node_address('loopback_ipv6', node_id, add_prefixlen=False))
         cfg_effective.set_item('bgp_peers', dict())
         # Get neighbors from generated config and add their data
         #node_neighbors = self.cm.generated.complete_cfg.get(f'neighbors.{node_id}', list())
@@ -133,83 +281,129 @@ class ConfigOrchestrator():
         #neighbors_loopback_ipv6 = dict()
         #for neighbor_id in node_neighbors:
         #    #neighbor = self.cm.nodes.get(neighbor_id)
-        #    neighbors_loopback_ipv4[neighbor_id] = self.get_ipaddress_byoffset(loopbacknet_ipv4, offset=neighbor_id, add_prefixlen=False)
-        #    neighbors_loopback_ipv6[neighbor_id] = self.get_ipaddress_byoffset(loopbacknet_ipv6, offset=neighbor_id, add_prefixlen=False)
+        #    neighbors_loopback_ipv4[neighbor_id] = self.get_node_address('loopback_ipv4', neighbor_id, add_prefixlen=False)
+        #    neighbors_loopback_ipv6[neighbor_id] = self.get_node_address('loopback_ipv6', neighbor_id, add_prefixlen=False)
         #cfg_effective.set_item('bgp_neighbors_loopback_ipv4', neighbors_loopback_ipv4)
         #cfg_effective.set_item('bgp_neighbors_loopback_ipv6', neighbors_loopback_ipv6)
+        single_interface = self.wg_single_interface
+        if single_interface:
+            cfg_effective.set_item('wg_interface.wg_ifname', WG_MESH_INTERFACE)
+            cfg_effective.set_item('wg_interface.wg_listenport', self.port_allocator.base)
+            wg_private = self.cm.generated.get_nodedata(node_id).get('wg_private')
+            if wg_private is not None:
+                cfg_effective.set_item('wg_interface.wg_private', wg_private)
+            cfg_effective.set_item('wg_interface.wg_addresses', [ self.get_node_address('transfer_ipv6', node_id, keep_prefixlen=True) ])
+            cfg_effective.set_item('wg_interface.wg_address_ipv4', self.get_node_address('transfer_ipv4', node_id, keep_prefixlen=False))
+            cfg_effective.set_item('wg_interface.wg_address_ipv6', self.get_node_address('transfer_ipv6', node_id, keep_prefixlen=False))
+            cfg_effective.set_item('wg_interface.wg_peers', dict())
+            wg_mtus = list()
         # Add link data from generated config
-        links = self.cm.generated.complete_cfg_nested.get('links', dict())
-        for linkname, data in links.items():
-            if str(node_id) in linkname.partition('-'):
-                if data.get('wg_active'):
-                    peer = list(linkname.partition('-'))[0::2] # get the two peers without delimiter
-                    peer.remove(str(node_id))
-                    peer = peer[0]
-                    peerdata = self.cm.nodes.get(int(peer))
-                    # Wireguard attributes
-                    wg_ifname = f'tlwg_{peer}'
-                    cfg_effective.set_item(f'wg_links.{peer}.wg_ifname', wg_ifname)
-                    cfg_effective.set_item(f'wg_links.{peer}.wg_listenport', wg_listenport_base + int(peer))
-                    if data.get('wg_mtu') is not None:
-                        cfg_effective.set_item(f'wg_links.{peer}.wg_mtu', data.get('wg_mtu'))
-                    #Removed IPv4 addresses since it is added by other means (i.e. post-up directive)
-                    #wg_addresses = [ self.get_ipaddress_byoffset(internode_transfernet_ipv4, offset=node_id, keep_prefixlen=True),
-                    #                 self.get_ipaddress_byoffset(internode_transfernet_ipv6, offset=node_id, keep_prefixlen=True) ]
-                    wg_addresses = [ self.get_ipaddress_byoffset(internode_transfernet_ipv6, offset=node_id, keep_prefixlen=True) ]
-                    cfg_effective.set_item(f'wg_links.{peer}.wg_addresses', wg_addresses)
-                    cfg_effective.set_item(f'wg_links.{peer}.wg_address_ipv4', self.get_ipaddress_byoffset(internode_transfernet_ipv4, offset=node_id, keep_prefixlen=False))
-                    cfg_effective.set_item(f'wg_links.{peer}.wg_address_ipv6', self.get_ipaddress_byoffset(internode_transfernet_ipv6, offset=node_id, keep_prefixlen=False))
-                    cfg_effective.set_item(f'wg_links.{peer}.wg_peer_address_ipv4', self.get_ipaddress_byoffset(internode_transfernet_ipv4, offset=int(peer), keep_prefixlen=False))
-                    cfg_effective.set_item(f'wg_links.{peer}.wg_peer_address_ipv6', self.get_ipaddress_byoffset(internode_transfernet_ipv6, offset=int(peer), keep_prefixlen=False))
-                    peer_hostname = str(self.cm.nodes[int(peer)].get('node_hostname', 'localhost'))
-                    cfg_effective.set_item(f'wg_links.{peer}.wg_peer_endpoint', peer_hostname + ':' + str(wg_listenport_base + node_id))
-                    wg_allowedips = list()
-                    wg_allowedips.append(self.get_ipaddress_byoffset(internode_transfernet_ipv4, offset=int(peer), keep_prefixlen=False))
-                    wg_allowedips.append(self.get_ipaddress_byoffset(internode_transfernet_ipv6, offset=int(peer), keep_prefixlen=False))
-                    wg_allowedips.append('0.0.0.0/0')
-                    wg_allowedips.append('0::0/0')
-                    cfg_effective.set_item(f'wg_links.{peer}.wg_peer_allowedips', wg_allowedips)
-                    if data.get(f'wg_private_{node_id}') is not None:
-                        cfg_effective.set_item(f'wg_links.{peer}.wg_private', data[f'wg_private_{node_id}'])
-                    if data.get(f'wg_public_{peer}') is not None:
-                        cfg_effective.set_item(f'wg_links.{peer}.wg_peer_public', data[f'wg_public_{peer}'])
-                    if data.get('wg_preshared') is not None:
-                        cfg_effective.set_item(f'wg_links.{peer}.wg_peer_preshared', data['wg_preshared'])
-                    cfg_effective.set_item_default(f'wg_links.{peer}.wg_peer_keepalive', 25)
-                if data.get('active'):
-                    # BGP attributes
-                    cfg_effective.set_item(f'bgp_peers.{peer}.as', bgp_as_base + int(peer))
-                    cfg_effective.set_item(f'bgp_peers.{peer}.name', '{site_name}_{node_name}_{peer}'.format(site_name=peerdata.complete_cfg.get('site_name'), node_name=peerdata.complete_cfg.get('node_name'), peer=peer))
-                    cfg_effective.set_item(f'bgp_peers.{peer}.ip', self.get_ipaddress_byoffset(loopbacknet_ipv4, offset=int(peer), add_prefixlen=False))
-                    cfg_effective.set_item(f'bgp_peers.{peer}.loopback_ipv4', self.get_ipaddress_byoffset(loopbacknet_ipv4, offset=int(peer), keep_prefixlen=True))
-                    cfg_effective.set_item(f'bgp_peers.{peer}.loopback_ipv6', self.get_ipaddress_byoffset(loopbacknet_ipv6, offset=int(peer), keep_prefixlen=True))
-                    cfg_effective.set_item(f'bgp_peers.{peer}.ifname_local', wg_ifname)
-                    cfg_effective.set_item(f'bgp_peers.{peer}.password', data.get('bgp_password'))
+        streaming = self.streaming
+        for peer, active, wg_active, wg_mtu in self.cm.generated.link_table.iter_node_links(node_id):
+            if not (active or wg_active):
+                continue
+            peernode = self.cm.nodes.get(peer)
+            if peernode is None:  # link to a node that has been deleted
+                continue
+            peerdata = peernode.record
+            if streaming:
+                peernode.release()  # just keep the compact record
+            data = self.cm.generated.get_linkdata(node_id, peer)
+            wg_ifname = WG_MESH_INTERFACE if single_interface else f'tlwg_{peer}'
+            if wg_active and single_interface:
+                # Wireguard attributes of the peer section on the single interface
+                cfg_effective.set_item(f'wg_interface.wg_peers.{peer}.wg_peer_address_ipv4', self.get_node_address('transfer_ipv4', peer, keep_prefixlen=False))
+                cfg_effective.set_item(f'wg_interface.wg_peers.{peer}.wg_peer_address_ipv6', self.get_node_address('transfer_ipv6', peer, keep_prefixlen=False))
+                cfg_effective.set_item(f'wg_interface.wg_peers.{peer}.wg_peer_endpoint', peerdata.hostname + ':' + str(self.port_allocator.base))
+                # Peers share the interface, i.e. each one may just get the addresses that are reachable via it
+                wg_allowedips = [ self.get_node_address('transfer_ipv4', peer, keep_prefixlen=False),
+                                  self.get_node_address('transfer_ipv6', peer, keep_prefixlen=False),
+                                  self.get_node_address('loopback_ipv4', peer, keep_prefixlen=False),
+                                  self.get_node_address('loopback_ipv6', peer, keep_prefixlen=False) ]
+                wg_allowedips.extend(peerdata.wg_allowedips)
+                cfg_effective.set_item(f'wg_interface.wg_peers.{peer}.wg_peer_allowedips', list(dict.fromkeys(wg_allowedips)))
+                wg_peer_public = self.cm.generated.get_nodedata(peer).get('wg_public')
+                if wg_peer_public is not None:
+                    cfg_effective.set_item(f'wg_interface.wg_peers.{peer}.wg_peer_public', wg_peer_public)
+                if data.get('wg_preshared') is not None:
+                    cfg_effective.set_item(f'wg_interface.wg_peers.{peer}.wg_peer_preshared', data['wg_preshared'])
+                cfg_effective.set_item_default(f'wg_interface.wg_peers.{peer}.wg_peer_keepalive', 25)
+                if wg_mtu is not None:
+                    wg_mtus.append(wg_mtu)
+            elif wg_active:
+                # Wireguard attributes
+                cfg_effective.set_item(f'wg_links.{peer}.wg_ifname', wg_ifname)
+                cfg_effective.set_item(f'wg_links.{peer}.wg_listenport', self.port_allocator.get(node_id, peer))
+                if wg_mtu is not None:
+                    cfg_effective.set_item(f'wg_links.{peer}.wg_mtu', wg_mtu)
+                #Removed IPv4 addresses since it is added by other means (i.e. post-up directive)
+                #wg_addresses = [ self.get_node_address('transfer_ipv4', node_id, keep_prefixlen=True),
+                #                 self.get_node_address('transfer_ipv6', node_id, keep_prefixlen=True) ]
+                wg_addresses = [ self.get_node_address('transfer_ipv6', node_id, keep_prefixlen=True) ]
+                cfg_effective.set_item(f'wg_links.{peer}.wg_addresses', wg_addresses)
+                cfg_effective.set_item(f'wg_links.{peer}.wg_address_ipv4', self.get_node_address('transfer_ipv4', node_id, keep_prefixlen=False))
+                cfg_effective.set_item(f'wg_links.{peer}.wg_address_ipv6', self.get_node_address('transfer_ipv6', node_id, keep_prefixlen=False))
+                cfg_effective.set_item(f'wg_links.{peer}.wg_peer_address_ipv4', self.get_node_address('transfer_ipv4', peer, keep_prefixlen=False))
+                cfg_effective.set_item(f'wg_links.{peer}.wg_peer_address_ipv6', self.get_node_address('transfer_ipv6', peer, keep_prefixlen=False))
+                peer_hostname = peerdata.hostname
+                cfg_effective.set_item(f'wg_links.{peer}.wg_peer_endpoint', peer_hostname + ':' + str(self.port_allocator.get(peer, node_id)))
+                wg_allowedips = list()
+                wg_allowedips.append(self.get_node_address('transfer_ipv4', peer, keep_prefixlen=False))
+                wg_allowedips.append(self.get_node_address('transfer_ipv6', peer, keep_prefixlen=False))
+                wg_allowedips.append('0.0.0.0/0')
+                wg_allowedips.append('0::0/0')
+                cfg_effective.set_item(f'wg_links.{peer}.wg_peer_allowedips', wg_allowedips)
+                if data.get(f'wg_private_{node_id}') is not None:
+                    cfg_effective.set_item(f'wg_links.{peer}.wg_private', data[f'wg_private_{node_id}'])
+                if data.get(f'wg_public_{peer}') is not None:
+                    cfg_effective.set_item(f'wg_links.{peer}.wg_peer_public', data[f'wg_public_{peer}'])
+                if data.get('wg_preshared') is not None:
+                    cfg_effective.set_item(f'wg_links.{peer}.wg_peer_preshared', data['wg_preshared'])
+                cfg_effective.set_item_default(f'wg_links.{peer}.wg_peer_keepalive', 25)
+            if active:
+                # BGP attributes
+                cfg_effective.set_item(f'bgp_peers.{peer}.as', self.asn_allocator.get(peer))
+                cfg_effective.set_item(f'bgp_peers.{peer}.name', '{site_name}_{node_name}_{peer}'.format(site_name=peerdata.sitename, node_name=peerdata.name, peer=peer))
+                cfg_effective.set_item(f'bgp_peers.{peer}.ip', self.get_node_address('loopback_ipv4', peer, add_prefixlen=False))
+                cfg_effective.set_item(f'bgp_peers.{peer}.loopback_ipv4', self.get_node_address('loopback_ipv4', peer, keep_prefixlen=True))
+                cfg_effective.set_item(f'bgp_peers.{peer}.loopback_ipv6', self.get_node_address('loopback_ipv6', peer, keep_prefixlen=True))
+                cfg_effective.set_item(f'bgp_peers.{peer}.ifname_local', wg_ifname)
+                cfg_effective.set_item(f'bgp_peers.{peer}.password', data.get('bgp_password'))
+        if single_interface and (len(wg_mtus) > 0):
+            cfg_effective.set_item('wg_interface.wg_mtu', min(wg_mtus))  # the interface needs to fit the smallest link MTU
         # Save changes
         cfg_effective.save_config()
+        if effective_json:
+            cfg_effective.save_json(os.path.join(nodedir, 'config.json'))
         # Copying config files
         sourcefolder = os.path.dirname(node.complete_cfg.get('config_filename'))
         self.copy_config_files(sourcefolder=sourcefolder, destfolder=nodedir)
         # Render Jinja template files
-        self.render_template_files(data=cfg_effective.cfg, dir=nodedir)
+        self.render_template_files(data=cfg_effective.cfg, dir=nodedir, cachedir=os.path.join(self.get_node_dir(node_id), NAME_RENDERCACHE_DIRECTORY))
         # Finally rename folder containing the node's config files
         outputdir = os.path.join(self.confdir_effective, f'node_{node_id}', NAME_OUTPUT_DIRECTORY)
         with contextlib.suppress(FileNotFoundError):
             shutil.rmtree(outputdir)
         os.rename(nodedir, outputdir)
+        if streaming:
+            # Release the node's config; it is loaded again in case it is needed later on
+            node.release()
 
     def update_site(self, sitename):
         """Updates all config files of a site's nodes"""
         site = self.cm.sites.get(sitename)
         if site is None:
             raise ValueError('A site with this name does not exist')
-        for node in site.site_nodes:
-            self.update_node(node.get('node_id'))
+        self.update_nodes([ node.get('node_id') for node in site.site_nodes ])
+
+    def update_nodes(self, node_ids):
+        """Updates all config files of the given nodes"""
+        for node_id in node_ids:
+            self.update_node(node_id)
 
     def update_all(self):
         """Updates all config files of all nodes"""
-        for node_id in self.cm.nodes:
-            self.update_node(node_id)
+        self.update_nodes(self.cm.nodes)
 
     def process_new_configversion(self, node_id, dryrun=False):
         """Process the newly created config folder for the given node"""
@@ -235,8 +429,37 @@ class ConfigOrchestrator():
             # Rename "new" folder to version folder
             logger.debug(f'Config for node {node_id} is saved as version [{subdir_next}]')
             os.rename(dir_new, dir_next)
+            if subdir_latest is not None:
+                self.link_unchanged_files(dir_latest, dir_next)
         return True
 
+    def link_unchanged_files(self, dir_latest, dir_next):
+        """Replaces the files of the given new version directory that are unchanged compared to the latest version by hardlinks to them
+
+        Version directories are never modified once created. Mirroring preserves the hardlinks (rsync -H) so that
+        unchanged files are neither transferred again nor stored again on the node.
+        """
+        dc = directorycomparer.DirectoryComparer()
+        for file in os.listdir(dir_next):
+            file_latest = os.path.join(dir_latest, file)
+            file_next = os.path.join(dir_next, file)
+            if (not os.path.isfile(file_latest)) or (not os.path.isfile(file_next)) or os.path.islink(file_latest) or os.path.islink(file_next):
+                continue
+            if os.stat(file_latest).st_mode != os.stat(file_next).st_mode:
+                continue
+            if dc.compare_file_contents(file_latest, file_next):
+                tmpname = file_next + '.tmp'
+                os.link(file_latest, tmpname)
+                os.replace(tmpname, file_next)
+
+    def process_new_configversion_nodes(self, node_ids, dryrun=False):
+        """Process the newly created config folders for the given nodes; returns the dictionary of changed nodes"""
+        changed = dict()
+        for node_id in node_ids:
+            if self.process_new_configversion(node_id, dryrun = dryrun):
+                changed[node_id] = self.cm.nodes[node_id]
+        return changed
+
     def process_new_configversion_site(self, sitename, dryrun=False):
         """Process the newly created config folder for all nodes of the given site"""
         changed = dict()
@@ -258,21 +481,165 @@ class ConfigOrchestrator():
                 changed[node_id] = node
         return self.cm.nodes, changed
 
-    def mirror_node_configs(self, nodes):
-        """Mirrors the config files of the given nodes to the respective devices"""
-        for node_id in nodes:
-            node = self.cm.nodes.get(node_id)
-            node_fullname = node.complete_cfg.get('node_fullname')
-            mgmt_address = node.get('attach_mgmt_address')
-            if mgmt_address is None:
-                logger.warning(f'Node [{node_id}] does not seem to have been attached; attach_mgmt_address is missing; skipping')
-                continue            
-            logger.debug(f'Mirroring config files for node [{node_id}] with management address [{mgmt_address}]')
-            fs = filesync.FileSync(sourcepath=self.get_node_dir(node_id), destpath=NODE_CONFIG_PATH)
-            fs.mirror_node_configs(node_fullname, mgmt_address)
+    def get_mgmt_target(self, node_id):
+        """Returns the full name and the management address (None if not attached) of the given node"""
+        node = self.cm.nodes.get(node_id)
+        return node.complete_cfg.get('node_fullname'), node.get('attach_mgmt_address')
+
+    def cleanup_node_dirs(self, node_ids, keep_new=()):
+        """Removes temporary directories left over by interrupted runs for the given nodes (except the "new" directories of the nodes in keep_new)"""
+        for node_id in node_ids:
+            nodedir = self.get_node_dir(node_id)
+            dirs = [NAME_TEMPOUTPUT_DIRECTORY] if (node_id in keep_new) else [NAME_TEMPOUTPUT_DIRECTORY, NAME_OUTPUT_DIRECTORY]
+            for dir in dirs:
+                if os.path.isdir(os.path.join(nodedir, dir)):
+                    logger.debug(f'Removing left-over directory [{dir}] of node [{node_id}]')
+                    shutil.rmtree(os.path.join(nodedir, dir))
+
+    @property
+    def max_parallel_transfers(self):
+        """Returns the maximum number of concurrent transfers to nodes"""
+        return int(self.cm.globalconf.get_item('max_parallel_transfers', transferengine.MAX_PARALLEL_TRANSFERS))
+
+    @property
+    def transfer_engine(self):
+        """Returns a transfer engine according to the global config"""
+        timeout = int(self.cm.globalconf.get_item('transfer_timeout', transferengine.TRANSFER_TIMEOUT))
+        return transferengine.TransferEngine(max_parallel=self.max_parallel_transfers, timeout=timeout)
+
+    @property
+    def ssh_pool(self):
+        """Returns the pool of SSH master connections to the nodes (None if disabled in the global config)"""
+        if (self._ssh_pool is None) and self.cm.globalconf.get_item('ssh_multiplexing', True):
+            self._ssh_pool = sshpool.SSHPool(control_dir=str(self.cm.globalconf.get_item('ssh_control_dir', sshpool.CONTROL_DIR)),
+                                             persist=int(self.cm.globalconf.get_item('ssh_control_persist', sshpool.CONTROL_PERSIST)))
+        return self._ssh_pool
+
+    def get_ansible_env(self):
+        """Returns the environment for calling Ansible (None for the inherited one)"""
+        if self.ssh_pool is None:
+            return None
+        env = dict(os.environ)
+        env.update(self.ssh_pool.get_ansible_env())
+        return env
+
+    def close(self):
+        """Releases resources held beyond single operations (like SSH master connections)"""
+        if self._ssh_pool is not None:
+            self._ssh_pool.close()
+            self._ssh_pool = None
+
+    def get_filesync(self, node_id, timeout):
+        """Returns a FileSync object for transferring the config files of the given node"""
+        ssh_command = None if (self.ssh_pool is None) else self.ssh_pool.get_ssh_command()
+        return filesync.FileSync(sourcepath=self.get_node_dir(node_id), destpath=NODE_CONFIG_PATH, timeout=timeout, ssh_command=ssh_command)
+
+    @property
+    def mirror_state(self):
+        """Returns the record of the config versions mirrored to the nodes"""
+        if self._mirror_state is None:
+            self._mirror_state = mirrorstate.MirrorState(self.confdir_effective)
+        return self._mirror_state
+
+    def get_config_versions(self, node_id):
+        """Returns the list of config version directories of the given node (sorted by version)"""
+        nodedir = self.get_node_dir(node_id)
+        if not os.path.isdir(nodedir):
+            return list()
+        versions = [ item for item in os.listdir(nodedir) if item.startswith('v') and item[1:].isnumeric() and os.path.isdir(os.path.join(nodedir, item)) ]
+        return sorted(versions, key=lambda x: int(x[1:]))
+
+    def get_active_configversion(self, node_id):
+        """Returns the config version directory the "active" symlink of the given node points to (None if there is none)"""
+        try:
+            return os.path.basename(os.readlink(os.path.join(self.get_node_dir(node_id), 'active')))
+        except OSError:
+            return None
+
+    @property
+    def mirror_versions(self):
+        """Returns the number of latest config versions mirrored to the nodes (0 for all)"""
+        return int(self.cm.globalconf.get_item('mirror_versions', MIRROR_VERSIONS))
+
+    def get_mirror_versions(self, node_id):
+        """Returns the list of config version directories of the given node to be present on the node device
+
+        These are the latest "mirror_versions" versions plus the active one (or all versions if "mirror_versions" is 0).
+        """
+        versions = self.get_config_versions(node_id)
+        if (self.mirror_versions <= 0) or (len(versions) <= self.mirror_versions):
+            return versions
+        active = self.get_active_configversion(node_id)
+        return [ item for item in versions[:-self.mirror_versions] if item == active ] + versions[-self.mirror_versions:]
+
+    def get_mirror_signature(self, node_id, mgmt_address):
+        """Returns the signature of the config versions of the given node to be mirrored to the given management address"""
+        return self.mirror_state.get_signature(mgmt_address, self.get_mirror_versions(node_id))
+
+    def is_mirrored(self, node_id, mgmt_address):
+        """Returns whether all config versions of the given node are known to be present on its device"""
+        return self.mirror_state.get(node_id) == self.get_mirror_signature(node_id, mgmt_address)
+
+    def mirror_node(self, node_id, timeout=None, force=False, activate=False, version=None, mgmt_target=None):
+        """Mirrors the config files of the given node to its device unless known to be in sync (or force=True); returns the transfer status
+
+        With activate=True, the requested config version (None for the latest one) is activated in the same transfer.
+        The node's full name and management address may be passed as "mgmt_target" by callers that must not access the node object.
+        """
+        node_fullname, mgmt_address = self.get_mgmt_target(node_id) if (mgmt_target is None) else mgmt_target
+        if mgmt_address is None:
+            logger.warning(f'Node [{node_id}] does not seem to have been attached; attach_mgmt_address is missing; skipping')
+            return transferengine.STATUS_SKIPPED
+        if activate:
+            try:
+                self.set_active_configversion(node_id, version)
+            except ValueError as e:
+                logger.warning(f'Node [{node_id}]: {e}; skipping')
+                return transferengine.STATUS_SKIPPED, str(e)
+        signature = self.get_mirror_signature(node_id, mgmt_address)
+        if (not force) and (not activate) and (self.mirror_state.get(node_id) == signature):
+            logger.debug(f'Config files of node [{node_id}] are already in sync; not mirroring')
+            return transferengine.STATUS_CURRENT
+        logger.debug(f'Mirroring config files for node [{node_id}] with management address [{mgmt_address}]')
+        versions = None if (self.mirror_versions <= 0) else self.get_mirror_versions(node_id)
+        _, _, returncode = self.get_filesync(node_id, timeout).mirror_node_configs(node_fullname, mgmt_address, activate=activate, versions=versions)
+        if returncode != 0:
+            self.mirror_state.set(node_id, None)  # the state of the node is unknown now
+            return transferengine.STATUS_FAILED, f'rsync exit code {returncode}'
+        self.mirror_state.set(node_id, signature)
+        return transferengine.STATUS_OK
+
+    def mirror_nodes(self, nodes, callback=None, force=False, activate=False):
+        """Mirrors the config files of the given nodes to the respective devices in parallel; returns the list of TransferResult objects"""
+        engine = self.transfer_engine
+        try:
+            return engine.run(nodes, lambda node_id: self.mirror_node(node_id, engine.timeout, force=force, activate=activate), callback=callback)
+        finally:
+            self.mirror_state.save()
+
+    def mirror_node_configs(self, nodes, force=False, activate=False):
+        """Mirrors the config files of the given nodes to the respective devices; returns the list of nodes for which mirroring failed"""
+        return [ result.node_id for result in self.mirror_nodes(nodes, force=force, activate=activate) if result.failed ]
+
+    def set_active_configversion(self, node_id, version=None):
+        """Points the "active" symlink of the given node to the requested config version (None for the latest one); returns the version directory"""
+        nodedir = self.get_node_dir(node_id)
+        latest, _ = self.get_latest_configdir(nodedir)
+        if latest is None:
+            raise ValueError('no committed config')
+        if version is None:
+            versiondir = latest
+        else:
+            versiondir = 'v' + version
+        if not os.path.isdir(os.path.join(nodedir, versiondir)):
+            raise ValueError(f'no config version [{versiondir}]')
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(os.path.join(nodedir, 'active'))
+        os.symlink(versiondir, os.path.join(nodedir, 'active'))
+        return versiondir
 
     def activate_nodeconfigs(self, nodes, version='latest'):
-        """Activates the requested config version on the given node devices"""
+        """Activates the requested config version on the given node devices in parallel; returns the list of TransferResult objects"""
         # Validate version parameter
         if version is None:
             raise ValueError('Version must not be None')
@@ -286,34 +653,39 @@ class ConfigOrchestrator():
                 version = None
         if (version is not None) and (not version.isnumeric()):
             raise ValueError('Version is malformed')
-        # Iterate through nodes
-        for node_id in nodes:
-            node = self.cm.nodes.get(node_id)   
-            node_fullname = node.complete_cfg.get('node_fullname')
-            mgmt_address = node.get('attach_mgmt_address')
-            if mgmt_address is None:
-                logger.warning(f'Node [{node_id}] does not seem to have been attached; attach_mgmt_address is missing; skipping')
-                continue            
-            # Create symlink to active configuration
-            nodedir = self.get_node_dir(node_id)
-            latest, _ = self.get_latest_configdir(nodedir)
-            if latest is None:
-                logger.warning(f'Node [{node_id}] does not have a committed config; skipping')
-                continue
-            if version is None:
-                versiondir = latest
-            else:
-                versiondir = 'v' + version
-            if not os.path.isdir(os.path.join(nodedir, versiondir)):
-                logger.warning(f'Node [{node_id}] does not have a directory with config version [{versiondir}]')
-                continue
-            with contextlib.suppress(FileNotFoundError):
-                os.unlink(os.path.join(nodedir, 'active'))
-            os.symlink(versiondir, os.path.join(nodedir, 'active'))
-            # Mirroring changes to node
-            logger.info(f'Activating config for node [{node_id}]')
-            fs = filesync.FileSync(sourcepath=self.get_node_dir(node_id), destpath=NODE_CONFIG_PATH)
-            fs.mirror_node_active(node_fullname, mgmt_address)
+        engine = self.transfer_engine
+        return engine.run(nodes, lambda node_id: self.activate_nodeconfig(node_id, version, engine.timeout))
+
+    def activate_nodeconfig(self, node_id, version=None, timeout=None):
+        """Activates the requested config version (None for the latest one) on the given node device; returns the transfer status
+
+        If the config versions are known to be present on the device, just the "active" symlink is transferred
+        (a constant-size operation). Otherwise, the versions are mirrored along with the symlink in one transfer.
+        """
+        node = self.cm.nodes.get(node_id)   
+        node_fullname = node.complete_cfg.get('node_fullname')
+        mgmt_address = node.get('attach_mgmt_address')
+        if mgmt_address is None:
+            logger.warning(f'Node [{node_id}] does not seem to have been attached; attach_mgmt_address is missing; skipping')
+            return transferengine.STATUS_SKIPPED
+        versiondir = None if (version is None) else 'v' + version
+        if (not self.is_mirrored(node_id, mgmt_address)) or ((versiondir is not None) and (versiondir not in self.get_mirror_versions(node_id))):
+            logger.info(f'Config versions of node [{node_id}] are not known to be present on the node; mirroring them along with activation')
+            try:
+                return self.mirror_node(node_id, timeout, activate=True, version=version)
+            finally:
+                self.mirror_state.save()
+        try:
+            self.set_active_configversion(node_id, version)
+        except ValueError as e:
+            logger.warning(f'Node [{node_id}]: {e}; skipping')
+            return transferengine.STATUS_SKIPPED, str(e)
+        # Transferring the symlink to the node
+        logger.info(f'Activating config for node [{node_id}]')
+        _, _, returncode = self.get_filesync(node_id, timeout).mirror_node_active(node_fullname, mgmt_address)
+        if returncode != 0:
+            return transferengine.STATUS_FAILED, f'rsync exit code {returncode}'
+        return transferengine.STATUS_OK
 
 
 if __name__ == '__main__':
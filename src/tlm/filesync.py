@@ -5,27 +5,37 @@
 import logging
 import os
 import shlex
+import signal
 import subprocess
 
 
 logger = logging.getLogger(__name__)
 RSYNC_PATH_SPECIAL='/opt/towalink/scripts/rsync-nodecfg.sh'
+SSH_COMMAND_DEFAULT='ssh -o ConnectTimeout=2'
 
 
 class FileSync(object):
     """Class for executing rsync"""
 
-    def __init__(self, sourcepath, destpath):
+    def __init__(self, sourcepath, destpath, timeout=None, ssh_command=None):
         """Object initialization"""
         self.sourcepath = sourcepath
         self.destpath = destpath
+        self.timeout = timeout  # maximum duration of a command in seconds (None for no limit)
+        self.ssh_command = SSH_COMMAND_DEFAULT if (ssh_command is None) else ssh_command  # e.g. using a pool of SSH master connections
     
     def execute(self, command, suppressoutput=False, suppresserrors=False):
         """Execute a command"""
         logger.debug(f'Executing {command}')
         args = shlex.split(command)
-        nsp = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        out, err = nsp.communicate()
+        nsp = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=(self.timeout is not None))
+        try:
+            out, err = nsp.communicate(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            os.killpg(nsp.pid, signal.SIGKILL)  # also kill ssh started by rsync
+            nsp.communicate()
+            logger.error(f'Command did not finish within {self.timeout} seconds: {command}')
+            raise
         if err is not None:
             err = err.decode('utf8')
             if not suppresserrors and (len(err) > 0):
@@ -48,18 +58,38 @@ class FileSync(object):
         opts = ' '.join(opts)
         return self.execute(opts)
  
-    def mirror_node_configs(self, node_fullname, hostname):
-        """Mirror a Node's config files to the Node"""
-        logger.info(f'Mirroring configs to {node_fullname}({hostname})')
+    def get_version_filters(self, versions):
+        """Returns the rsync options for mirroring just the given version directories and deleting other versions on the Node"""
+        rules = [ f'+ /{item}' for item in versions ]
+        rules.append('H /v*')  # don't send other versions
+        rules.append('R /v*')  # delete other versions on the Node
+        rules.append('P /*')  # don't touch anything else on the Node
+        return ['--delete'] + [ f'"--filter={rule}"' for rule in rules ]
+
+    def mirror_node_configs(self, node_fullname, hostname, activate=False, versions=None):
+        """Mirror a Node's config files to the Node (including the active config version if "activate" is set)
+
+        If a list of version directories is given, just these are mirrored and other versions are deleted on the Node.
+        """
         src = self.sourcepath + '/'
         dst = '[' + hostname + ']:' + self.destpath
-        excludes = ['tmp', 'new', 'active']
-        #rsync -a --exclude=new --exclude=tmp --exclude=active /etc/towalink/effective/node_12/ [fe80::c%tlwg_mgmt]:/etc/towalink/configs
-        return self.exec_rsync(src=src, dst=dst, options=['-a', '-q', '-e', '"ssh -o ConnectTimeout=2"'], excludes=excludes)
+        options = ['-a', '-H', '-q', '-e', f'"{self.ssh_command}"']  # -H: unchanged files of a version are hardlinks to the previous version
+        if activate:
+            # The "active" symlink is transferred along with the versions; the node applies it once the transfer succeeded
+            logger.info(f'Mirroring configs and active config to {node_fullname}({hostname})')
+            excludes = ['tmp', 'new', 'rendercache']
+            options.insert(3, '--delay-updates')
+        else:
+            logger.info(f'Mirroring configs to {node_fullname}({hostname})')
+            excludes = ['tmp', 'new', 'active', 'rendercache']
+        if versions is not None:
+            options.extend(self.get_version_filters(versions))
+        #rsync -a -H --exclude=new --exclude=tmp --exclude=active --exclude=rendercache /etc/towalink/effective/node_12/ [fe80::c%tlwg_mgmt]:/etc/towalink/configs
+        return self.exec_rsync(src=src, dst=dst, options=options, excludes=excludes, rsync_path=RSYNC_PATH_SPECIAL if activate else None)
 
     def mirror_node_active(self, node_fullname, hostname):
-        """Mirror a Node's active config version to the Node"""
+        """Mirror a Node's active config version to the Node (just the "active" symlink; the version needs to be present on the Node)"""
         logger.info(f'Mirroring active config to {node_fullname}({hostname})')
         src = os.path.join(self.sourcepath, 'active')
         dst = '[' + hostname + ']:' + self.destpath
-        return self.exec_rsync(src=src, dst=dst, options=['-a', '-q', '-e', '"ssh -o ConnectTimeout=2"'], rsync_path=RSYNC_PATH_SPECIAL)
+        return self.exec_rsync(src=src, dst=dst, options=['-a', '-q', '-e', f'"{self.ssh_command}"'], rsync_path=RSYNC_PATH_SPECIAL)
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import hashlib
 import jinja2
+import jinja2.meta
 import logging
 import os
 
@@ -18,12 +20,47 @@ class JinjaTransformer(object):
         self.env = jinja2.Environment(loader=jinja2.FileSystemLoader(self.templatedir))
         if globalvars is not None:
             self.env.globals.update(globalvars)
+        self._dependencies = dict()  # cache: template filename -> (variables, source digest)
     
     def load_template(self, filename):
         '''Loads a Jinja2 template from the given file'''
         self._filename = filename
         self.template = self.env.get_template(self._filename)
 
+    def get_template_dependencies(self, filename):
+        '''Returns the top-level variables read by the given template and a digest of its source (variables are None if not determinable)'''
+        if filename in self._dependencies:
+            return self._dependencies[filename]
+        variables = set()
+        h = hashlib.sha256()
+        pending = [filename]
+        seen = set()
+        while pending:
+            name = pending.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            source, _, _ = self.env.loader.get_source(self.env, name)
+            h.update(name.encode('utf-8') + b'\0' + source.encode('utf-8') + b'\0')
+            ast = self.env.parse(source)
+            variables.update(jinja2.meta.find_undeclared_variables(ast))
+            for referenced in jinja2.meta.find_referenced_templates(ast):
+                if referenced is None:  # dynamic include/import; dependencies can't be known
+                    variables = None
+                    break
+                pending.append(referenced)
+            if variables is None:
+                break
+        self._dependencies[filename] = (variables, h.hexdigest())
+        return self._dependencies[filename]
+
+    def get_template_inputs(self, filename, data):
+        '''Returns the subset of the given data (dictionary) read by the given template (None if not determinable)'''
+        variables, _ = self.get_template_dependencies(filename)
+        if variables is None:
+            return None
+        return { var: data.get(var, self.env.globals.get(var)) for var in sorted(variables) }
+
     def render_template(self, data):
         '''Renders the template with the given data (dictionary)'''
         if self.template is None:
@@ -50,24 +87,37 @@ class JinjaTransformer(object):
         self.render_template(data)
         self.save_output(outfile)
 
-    def render_templatefile_to_file(self, infile, outfile=None, data=None):
-        '''Convenience function to render the given template to the specified output using the provided data (dictionary)'''
+    def render_templatefile_to_file(self, infile, outfile=None, data=None, cache=None):
+        '''Convenience function to render the given template to the specified output using the provided data (dictionary)
+
+        If a render cache is provided, the previous output is reused in case none of the variables read by the template changed.
+        '''
         if outfile is None:
             if infile.endswith('.jinja'):
                 outfile = infile[0:-6]
             else:
                 raise ValueError('No output filename specified')
+        key = None
+        if cache is not None:
+            inputs = self.get_template_inputs(infile, data)
+            if inputs is not None:
+                _, digest = self.get_template_dependencies(infile)
+                key = cache.get_key(digest, inputs)
+                if cache.restore(outfile, key, os.path.join(self.templatedir, outfile)):
+                    return
         self.load_template(infile)
         self.render_template(data)
         self.save_output(outfile)
+        if key is not None:
+            cache.store(outfile, key, os.path.join(self.templatedir, outfile))
 
-    def render_templatefiles_to_files(self, dir, data=None, filter_ignore=None):
+    def render_templatefiles_to_files(self, dir, data=None, filter_ignore=None, cache=None):
         '''Convenience function to render all template files in the given directory using the provided data (dictionary)'''
         if filter_ignore is None:
             filter_ignore = []
         files = [ item for item in os.listdir(dir) if item.endswith('.jinja') and not (item in filter_ignore) ]
         for file in files:
-            self.render_templatefile_to_file(file, data=data)
+            self.render_templatefile_to_file(file, data=data, cache=cache)
 
 
 def clever_function(a, b):
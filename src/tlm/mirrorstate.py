@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+"""Class for remembering which config versions have been mirrored to the nodes"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+
+
+logger = logging.getLogger(__name__)
+MIRROR_STATE_FILENAME = 'mirror_state.json'
+
+
+class MirrorState(object):
+    """Class for remembering which config versions have been mirrored to the nodes
+
+    For each node, the signature of the last successfully mirrored state (management address and
+    config version directories) is stored in a JSON file in the directory of the effective configs.
+    Nodes whose current signature matches the stored one don't need to be mirrored again.
+    """
+
+    def __init__(self, path):
+        """Object initialization"""
+        self.filename = os.path.join(path, MIRROR_STATE_FILENAME)
+        self.lock = threading.Lock()
+        self.signatures = None  # node_id -> signature; loaded on first access
+        self.is_changed = False
+
+    @staticmethod
+    def get_signature(mgmt_address, versions):
+        """Returns the signature of the given management address and list of config version directories"""
+        data = json.dumps([str(mgmt_address), sorted(versions)])
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def load(self):
+        """Loads the stored signatures"""
+        try:
+            with open(self.filename, 'r') as f:
+                self.signatures = { int(node_id): signature for node_id, signature in json.load(f).items() }
+        except FileNotFoundError:
+            self.signatures = dict()
+        except (ValueError, AttributeError):
+            logger.warning(f'Ignoring unreadable mirror state file [{self.filename}]')
+            self.signatures = dict()
+        self.is_changed = False
+
+    def get(self, node_id):
+        """Returns the signature of the last state mirrored to the given node (None if unknown)"""
+        with self.lock:
+            if self.signatures is None:
+                self.load()
+            return self.signatures.get(node_id)
+
+    def set(self, node_id, signature):
+        """Records that the state with the given signature has been mirrored to the given node (None to forget the node)"""
+        with self.lock:
+            if self.signatures is None:
+                self.load()
+            if signature is None:
+                self.is_changed |= self.signatures.pop(node_id, None) is not None
+            elif self.signatures.get(node_id) != signature:
+                self.signatures[node_id] = signature
+                self.is_changed = True
+
+    def save(self):
+        """Saves the signatures if changed"""
+        with self.lock:
+            if not self.is_changed:
+                return False
+            tmpname = self.filename + '.tmp'
+            with open(tmpname, 'w') as f:
+                json.dump({ str(node_id): signature for node_id, signature in sorted(self.signatures.items()) }, f, indent=0)
+            os.replace(tmpname, self.filename)
+            self.is_changed = False
+            return True
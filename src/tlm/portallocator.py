@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+"""Class for allocating the WireGuard listen ports of the links of nodes"""
+
+import collections
+import itertools
+import logging
+
+
+logger = logging.getLogger(__name__)
+PORT_BASE = 51820
+PORT_MAX = 65535
+PORT_MIN = 1024  # lowest port allocated below the base once the ports above it are exhausted
+
+
+class PortAllocator(object):
+    """Class for allocating the WireGuard listen ports of the links of nodes
+
+    On node x, the link to node y listens on (base + y) as long as this is a valid port that is not taken,
+    i.e. existing installations keep their ports. Other links get the lowest free port above the base; once
+    these are exhausted, the lowest free port from PORT_MIN up to the base. Thus, a node can have up to
+    (PORT_MAX - PORT_MIN) links if the base is at least PORT_MIN.
+    Only these allocated ports need to be persisted (dictionary node -> peer -> port); all others are computed.
+    """
+
+    def __init__(self, base=PORT_BASE):
+        """Object initialization"""
+        self.base = int(base)
+        self._allocated = dict()  # (node, peer) -> port of links not using the default port
+        self._taken = collections.defaultdict(set)  # node -> allocated ports on the node
+        self._used = collections.defaultdict(set)  # node -> allocated and default ports on the node (while allocating)
+        self._next_free = dict()  # node -> port from which to search for free ports
+
+    def load(self, ports):
+        """Loads persisted allocations (dictionary node -> peer -> port)"""
+        for node, peers in ports.items():
+            for peer, port in peers.items():
+                self._allocated[(int(node), int(peer))] = int(port)
+                self._taken[int(node)].add(int(port))
+
+    def get_ports(self):
+        """Returns the allocations as dictionary (node -> peer -> port) to be persisted"""
+        result = collections.defaultdict(dict)
+        for (node, peer), port in self._allocated.items():
+            result[node][peer] = port
+        return result
+
+    def get_default_port(self, peer):
+        """Returns the default port for links to the given peer; None if beyond the valid port range"""
+        port = self.base + peer
+        return port if (port <= PORT_MAX) else None
+
+    def find_free(self, node):
+        """Returns the lowest free port above the base on the given node (or below the base if there is none above)"""
+        start = self._next_free.get(node, self.base + 1)
+        if start > self.base:
+            candidates = itertools.chain(range(start, PORT_MAX + 1), range(PORT_MIN, self.base))
+        else:
+            candidates = range(start, self.base)
+        for port in candidates:
+            if port not in self._used[node]:
+                self._next_free[node] = port + 1
+                return port
+        raise ValueError(f'No free WireGuard listen port left on node [{node}]')
+
+    def allocate_links(self, links):
+        """Allocates the ports of both ends of the given links (tuples of node identifiers) and releases the ones of all other links"""
+        links = set(links) | set( (peer, node) for node, peer in links )
+        for key in set(self._allocated.keys()) - links:
+            self._taken[key[0]].discard(self._allocated.pop(key))
+        self._used = collections.defaultdict(set, { node: set(ports) for node, ports in self._taken.items() })
+        self._next_free = dict()
+        # Reserve default ports first so that links getting allocated ports don't take them
+        pending = list()
+        for node, peer in sorted(links):
+            if (node, peer) in self._allocated:
+                continue
+            port = self.get_default_port(peer)
+            if (port is None) or (port in self._taken[node]):  # beyond port range or taken by an allocated port
+                pending.append((node, peer))
+            else:
+                self._used[node].add(port)
+        for node, peer in pending:
+            port = self.find_free(node)
+            self._allocated[(node, peer)] = port
+            self._taken[node].add(port)
+            self._used[node].add(port)
+        if len(pending) > 0:
+            logger.info(f'Allocated [{len(pending)}] WireGuard listen port(s) deviating from the default ports')
+
+    def get(self, node, peer):
+        """Returns the port on the given node for the link to the given peer"""
+        port = self._allocated.get((node, peer))
+        if port is None:
+            port = self.get_default_port(peer)
+            if port is None:
+                raise ValueError(f'No WireGuard listen port allocated on node [{node}] for the link to node [{peer}]')
+        return port
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""Class for caching rendered template output along with the inputs it was rendered from"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import pprint
+import shutil
+
+
+logger = logging.getLogger(__name__)
+INDEX_FILENAME = 'index.json'
+
+
+class RenderCache(object):
+    """Class for caching rendered template output along with the inputs it was rendered from
+
+    Cached output is stored as "<output filename>.<key>" so that a file never changes its content once written.
+    An index entry (just updated in "save") thus never refers to output rendered from other inputs, even if
+    rendering was interrupted after storing some output.
+    """
+
+    def __init__(self, path):
+        """Object initialization"""
+        self.path = path
+        self._index = dict()  # output filename -> key of the inputs the cached output was rendered from
+        self._used = dict()  # entries that were used or stored since loading
+        self.hits = 0
+        self.misses = 0
+        self.load_index()
+
+    def load_index(self):
+        """Loads the index of cached output files"""
+        try:
+            with open(os.path.join(self.path, INDEX_FILENAME), 'r') as f:
+                self._index = json.load(f)
+        except FileNotFoundError:
+            self._index = dict()
+        except ValueError:
+            logger.warning(f'Render cache index in [{self.path}] is corrupt; ignoring it')
+            self._index = dict()
+
+    @staticmethod
+    def get_key(template_digest, inputs):
+        """Returns the key identifying the given template source digest rendered with the given input variables"""
+        h = hashlib.sha256(template_digest.encode('utf-8'))
+        h.update(pprint.pformat(inputs).encode('utf-8'))
+        return h.hexdigest()
+
+    def get_cachefile(self, name, key):
+        """Returns the path of the cached output of the given output filename rendered from the inputs identified by key"""
+        return os.path.join(self.path, f'{name}.{key}')
+
+    def restore(self, outfile, key, destfile):
+        """Copies the cached output to the given file if it was rendered from the same inputs; returns whether this was possible"""
+        name = os.path.basename(outfile)
+        cachefile = self.get_cachefile(name, key)
+        if (self._index.get(name) != key) or (not os.path.isfile(cachefile)):
+            self.misses += 1
+            return False
+        shutil.copyfile(cachefile, destfile)
+        self._used[name] = key
+        self.hits += 1
+        return True
+
+    def store(self, outfile, key, sourcefile):
+        """Remembers the given rendered output file as being rendered from the inputs identified by key"""
+        name = os.path.basename(outfile)
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        cachefile = self.get_cachefile(name, key)
+        shutil.copyfile(sourcefile, cachefile + '.tmp')
+        os.replace(cachefile + '.tmp', cachefile)
+        self._used[name] = key
+
+    def save(self):
+        """Saves the index and removes cached output that was not used anymore"""
+        if not os.path.exists(self.path):
+            return
+        used = { os.path.basename(self.get_cachefile(name, key)) for name, key in self._used.items() }
+        for item in set(os.listdir(self.path)) - used - {INDEX_FILENAME}:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(os.path.join(self.path, item))
+        filename = os.path.join(self.path, INDEX_FILENAME)
+        with open(filename + '.tmp', 'w') as f:
+            json.dump(self._used, f, sort_keys=True)
+        os.replace(filename + '.tmp', filename)
+        self._index = dict(self._used)
+        logger.debug(f'Render cache [{self.path}]: [{self.hits}] output file(s) reused, [{self.misses}] rendered')
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+"""Classes for distributing the rendering of node configs to worker processes"""
+
+# Protocol: newline-terminated JSON messages over a TCP connection initiated by the worker
+#   worker      -> coordinator: {"op": "hello", "token": <token>, "worker": <name>}
+#   coordinator -> worker:      {"op": "welcome", "generated_hash": <hash>}
+#   coordinator -> worker:      {"op": "render", "nodes": [<node_id>, ...]}  or  {"op": "done"}
+#   worker      -> coordinator: {"op": "result", "manifests": {<node_id>: {<file>: <sha256>}}, "failed": {<node_id>: <error>}}
+# Workers need access to the config directory (e.g. local processes or machines sharing it).
+# They render into the nodes' "new" directories; versioning and git are left to the coordinator.
+
+import hashlib
+import hmac
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import secrets
+import socket
+import threading
+
+from . import configorchestrator
+
+
+logger = logging.getLogger(__name__)
+CHUNK_SIZE = 16  # number of nodes handed out to a worker at once
+
+
+def send_message(f, message):
+    """Sends a message to the given file-like socket object"""
+    f.write(json.dumps(message).encode('utf-8') + b'\n')
+    f.flush()
+
+def receive_message(f):
+    """Receives a message from the given file-like socket object; returns None if the connection was closed"""
+    line = f.readline()
+    if len(line) == 0:
+        return None
+    return json.loads(line.decode('utf-8'))
+
+def get_manifest(dir):
+    """Returns a dictionary of the files in the given directory and the hashes of their content"""
+    manifest = dict()
+    for root, dirs, files in os.walk(dir):
+        for file in files:
+            filename = os.path.join(root, file)
+            with open(filename, 'rb') as f:
+                manifest[os.path.relpath(filename, dir)] = hashlib.sha256(f.read()).hexdigest()
+    return manifest
+
+def parse_address(address):
+    """Parses an address in the format "host:port" (IPv6 hosts in brackets) into a tuple"""
+    host, _, port = address.rpartition(':')
+    if not port.isnumeric():
+        raise ValueError('Address of the render coordinator is expected as "<host>:<port>"')
+    return host.strip('[]'), int(port)
+
+def run_worker(confdir, address, token, name=None):
+    """Runs a render worker connecting to the coordinator at the given address (tuple of host and port or "host:port" string)"""
+    if isinstance(address, str):
+        address = parse_address(address)
+    worker = RenderWorker(confdir, address, token, name)
+    return worker.run()
+
+
+class RenderWorker(object):
+    """Class for rendering node configs on behalf of a render coordinator"""
+
+    def __init__(self, confdir, address, token, name=None):
+        """Object initialization"""
+        self.confdir = confdir
+        self.address = tuple(address)
+        self.token = token
+        self.name = name if name is not None else f'{socket.gethostname()}:{os.getpid()}'
+
+    def render_nodes(self, co, node_ids):
+        """Renders the configs of the given nodes; returns the manifests of the rendered nodes and the errors of the failed ones"""
+        manifests = dict()
+        failed = dict()
+        for node_id in node_ids:
+            try:
+                co.update_node(node_id)
+                manifests[node_id] = get_manifest(os.path.join(co.get_node_dir(node_id), configorchestrator.NAME_OUTPUT_DIRECTORY))
+            except Exception as e:
+                logger.error(f'Render worker [{self.name}] failed rendering node [{node_id}]: [{e}]')
+                failed[node_id] = str(e)
+        return manifests, failed
+
+    def run(self):
+        """Connects to the coordinator and renders node configs until there is no more work; returns the number of rendered nodes"""
+        co = configorchestrator.ConfigOrchestrator(self.confdir, manage_interface=False)
+        num_rendered = 0
+        with socket.create_connection(self.address) as conn:
+            f = conn.makefile('rwb')
+            send_message(f, {'op': 'hello', 'token': self.token, 'worker': self.name})
+            welcome = receive_message(f)
+            if (welcome is None) or (welcome.get('op') != 'welcome'):
+                logger.error(f'Render worker [{self.name}] was rejected by the coordinator')
+                return num_rendered
+            if welcome.get('generated_hash') != co.cm.generated.get_hash():
+                logger.error(f'Render worker [{self.name}] sees a generated config different from the coordinator\'s; exiting')
+                return num_rendered
+            while True:
+                message = receive_message(f)
+                if (message is None) or (message.get('op') != 'render'):
+                    break
+                manifests, failed = self.render_nodes(co, message.get('nodes', list()))
+                num_rendered += len(manifests)
+                send_message(f, {'op': 'result', 'manifests': manifests, 'failed': failed})
+        logger.debug(f'Render worker [{self.name}] rendered [{num_rendered}] node(s)')
+        return num_rendered
+
+
+class RenderCoordinator(object):
+    """Class for handing out node ranges to render workers and collecting their results"""
+
+    def __init__(self, co, node_ids, generated_hash, address=('127.0.0.1', 0), chunk_size=CHUNK_SIZE):
+        """Object initialization"""
+        self.co = co  # instance of ConfigOrchestrator
+        self.node_ids = list(node_ids)
+        self.generated_hash = generated_hash
+        self.token = secrets.token_hex(16)
+        self.chunks = queue.Queue()
+        for i in range(0, len(self.node_ids), chunk_size):
+            self.chunks.put(self.node_ids[i:i+chunk_size])
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.num_connections = 0
+        self.rendered = dict()  # node_id -> manifest of rendered files
+        self.failed = dict()  # node_id -> error message
+        self.sock = socket.socket(socket.AF_INET6 if (':' in address[0]) else socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(address)
+        self.sock.listen()
+        self.address = self.sock.getsockname()[:2]
+
+    def check_finished(self):
+        """Signals completion once all nodes have been rendered or have failed"""
+        if len(self.rendered) + len(self.failed) >= len(self.node_ids):
+            self.finished.set()
+
+    def process_result(self, chunk, message):
+        """Processes the result message of a worker for the given chunk of nodes"""
+        manifests = { int(node_id): manifest for node_id, manifest in message.get('manifests', dict()).items() }
+        failed = { int(node_id): error for node_id, error in message.get('failed', dict()).items() }
+        for node_id in chunk:
+            if node_id in manifests:
+                # Make sure that the coordinator sees the files the worker rendered
+                outputdir = os.path.join(self.co.get_node_dir(node_id), configorchestrator.NAME_OUTPUT_DIRECTORY)
+                if get_manifest(outputdir) != manifests[node_id]:
+                    failed[node_id] = 'rendered files differ from the manifest reported by the worker'
+            elif node_id not in failed:
+                failed[node_id] = 'not reported by worker'
+        with self.lock:
+            for node_id in chunk:
+                if node_id in failed:
+                    self.failed[node_id] = failed[node_id]
+                else:
+                    self.rendered[node_id] = manifests[node_id]
+            self.check_finished()
+
+    def handle_connection(self, conn):
+        """Serves a single worker connection"""
+        chunk = None
+        try:
+            f = conn.makefile('rwb')
+            hello = receive_message(f)
+            if (hello is None) or (hello.get('op') != 'hello') or not hmac.compare_digest(str(hello.get('token')), self.token):
+                logger.warning('Rejecting render worker connection with invalid token')
+                return
+            worker = hello.get('worker')
+            logger.debug(f'Render worker [{worker}] connected')
+            send_message(f, {'op': 'welcome', 'generated_hash': self.generated_hash})
+            while True:
+                try:
+                    chunk = self.chunks.get_nowait()
+                except queue.Empty:
+                    send_message(f, {'op': 'done'})
+                    break
+                send_message(f, {'op': 'render', 'nodes': chunk})
+                message = receive_message(f)
+                if (message is None) or (message.get('op') != 'result'):
+                    raise ConnectionError('worker did not deliver a result')
+                self.process_result(chunk, message)
+                chunk = None
+        except (OSError, ValueError) as e:
+            logger.warning(f'Connection to render worker failed: [{e}]')
+        finally:
+            if chunk is not None:
+                self.chunks.put(chunk)  # hand out the nodes again
+            conn.close()
+            with self.lock:
+                self.num_connections -= 1
+
+    def accept_connections(self):
+        """Accepts worker connections until the socket is closed"""
+        self.sock.settimeout(1)
+        while not self.finished.is_set():
+            try:
+                conn, _ = self.sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            conn.settimeout(None)
+            with self.lock:
+                self.num_connections += 1
+            threading.Thread(target=self.handle_connection, args=(conn,), daemon=True).start()
+
+    def render_remaining(self):
+        """Renders the nodes not handed out yet in this process (used if no worker is left)"""
+        worker = RenderWorker(self.co.confdir, self.address, self.token, name='coordinator')
+        while True:
+            try:
+                chunk = self.chunks.get_nowait()
+            except queue.Empty:
+                break
+            manifests, failed = worker.render_nodes(self.co, chunk)
+            self.process_result(chunk, {'manifests': manifests, 'failed': failed})
+
+    def run(self, num_workers=1):
+        """Spawns the given number of local worker processes and waits until all nodes are rendered; returns the dictionaries of rendered and failed nodes"""
+        if len(self.node_ids) == 0:
+            return self.rendered, self.failed
+        ctx = multiprocessing.get_context('spawn')
+        processes = [ ctx.Process(target=run_worker, args=(self.co.confdir, self.address, self.token, f'local-{i}'), daemon=True) for i in range(num_workers) ]
+        for process in processes:
+            process.start()
+        threading.Thread(target=self.accept_connections, daemon=True).start()
+        while not self.finished.wait(timeout=1):
+            with self.lock:
+                idle = (self.num_connections == 0)
+            if idle and not any([ process.is_alive() for process in processes ]):
+                logger.warning('No render worker left; rendering remaining nodes in the coordinator')
+                self.render_remaining()
+                break
+        self.sock.close()
+        for process in processes:
+            process.join()
+        return self.rendered, self.failed
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+"""Class for a pool of multiplexed SSH master connections"""
+
+import logging
+import os
+import subprocess
+
+
+logger = logging.getLogger(__name__)
+CONTROL_DIR = '/run/towalink/ssh'  # directory for the control sockets of the master connections
+CONTROL_PERSIST = 60  # seconds a master connection stays up after its last use (0: until the pool is closed)
+CONNECT_TIMEOUT = 2  # seconds
+
+
+class SSHPool(object):
+    """Class for a pool of multiplexed SSH master connections
+
+    Using OpenSSH connection multiplexing, the first ssh connection to a node becomes a master connection
+    that later connections to the same node (rsync for mirroring and activating, Ansible) reuse without
+    a new key exchange. Masters stay up for "persist" seconds after their last use, so that they are also
+    reused by subsequent runs; with persist=0 they are kept until the pool is closed. Closing the pool
+    stops the masters (persist=0) or just removes control sockets whose master is gone.
+    """
+
+    def __init__(self, control_dir=CONTROL_DIR, persist=CONTROL_PERSIST, connect_timeout=CONNECT_TIMEOUT):
+        """Object initialization"""
+        self.control_dir = control_dir
+        self.persist = int(persist)
+        self.connect_timeout = connect_timeout
+        os.makedirs(self.control_dir, mode=0o700, exist_ok=True)
+
+    @property
+    def control_path(self):
+        return os.path.join(self.control_dir, '%C')  # hash of local host, remote host, port and user; keeps the path short
+
+    def get_ssh_options(self):
+        """Returns the list of ssh options for using the pool"""
+        persist = 'yes' if (self.persist == 0) else f'{self.persist}s'
+        return [ '-o', f'ConnectTimeout={self.connect_timeout}', '-o', 'ControlMaster=auto',
+                 '-o', f'ControlPath={self.control_path}', '-o', f'ControlPersist={persist}' ]
+
+    def get_ssh_command(self):
+        """Returns the ssh command line for using the pool (e.g. for "rsync -e")"""
+        return ' '.join(['ssh'] + self.get_ssh_options())
+
+    def get_ansible_env(self):
+        """Returns the environment variables making Ansible use the pool"""
+        persist = 'yes' if (self.persist == 0) else f'{self.persist}s'
+        return { 'ANSIBLE_SSH_ARGS': f'-o ConnectTimeout={self.connect_timeout} -o ControlMaster=auto -o ControlPersist={persist}',
+                 'ANSIBLE_SSH_CONTROL_PATH': self.control_path.replace('%', '%%') }  # Ansible applies Python string formatting
+
+    def get_sockets(self):
+        """Returns the list of control sockets in the control directory"""
+        try:
+            return [ os.path.join(self.control_dir, item) for item in sorted(os.listdir(self.control_dir)) ]
+        except FileNotFoundError:
+            return list()
+
+    def control(self, socket, command):
+        """Sends the given control command ("check" or "exit") to the master of the given socket; returns whether it succeeded"""
+        args = ['ssh', '-o', f'ControlPath={socket}', '-O', command, 'tlm-pool']  # the host name is ignored as the socket is given
+        try:
+            result = subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+        return result.returncode == 0
+
+    def close(self):
+        """Closes the pool; stops the master connections if they are only kept for the lifetime of the pool"""
+        for socket in self.get_sockets():
+            if self.persist == 0:
+                self.control(socket, 'exit')
+            elif self.control(socket, 'check'):
+                continue  # master is still up and may be reused by subsequent runs
+            if os.path.exists(socket):
+                logger.debug(f'Removing control socket [{socket}]')
+                try:
+                    os.unlink(socket)
+                except OSError:
+                    pass
+        if len(self.get_sockets()) == 0:
+            try:
+                os.rmdir(self.control_dir)
+            except OSError:
+                pass
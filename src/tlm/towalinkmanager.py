@@ -3,30 +3,54 @@
 """Interface class to control the current Towalink installation"""
 
 import ast
+import json
 import logging
+import os
 import pprint
+import shlex
+import sys
 
 from . import ansiblecaller
+from . import commitjournal
+from . import commitpipeline
 from . import configorchestrator
+from .configmanager import attributeindex
+from .configmanager import inventory
+from .configmanager import yamlconfig
 from . import gitcaller
 from . import nodeattacher
+from . import renderworker
+from . import transferengine
 
 
 logger = logging.getLogger(__name__);
 ATTR_MGMT_ADDRESS = 'attach_mgmt_address'
+OUTPUT_FORMAT_TEXT = 'text'  # human-readable output
+OUTPUT_FORMAT_JSON = 'json'  # one JSON document
+OUTPUT_FORMAT_NDJSON = 'ndjson'  # one JSON record per line
+BATCH_OPERATIONS = { 'set': 'set', 'add': 'add', 'create': 'add', 'del': 'del', 'delete': 'del', 'remove': 'del',
+                     'show': 'show', 'show-all': 'show_all', 'show_all': 'show_all' }  # operation (including synonyms) -> method prefix
+BATCH_METHODS = { 'set_global': 2, 'set_site': 3, 'set_node': 3, 'set_select': 3, 'add_site': 1, 'add_node': 1, 'del_site': 1, 'del_node': 1,
+                  'show_global': 0, 'show_site': 1, 'show_node': 1, 'show_all_site': 1, 'show_all_node': 1, 'show_select': 1 }  # method -> number of arguments
 
 
 class TLM():
     """Interface class to control the current Towalink installation"""
     co = None # holds an instance of ConfigOrchestrator
+    output_format = OUTPUT_FORMAT_TEXT
 
-    def __init__(self, confdir='/etc/towalink'):
+    def __init__(self, confdir='/etc/towalink', output_format=OUTPUT_FORMAT_TEXT):
         """Initializer"""
         self.confdir = confdir
+        self.output_format = output_format
         self.co = configorchestrator.ConfigOrchestrator(confdir)
         #self.co.update_all()
         #self.co.process_new_configversion_all()
 
+    def close(self):
+        """Releases resources held beyond single operations (like SSH master connections)"""
+        self.co.close()
+
     def get_nodeid(self, node):
         """Returns the id of the specified node"""
         if node.isnumeric():
@@ -39,19 +63,38 @@ class TLM():
                 node = nodes[0]
         return node
 
+    @property
+    def text_output(self):
+        return self.output_format == OUTPUT_FORMAT_TEXT
+
+    def print_data(self, data):
+        """Prints the given configuration data in the requested output format"""
+        if self.text_output:
+            pprint.pprint(data)
+        else:
+            print(json.dumps(yamlconfig.get_plain(data), indent=2, sort_keys=True))
+
     def print_nodes(self, nodes, reference_complete_cfg=False):
         """Prints the given nodes in readable manner"""
         if reference_complete_cfg:
             nodes = { id: data.complete_cfg for id, data in nodes.items() }
         nodes = [ ( id, data.get('site_name'), data.get('node_name'), data.get('node_fullname') ) for id, data in nodes.items() ]
-        for node in sorted(nodes, key=lambda x: [x[1], x[2]]):
+        nodes = sorted(nodes, key=lambda x: [x[1], x[2]])
+        if not self.text_output:
+            print(json.dumps([ { 'node_id': node[0], 'site_name': node[1], 'node_name': node[2], 'node_fullname': node[3] } for node in nodes ], indent=2))
+            return len(nodes)
+        for node in nodes:
             print(f'{node[3]} ({node[0]})')
         return len(nodes)
 
     def print_sites(self, sites):
         """Prints the given sites in readable manner"""
         sites = [ ( id, data.get('site_name') ) for id, data in sites.items() ]
-        for site in sorted(sites, key=lambda x: x[1]):
+        sites = sorted(sites, key=lambda x: x[1])
+        if not self.text_output:
+            print(json.dumps([ site[1] for site in sites ], indent=2))
+            return len(sites)
+        for site in sites:
             print(f'{site[1]}')
         return len(sites)
 
@@ -62,7 +105,7 @@ class TLM():
     def list_sites(self):
         """Prints site information"""
         sites = self.get_site_list()
-        if self.print_sites(sites) == 0:
+        if (self.print_sites(sites) == 0) and self.text_output:
             print('There are no sites as of now')
 
     def get_node_list(self, site):
@@ -79,7 +122,7 @@ class TLM():
             return
         # Nodes
         nodes = self.get_node_list(site)
-        if self.print_nodes(nodes) == 0:
+        if (self.print_nodes(nodes) == 0) and self.text_output:
             print('There are no nodes as of now')
 
     def get_conf_global(self):
@@ -88,27 +131,27 @@ class TLM():
 
     def show_global(self):
         """Prints the global configuration"""
-        pprint.pprint(self.get_conf_global())
+        self.print_data(self.get_conf_global())
 
     def get_conf_site(self, site, complete=False):
         """Returns a dictionary of the configuration of the given site"""
         site = self.co.cm.sites[site]
         if complete:
-            return site.complete_cfg
+            return dict(site.complete_cfg)
         else:
             return site.cfg
 
     def show_site(self, site):
         """Prints the configuration of the given site"""
         try:
-            pprint.pprint(self.get_conf_site(site))
+            self.print_data(self.get_conf_site(site))
         except KeyError:
             print('The given site does not exist')
 
     def show_all_site(self, site):
         """Prints the complete configuration of the given site"""
         try:
-            pprint.pprint(self.get_conf_site(site, complete=True))
+            self.print_data(self.get_conf_site(site, complete=True))
         except KeyError:
             print('The given site does not exist')
 
@@ -125,24 +168,105 @@ class TLM():
             print(e)
             return
         if complete:
-            return node.complete_cfg
+            return dict(node.complete_cfg)
         else:
             return node.cfg
 
     def show_node(self, node):
         """Prints the configuration of the given node"""
         try:
-            pprint.pprint(self.get_conf_node(node))
+            self.print_data(self.get_conf_node(node))
         except KeyError:
             print('The given node does not exist')
 
     def show_all_node(self, node):
         """Prints the complete configuration of the given node"""
         try:
-            pprint.pprint(self.get_conf_node(node, complete=True))
+            self.print_data(self.get_conf_node(node, complete=True))
         except KeyError:
             print('The given node does not exist')
 
+    def get_selected_nodes(self, selector):
+        """Returns the identifiers of the nodes matching the given selector"""
+        node_ids = self.co.cm.select_nodes(selector)
+        if len(node_ids) == 0:
+            raise ValueError('No node matches the given selector')
+        return node_ids
+
+    def show_select(self, selector):
+        """Prints the nodes matching the given selector"""
+        try:
+            node_ids = self.get_selected_nodes(selector)
+        except ValueError as e:
+            print(e)
+            return
+        self.print_nodes({ node_id: self.co.cm.nodes[node_id] for node_id in node_ids }, reference_complete_cfg=True)
+
+    def query(self, *predicates):
+        """Prints the nodes satisfying all given predicates together with the values of the attributes referred to"""
+        try:
+            node_ids = self.co.cm.query_nodes(predicates)
+            attrs = [ attributeindex.parse_predicate(predicate)[0] for predicate in predicates ]
+        except ValueError as e:
+            print(e)
+            return
+        index = self.co.cm.attribute_index
+        attrs = list(dict.fromkeys(attrs))
+        nodes = [ (index.get_value(node_id, 'site_name'), index.get_value(node_id, 'node_name'), node_id) for node_id in node_ids ]
+        if not self.text_output:
+            self.print_data([ dict([('node_id', node_id), ('node_fullname', f'{nodename}.{sitename}')] + [ (attr, index.get_value(node_id, attr)) for attr in attrs ])
+                              for sitename, nodename, node_id in sorted(nodes) ])
+            return
+        for sitename, nodename, node_id in sorted(nodes):
+            values = ' '.join([ f'{attr}={index.get_value(node_id, attr)}' for attr in attrs ])
+            print(f'{nodename}.{sitename} ({node_id}): {values}')
+        if len(nodes) == 0:
+            print('No node matches the given predicates')
+
+    def export_nodes(self, node_ids):
+        """Streams the complete configs of the given nodes to stdout (one record per line for "ndjson", an array for "json")"""
+        as_array = (self.output_format == OUTPUT_FORMAT_JSON)
+        out = sys.stdout
+        try:
+            if as_array:
+                out.write('[')
+            for i, node_id in enumerate(sorted(node_ids)):
+                node = self.co.cm.nodes[node_id]
+                record = json.dumps(yamlconfig.get_plain(node.complete_cfg), sort_keys=True)
+                if as_array:
+                    record = ('\n' if (i == 0) else ',\n') + record
+                else:
+                    record += '\n'
+                out.write(record)
+                out.flush()  # let consumers process the records while the export is running
+                node.release()  # the complete config is not needed anymore
+            if as_array:
+                out.write('\n]\n')
+                out.flush()
+        except BrokenPipeError:  # consumer stopped reading
+            os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())  # avoid another error when stdout is flushed on exit
+
+    def export_all(self):
+        """Streams the complete configs of all nodes to stdout"""
+        self.export_nodes(self.co.cm.nodes.keys())
+
+    def export_site(self, site):
+        """Streams the complete configs of the nodes of the given site to stdout"""
+        site = self.co.cm.sites.get(site)
+        if site is None:
+            print('A site with this name does not exist', file=sys.stderr)
+            return
+        self.export_nodes([ node.get('node_id') for node in site.site_nodes ])
+
+    def export_select(self, selector):
+        """Streams the complete configs of the nodes matching the given selector to stdout"""
+        try:
+            node_ids = self.co.cm.select_nodes(selector)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return
+        self.export_nodes(node_ids)
+
     def add_site(self, site):
         """Creates the specified site"""
         try:
@@ -157,6 +281,17 @@ class TLM():
         except ValueError as e:
             print(e)
 
+    def import_inventory(self, filename):
+        """Creates the sites and nodes of the given inventory file (YAML or CSV)"""
+        try:
+            inv = inventory.Inventory(filename)
+            num_sites, num_nodes = self.co.cm.import_inventory(inv)
+        except (OSError, ValueError) as e:
+            print(e)
+            return
+        self.co.update_generated_config()
+        print(f'Imported [{num_sites}] new sites and [{num_nodes}] new nodes (hint: use "tlm commit" to create their configuration)')
+
     def del_site(self, site):
         """Removes the specified site"""
         try:
@@ -189,7 +324,9 @@ class TLM():
                 value = int(value)
             # Set new value
             confobj.set_item(attr, value)
-        confobj.save_config()
+        self.co.cm.set_nodes_changed()  # the complete configs of the nodes may have changed
+        if not self.co.cm.batch:  # in batch mode, all changes are saved at the end
+            confobj.save_config()
 
     def set_global(self, attr, value):
         """Sets an attribute in the global configuration"""
@@ -214,6 +351,60 @@ class TLM():
         except KeyError:
             print('The specified node does not exist')            
 
+    def parse_batch(self, lines):
+        """Returns a list of tuples of method name and arguments for the given lines of batch operations"""
+        operations = list()
+        for lineno, line in enumerate(lines, start=1):
+            try:
+                args = shlex.split(line, comments=True)
+            except ValueError as e:
+                raise ValueError(f'Line {lineno}: {e}')
+            if len(args) == 0:
+                continue
+            if len(args) < 2:
+                raise ValueError(f'Line {lineno}: operation and entity expected')
+            operation = BATCH_OPERATIONS.get(args[0])
+            method = f'{operation}_{args[1]}'
+            if (operation is None) or (method not in BATCH_METHODS):
+                raise ValueError(f'Line {lineno}: the operation [{args[0]} {args[1]}] is not supported in batch mode')
+            if len(args) - 2 != BATCH_METHODS[method]:
+                raise ValueError(f'Line {lineno}: [{args[0]} {args[1]}] expects {BATCH_METHODS[method]} argument(s)')
+            operations.append((method, args[2:]))
+        return operations
+
+    def batch(self, filename='-'):
+        """Executes the operations given line by line in the given file (or stdin for "-") and saves all changes at the end in one step"""
+        try:
+            if filename == '-':
+                operations = self.parse_batch(sys.stdin)
+            else:
+                with open(filename, 'r') as f:
+                    operations = self.parse_batch(f)
+        except (OSError, ValueError) as e:
+            print(e)
+            return
+        self.co.cm.begin_batch()
+        for method, args in operations:
+            getattr(self, method)(*args)
+        self.co.cm.end_batch()
+        print(f'[{len(operations)}] operations executed')
+
+    def set_select(self, selector, attr, value):
+        """Sets an attribute in the configuration of the nodes matching the given selector (saving all of them in one step)"""
+        try:
+            node_ids = self.get_selected_nodes(selector)
+        except ValueError as e:
+            print(e)
+            return
+        batch = self.co.cm.batch
+        if not batch:
+            self.co.cm.begin_batch()
+        for node_id in node_ids:
+            self.set_conf(self.co.cm.nodes[node_id], attr, value)
+        if not batch:
+            self.co.cm.end_batch()
+        print(f'Attribute set for [{len(node_ids)}] nodes')
+
     def list_changed(self):
         """Prints all sites with changes configuration"""
         self.co.update_all()
@@ -221,51 +412,137 @@ class TLM():
         if self.print_nodes(changed, reference_complete_cfg=True) == 0:
             print('No node configuration has changed')
 
-    def commit_all(self, message=None):
-        """Creates a new version of effective configuration for all nodes"""
-        self.co.cm.update_generated_config()
-        self.co.update_all()
-        nodes, changed = self.co.process_new_configversion_all()
-        if self.print_nodes(changed, reference_complete_cfg=True) == 0:
-            print('No node configuration has changed; no new version created')
+    def commit_nodes(self, node_ids, message=None, pipeline=False, resume=False, workers=0, force_mirror=False, activate=False):
+        """Creates a new version of effective configuration for the given nodes and mirrors the configs to them
+
+        The progress is recorded in a journal so that an interrupted commit can be continued with resume=True.
+        If workers is given, rendering is distributed to that number of local render worker processes.
+        Nodes known to already have the current configs are not mirrored again unless force_mirror=True.
+        With activate=True, the latest config version is activated in the same transfer as mirroring.
+        """
+        journal = commitjournal.CommitJournal(self.co.confdir_effective)
+        if resume:
+            if not journal.load():
+                print('There is no interrupted commit that could be resumed')
+                return
+            node_ids = [ node_id for node_id in journal.node_ids if node_id in self.co.cm.nodes ]
+            if message is None:
+                message = journal.message
+        elif journal.exists():
+            logger.warning('Discarding the journal of an interrupted commit (hint: use "tlm commit --resume" to continue an interrupted commit)')
+        node_ids = list(node_ids)
+        self.co.update_generated_config()
+        generated_hash = self.co.cm.generated.get_hash()
+        if resume:
+            if generated_hash != journal.generated_hash:
+                print('The generated config has changed since the commit was interrupted; please commit again without "--resume"')
+                return
+            # Rendered configs that did not survive the interruption need to be rendered again
+            for node_id in node_ids:
+                if journal.has_passed(node_id, commitjournal.STAGE_RENDERED) and not journal.has_passed(node_id, commitjournal.STAGE_VERSIONED):
+                    if not os.path.isdir(os.path.join(self.co.get_node_dir(node_id), configorchestrator.NAME_OUTPUT_DIRECTORY)):
+                        journal.forget(node_id, commitjournal.STAGE_RENDERED)
+            print(f'Resuming interrupted commit of {len(node_ids)} node(s)...')
+        else:
+            journal.start(node_ids, generated_hash, message)
+        keep_new = [ node_id for node_id in node_ids if journal.has_passed(node_id, commitjournal.STAGE_RENDERED) ]
+        self.co.cleanup_node_dirs(self.co.cm.nodes.keys(), keep_new=keep_new)
+        if pipeline:
+            print(f'Committing and mirroring configs of {len(node_ids)} node(s)...')
+            cp = commitpipeline.CommitPipeline(self.co, self.confdir, message=message, journal=journal, mirror_workers=self.co.max_parallel_transfers, force_mirror=force_mirror, activate=activate)
+            changed, failed = cp.run(node_ids)
+            if self.print_nodes(changed, reference_complete_cfg=True) == 0:
+                print('No node configuration has changed; no new version created')
+            failed = { node_id: stage for node_id, (stage, _) in failed.items() }
+        else:
+            failed = dict()
+            if workers > 0:
+                self.render_distributed(journal, generated_hash, workers, failed)
+            else:
+                for node_id in journal.get_pending(commitjournal.STAGE_RENDERED):
+                    self.co.update_node(node_id)
+                    journal.record(node_id, commitjournal.STAGE_RENDERED)
+            changed = { node_id: self.co.cm.nodes[node_id] for node_id in journal.changed if node_id in self.co.cm.nodes }
+            for node_id in journal.get_pending(commitjournal.STAGE_VERSIONED):
+                if node_id in failed:
+                    continue
+                node_changed = self.co.process_new_configversion(node_id)
+                journal.record(node_id, commitjournal.STAGE_VERSIONED, changed=node_changed)
+                if node_changed:
+                    changed[node_id] = self.co.cm.nodes[node_id]
+            if self.print_nodes(changed, reference_complete_cfg=True) == 0:
+                print('No node configuration has changed; no new version created')
+            elif not journal.committed:
+                gitcaller.Git.call_git_commit(self.confdir, message)
+                journal.record(None, commitjournal.STAGE_COMMITTED)
+            pending = journal.get_pending(commitjournal.STAGE_MIRRORED)
+            print(f'Mirroring any existing configs to {len(pending)} node(s)' + (' and activating the latest ones...' if activate else '...'))
+            def mirrored(result):
+                if result.failed:
+                    failed[result.node_id] = 'mirror'
+                else:
+                    journal.record(result.node_id, commitjournal.STAGE_MIRRORED)
+            results = self.co.mirror_nodes(pending, callback=mirrored, force=force_mirror, activate=activate)
+            self.print_transfer_summary(results, 'Mirroring and activation' if activate else 'Mirroring')
+        if len(failed) > 0:
+            print(f'Committing failed for {len(failed)} node(s): ' + ', '.join([ f'{node_id} ({stage})' for node_id, stage in sorted(failed.items()) ]))
+            print('Hint: use "tlm commit --resume" to retry the remaining work')
+            return changed
+        journal.finish()
+        if activate:
+            print('Done')
         else:
-            gitcaller.Git.call_git_commit(self.confdir, message)
-        print('Mirroring any existing configs to nodes...')
-        self.co.mirror_node_configs(nodes.keys())
-        print('Done (hint: use "tlm activate" to activate a new configuration)')
+            print('Done (hint: use "tlm activate" to activate a new configuration)')
+        return changed
+
+    def render_distributed(self, journal, generated_hash, workers, failed):
+        """Renders the configs of the nodes not rendered yet according to the journal using render worker processes"""
+        pending = journal.get_pending(commitjournal.STAGE_RENDERED)
+        address = (str(self.co.cm.globalconf.get_item('render_listen_address', '127.0.0.1')), 0)
+        rc = renderworker.RenderCoordinator(self.co, pending, generated_hash, address=address)
+        host, port = rc.address
+        print(f'Rendering configs of {len(pending)} node(s) using {workers} local worker process(es)...')
+        logger.info(f'Render coordinator is listening on [{host}]:{port}; additional workers may join using "tlm render-worker [{host}]:{port} {rc.token}"')
+        rendered, render_failed = rc.run(num_workers=workers)
+        for node_id in pending:
+            if node_id in rendered:
+                journal.record(node_id, commitjournal.STAGE_RENDERED)
+            else:
+                failed[node_id] = 'render'
+
+    def commit_resume(self, message=None, pipeline=False, workers=0, force_mirror=False, activate=False):
+        """Continues an interrupted commit"""
+        self.commit_nodes(list(), message, pipeline=pipeline, resume=True, workers=workers, force_mirror=force_mirror, activate=activate)
 
-    def commit_site(self, site, message=None):
+    def commit_all(self, message=None, pipeline=False, workers=0, force_mirror=False, activate=False):
+        """Creates a new version of effective configuration for all nodes"""
+        self.commit_nodes(self.co.cm.nodes.keys(), message, pipeline=pipeline, workers=workers, force_mirror=force_mirror, activate=activate)
+
+    def commit_site(self, site, message=None, pipeline=False, workers=0, force_mirror=False, activate=False):
         """Creates a new version of effective configuration for all nodes of the given site"""
-        self.co.cm.update_generated_config()
-        self.co.update_site(site)
-        nodes, changed = self.co.process_new_configversion_site(site)
-        if self.print_nodes(changed, reference_complete_cfg=True) == 0:
-            print('No node configuration has changed; no new version created')
-        else:
-            gitcaller.Git.call_git_commit(self.confdir, message)
-        print(f'Mirroring any existing configs to {len(nodes)} node(s)...')
-        self.co.mirror_node_configs(nodes.keys())
-        print('Done (hint: use "tlm activate" to activate a new configuration)')
+        site = self.co.cm.sites.get(site)
+        if site is None:
+            print('A site with this name does not exist')
+            return
+        self.commit_nodes([ node.get('node_id') for node in site.site_nodes ], message, pipeline=pipeline, workers=workers, force_mirror=force_mirror, activate=activate)
 
-    def commit_node(self, node, message=None):
+    def commit_node(self, node, message=None, pipeline=False, workers=0, force_mirror=False, activate=False):
         """Creates a new version of effective configuration for the given node"""
         try:
             node = self.get_nodeid(node)
         except ValueError as e:
             print(e)
             return
-        self.co.cm.update_generated_config()
-        self.co.update_node(node)
-        changed = self.co.process_new_configversion(node)
-        changed = {node: self.co.cm.nodes[node]} if changed else dict()
-        nodes = [node]
-        if self.print_nodes(changed, reference_complete_cfg=True) == 0:
-            print('Node configuration has not changed; nothing done')
-        else:
-            gitcaller.Git.call_git_commit(self.confdir, message)
-        print('Mirroring any existing configs to node...')
-        self.co.mirror_node_configs(nodes)
-        print('Done (hint: use "tlm activate" to activate a new configuration)')
+        self.commit_nodes([node], message, pipeline=pipeline, workers=workers, force_mirror=force_mirror, activate=activate)
+
+    def commit_select(self, selector, message=None, pipeline=False, workers=0, force_mirror=False, activate=False):
+        """Creates a new version of effective configuration for the nodes matching the given selector"""
+        try:
+            node_ids = self.get_selected_nodes(selector)
+        except ValueError as e:
+            print(e)
+            return
+        self.commit_nodes(node_ids, message, pipeline=pipeline, workers=workers, force_mirror=force_mirror, activate=activate)
 
     def attach_node(self, node):
         """Pairs a config-requesting device as the provided node"""
@@ -277,14 +554,23 @@ class TLM():
             print(e)
             return
 
+    def print_transfer_summary(self, results, action):
+        """Prints a summary table of the given transfer results"""
+        if len(results) == 0:
+            return
+        names = { result.node_id: self.co.cm.nodes[result.node_id].record.fullname for result in results if result.failed }
+        for line in transferengine.TransferEngine.format_summary(results, action, names):
+            print(line)
+
     def activate_all(self):
         """Activates the latest config version on all node devices"""
         try:
             print('Activating the latest config on all nodes...')
-            self.co.activate_nodeconfigs(self.co.cm.nodes.keys())
+            results = self.co.activate_nodeconfigs(self.co.cm.nodes.keys())
         except ValueError as e:
             print(e)
             return
+        self.print_transfer_summary(results, 'Activation')
         print('Done')
 
     def activate_site(self, site, version):
@@ -296,10 +582,11 @@ class TLM():
         nodes = [node.get('node_id') for node in site.site_nodes]
         try:
             print('Activating config of the site\'s nodes...')
-            self.co.activate_nodeconfigs(nodes, version)
+            results = self.co.activate_nodeconfigs(nodes, version)
         except ValueError as e:
             print(e)
             return
+        self.print_transfer_summary(results, 'Activation')
         print('Done')
 
     def activate_node(self, node, version):
@@ -307,10 +594,23 @@ class TLM():
         try:
             node = self.get_nodeid(node)
             print('Activating node config...')
-            self.co.activate_nodeconfigs([node], version)
+            results = self.co.activate_nodeconfigs([node], version)
+        except ValueError as e:
+            print(e)
+            return
+        self.print_transfer_summary(results, 'Activation')
+        print('Done')
+
+    def activate_select(self, selector, version='latest'):
+        """Activates the requested config version on the node devices matching the given selector"""
+        try:
+            node_ids = self.get_selected_nodes(selector)
+            print(f'Activating config of [{len(node_ids)}] selected nodes...')
+            results = self.co.activate_nodeconfigs(node_ids, version)
         except ValueError as e:
             print(e)
             return
+        self.print_transfer_summary(results, 'Activation')
         print('Done')
 
     def ansible_generic_all(self, *ansible_args, playbook=False):
@@ -318,7 +618,7 @@ class TLM():
         try:
             print('Calling Ansible for all nodes...')
             nodes = {nodedata.complete_cfg.get('node_fullname'): nodedata.get(ATTR_MGMT_ADDRESS) for nodename, nodedata in self.co.cm.nodes.items()}
-            ansiblecaller.exec_ansible_fornodes(nodes, *ansible_args, playbook=playbook)
+            ansiblecaller.exec_ansible_fornodes(nodes, *ansible_args, playbook=playbook, env=self.co.get_ansible_env())
         except ValueError as e:
             print(e)
             return
@@ -341,7 +641,7 @@ class TLM():
                 return
             nodes = site.site_nodes
             nodes = {nodedata.complete_cfg.get('node_fullname'): nodedata.get(ATTR_MGMT_ADDRESS) for nodedata in nodes}
-            ansiblecaller.exec_ansible_fornodes(nodes, *ansible_args, playbook=playbook)
+            ansiblecaller.exec_ansible_fornodes(nodes, *ansible_args, playbook=playbook, env=self.co.get_ansible_env())
         except ValueError as e:
             print(e)
             return
@@ -360,7 +660,7 @@ class TLM():
         try:
             node = self.get_node(node)
             nodes = {node.complete_cfg.get('node_fullname'): node.get(ATTR_MGMT_ADDRESS)}
-            ansiblecaller.exec_ansible_fornodes(nodes, *ansible_args, playbook=playbook)
+            ansiblecaller.exec_ansible_fornodes(nodes, *ansible_args, playbook=playbook, env=self.co.get_ansible_env())
         except ValueError as e:
             print(e)
             return
@@ -374,6 +674,26 @@ class TLM():
         """Calls 'ansible-playbook' for the given node"""
         return self.ansible_generic_node(node, *ansible_args, playbook=True)
 
+    def ansible_generic_select(self, selector, *ansible_args, playbook=False):
+        """Calls Ansible for the nodes matching the given selector"""
+        try:
+            node_ids = self.get_selected_nodes(selector)
+            nodes = [ self.co.cm.nodes[node_id] for node_id in node_ids ]
+            nodes = {nodedata.complete_cfg.get('node_fullname'): nodedata.get(ATTR_MGMT_ADDRESS) for nodedata in nodes}
+            ansiblecaller.exec_ansible_fornodes(nodes, *ansible_args, playbook=playbook, env=self.co.get_ansible_env())
+        except ValueError as e:
+            print(e)
+            return
+        print('Done')
+
+    def ansible_select(self, selector, *ansible_args):
+        """Calls 'ansible' for the nodes matching the given selector"""
+        return self.ansible_generic_select(selector, *ansible_args, playbook=False)
+
+    def ansible_playbook_select(self, selector, *ansible_args):
+        """Calls 'ansible-playbook' for the nodes matching the given selector"""
+        return self.ansible_generic_select(selector, *ansible_args, playbook=True)
+
     def git(self, *git_args):
         """Calls 'git' for the Towalink config directory as local repository"""
         return gitcaller.Git.call_git(self.confdir, *git_args)
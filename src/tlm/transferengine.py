@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+"""Class for transferring configs to many nodes in parallel"""
+
+import concurrent.futures
+import logging
+import subprocess
+import time
+
+
+logger = logging.getLogger(__name__)
+MAX_PARALLEL_TRANSFERS = 16  # default for the maximum number of concurrent transfers
+TRANSFER_TIMEOUT = 60  # default for the maximum duration of a transfer to a node in seconds
+STATUS_OK = 'ok'
+STATUS_FAILED = 'failed'
+STATUS_TIMEOUT = 'timeout'
+STATUS_SKIPPED = 'skipped'
+STATUS_CURRENT = 'current'  # nothing to transfer as the node is known to be in sync
+
+
+class TransferResult(object):
+    """Class for the result of a transfer to a node"""
+    __slots__ = ('node_id', 'status', 'duration', 'message')
+
+    def __init__(self, node_id, status, duration, message=None):
+        """Object initialization"""
+        self.node_id = node_id
+        self.status = status
+        self.duration = duration
+        self.message = message
+
+    @property
+    def failed(self):
+        return self.status in [STATUS_FAILED, STATUS_TIMEOUT]
+
+
+class TransferEngine(object):
+    """Class for transferring configs to many nodes in parallel
+
+    The transfer function is called for each node in a pool of at most max_parallel threads (the work is done
+    by rsync/ssh subprocesses). It returns STATUS_OK, STATUS_CURRENT, STATUS_FAILED or STATUS_SKIPPED (optionally together with
+    a message) and is expected to apply the engine's timeout to its subprocesses; an expired timeout
+    (subprocess.TimeoutExpired) is reported as STATUS_TIMEOUT.
+    """
+
+    def __init__(self, max_parallel=MAX_PARALLEL_TRANSFERS, timeout=TRANSFER_TIMEOUT):
+        """Object initialization"""
+        self.max_parallel = max(1, int(max_parallel))
+        self.timeout = timeout
+
+    def transfer(self, func, node_id):
+        """Calls the transfer function for the given node; returns a TransferResult"""
+        start = time.monotonic()
+        message = None
+        try:
+            status = func(node_id)
+            if isinstance(status, tuple):
+                status, message = status
+        except subprocess.TimeoutExpired:
+            status, message = STATUS_TIMEOUT, f'no response within {self.timeout} s'
+        except Exception as e:
+            status, message = STATUS_FAILED, str(e)
+        result = TransferResult(node_id, status, time.monotonic() - start, message)
+        if result.failed:
+            logger.warning(f'Transfer to node [{node_id}] failed: {status}' + ('' if (message is None) else f' ({message})'))
+        return result
+
+    def run(self, node_ids, func, callback=None):
+        """Transfers to the given nodes using the given function; returns the list of TransferResult objects
+
+        The callback (if given) is called in the calling thread with each result as soon as it is available.
+        """
+        node_ids = list(node_ids)
+        results = list()
+        if (len(node_ids) <= 1) or (self.max_parallel == 1):
+            for node_id in node_ids:
+                results.append(self.transfer(func, node_id))
+                if callback is not None:
+                    callback(results[-1])
+            return results
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.max_parallel, len(node_ids)), thread_name_prefix='transfer') as executor:
+            futures = [ executor.submit(self.transfer, func, node_id) for node_id in node_ids ]
+            for future in concurrent.futures.as_completed(futures):
+                results.append(future.result())
+                if callback is not None:
+                    callback(results[-1])
+        return results
+
+    @staticmethod
+    def format_summary(results, action='Transfer', names=None):
+        """Returns the lines of a summary table of the given results (names is an optional dictionary node_id -> name)"""
+        lines = [ f'{"Status":<10} {"Nodes":>6} {"Min [s]":>8} {"Avg [s]":>8} {"Max [s]":>8}' ]
+        for status in [STATUS_OK, STATUS_CURRENT, STATUS_FAILED, STATUS_TIMEOUT, STATUS_SKIPPED]:
+            durations = [ result.duration for result in results if result.status == status ]
+            if len(durations) == 0:
+                continue
+            lines.append(f'{status:<10} {len(durations):>6} {min(durations):>8.2f} {sum(durations) / len(durations):>8.2f} {max(durations):>8.2f}')
+        for result in sorted(results, key=lambda x: x.node_id):
+            if result.failed:
+                name = f'{names[result.node_id]} ({result.node_id})' if (names is not None) and (result.node_id in names) else str(result.node_id)
+                lines.append(f'{action} failed for node {name}: {result.status}' + ('' if (result.message is None) else f' ({result.message})'))
+        return lines
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Benchmark of the canonical serialization of effective configs against the previous pure Python one"""
+
+import json
+import os
+import sys
+import timeit
+
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from tlm.configmanager import yamlconfig
+
+
+def make_cfg(num_peers=500):
+    """Returns a node config with the given number of peers"""
+    cfg = { 'node_name': 'primary', 'site_name': 'site_a', 'bgp_as': 65001, 'bgp_peers': dict(), 'wg_links': dict() }
+    for peer in range(2, num_peers + 2):
+        cfg['bgp_peers'][peer] = { 'as': 65000 + peer, 'name': f'site_node_{peer}', 'ip': f'192.88.99.{peer % 256}', 'ifname_local': f'tlwg_{peer}' }
+        cfg['wg_links'][peer] = { 'wg_ifname': f'tlwg_{peer}', 'wg_listenport': 51820 + peer, 'wg_peer_allowedips': ['0.0.0.0/0', '0::0/0'], 'wg_peer_keepalive': 25 }
+    return cfg
+
+
+def main(number=10):
+    cfg = make_cfg()
+    yc = yamlconfig.YAMLConfig(d=cfg)
+    text = yc.dump()
+    data = json.dumps(yamlconfig.get_plain(cfg), sort_keys=True, separators=(',', ':'))
+    print('Dumping (ms): previous {0:.1f}, canonical {1:.1f}, json {2:.1f}'.format(
+        timeit.timeit(lambda: yaml.dump(cfg, default_flow_style=False), number=number) * 1000 / number,
+        timeit.timeit(lambda: yc.dump(), number=number) * 1000 / number,
+        timeit.timeit(lambda: json.dumps(yamlconfig.get_plain(cfg), sort_keys=True, separators=(',', ':')), number=number) * 1000 / number))
+    print('Loading (ms): previous {0:.1f}, canonical {1:.1f}, json {2:.1f}'.format(
+        timeit.timeit(lambda: yaml.load(text, Loader=yaml.SafeLoader), number=number) * 1000 / number,
+        timeit.timeit(lambda: yaml.load(text, Loader=yamlconfig.SafeLoader), number=number) * 1000 / number,
+        timeit.timeit(lambda: json.loads(data), number=number) * 1000 / number))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+"""Common fixtures for the tests"""
+
+import itertools
+import os
+import shutil
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from tlm import configorchestrator
+from tlm import filesync
+from tlm import gitcaller
+from tlm import towalinkmanager
+from tlm.configmanager import wireguard
+
+
+_keycounter = itertools.count(1)
+
+
+@pytest.fixture(autouse=True)
+def fake_wireguard(monkeypatch):
+    """Generates dummy WireGuard keys as the "wg" tool is usually not available where the tests run"""
+    monkeypatch.setattr(wireguard.WireGuard, 'generate_keypair', lambda self: (f'private{next(_keycounter)}', f'public{next(_keycounter)}'))
+    monkeypatch.setattr(wireguard.WireGuard, 'generate_presharedkey', lambda self: f'preshared{next(_keycounter)}')
+
+
+@pytest.fixture(autouse=True)
+def no_git(monkeypatch):
+    """Don't call git for committing the config directory"""
+    monkeypatch.setattr(gitcaller.Git, 'call_git_commit', staticmethod(lambda confdir, message: None))
+
+
+class RsyncCalls(list):
+    """List of the commands executed for mirroring; transfers to the management addresses in "failing" fail"""
+
+    def __init__(self):
+        super().__init__()
+        self.failing = set()
+
+
+@pytest.fixture
+def rsync_calls(monkeypatch):
+    """Records the commands executed for mirroring instead of calling rsync"""
+    calls = RsyncCalls()
+    def execute(self, command, suppressoutput=False, suppresserrors=False):
+        calls.append(command)
+        return '', '', 23 if any([ f'[{address}]' in command for address in calls.failing ]) else 0
+    monkeypatch.setattr(filesync.FileSync, 'execute', execute)
+    return calls
+
+
+@pytest.fixture
+def attach_all():
+    """Returns a function attaching all nodes of a TLM object (using the management address fe80::<node_id>)"""
+    def attach(tlm):
+        for node_id in list(tlm.co.cm.nodes.keys()):
+            tlm.set_node(str(node_id), 'attach_mgmt_address', f'fe80::{node_id}')
+    return attach
+
+
+def make_confdir(confdir, nsites=2, nnodes=2, settings=''):
+    """Creates a config directory from the skeleton with the given number of sites and nodes per site (node identifiers start at 11)"""
+    shutil.copytree(configorchestrator.SKELETON_DIR, confdir)
+    filename = os.path.join(confdir, 'config.toml')
+    with open(filename, 'r') as f:
+        data = f.read()
+    data = data.replace('node_sshauthkeys=[]', 'node_sshauthkeys=["ssh-ed25519 AAAA test"]')
+    with open(filename, 'w') as f:
+        f.write(data + '\nssh_multiplexing=false\n' + settings + '\n')
+    filename = os.path.join(confdir, 'tlwg.conf.jinja')
+    with open(filename, 'r') as f:
+        data = f.read()
+    with open(filename, 'w') as f:
+        f.write(data.replace('is defined wg_mtu', 'is defined and wg_mtu'))  # fix syntax error of the skeleton template
+    node_id = 11
+    for site in range(nsites):
+        sitedir = os.path.join(confdir, f'site_s{site}')
+        os.makedirs(sitedir)
+        open(os.path.join(sitedir, 'config.toml'), 'w').close()
+        for node in range(nnodes):
+            nodedir = os.path.join(sitedir, f'node_n{node}')
+            os.makedirs(nodedir)
+            with open(os.path.join(nodedir, 'config.toml'), 'w') as f:
+                f.write(f'node_id={node_id}\nnode_hostname="h{node_id}.example.net"\n')
+            node_id += 1
+    return confdir
+
+
+@pytest.fixture
+def confdir(tmp_path):
+    """Returns a factory for config directories"""
+    counter = itertools.count()
+    def factory(nsites=2, nnodes=2, settings=''):
+        return make_confdir(str(tmp_path / f'conf{next(counter)}'), nsites, nnodes, settings)
+    return factory
+
+
+def make_tlm(confdir):
+    """Returns a TLM object for the given config directory that doesn't manage the local management interface"""
+    tlm = towalinkmanager.TLM.__new__(towalinkmanager.TLM)
+    tlm.confdir = confdir
+    tlm.co = configorchestrator.ConfigOrchestrator(confdir, manage_interface=False)
+    return tlm
+
+
+@pytest.fixture
+def load_tlm():
+    """Returns a function returning a TLM object for an existing config directory"""
+    return make_tlm
+
+
+@pytest.fixture
+def tlm(confdir):
+    """Returns a factory for TLM objects working on a new config directory"""
+    def factory(nsites=2, nnodes=2, settings=''):
+        return make_tlm(confdir(nsites, nnodes, settings))
+    return factory
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for activating node configs"""
+
+import os
+
+import pytest
+
+import tlm as tlm_module
+from tlm import filesync
+
+
+def get_active(tlm, node_id):
+    return os.readlink(os.path.join(tlm.co.get_node_dir(node_id), 'active'))
+
+
+@pytest.mark.parametrize('pipeline', [False, True])
+def test_commit_with_activate(tlm, rsync_calls, attach_all, pipeline):
+    t = tlm()
+    attach_all(t)
+    t.commit_all('first', pipeline=pipeline, activate=True)
+    assert len(rsync_calls) == 4
+    for command in rsync_calls:
+        assert '--delay-updates' in command
+        assert f'--rsync-path={filesync.RSYNC_PATH_SPECIAL}' in command
+        assert '--exclude=active' not in command
+        assert '--exclude=new' in command
+    assert [ get_active(t, node_id) for node_id in [11, 12, 13, 14] ] == ['v1'] * 4
+
+
+def test_commit_without_activate(tlm, rsync_calls, attach_all):
+    t = tlm()
+    attach_all(t)
+    t.commit_all('first')
+    assert len(rsync_calls) == 4
+    for command in rsync_calls:
+        assert '--delay-updates' not in command
+        assert '--rsync-path' not in command
+        assert '--exclude=active' in command
+    assert not os.path.lexists(os.path.join(t.co.get_node_dir(11), 'active'))
+
+
+def test_commit_with_activate_activates_latest(tlm, rsync_calls, attach_all):
+    t = tlm()
+    attach_all(t)
+    t.commit_all('first', activate=True)
+    t.set_global('wg_mtu', '1300')
+    t.commit_all('second', activate=True)
+    assert get_active(t, 11) == 'v2'
+    assert len(rsync_calls) == 8
+
+
+def test_activate_option(monkeypatch):
+    monkeypatch.setattr('sys.argv', ['tlm', 'commit', '--activate', '-m', 'msg', 'all'])
+    loglevel, method, method_args, method_kwargs, output_format = tlm_module.parseopts()
+    assert method == 'commit_all'
+    assert method_kwargs['activate']
+
+
+def test_activate_option_just_for_commit(monkeypatch):
+    monkeypatch.setattr('sys.argv', ['tlm', '--activate', 'activate', 'all'])
+    with pytest.raises(SystemExit):
+        tlm_module.parseopts()
+
+
+def is_symlink_flip(command):
+    """Returns whether the given rsync command just transfers the "active" symlink"""
+    return '/active [' in command
+
+
+def test_activation_flips_symlink_of_mirrored_versions(tlm, rsync_calls, attach_all):
+    t = tlm()
+    attach_all(t)
+    t.commit_all('first')
+    t.set_global('wg_mtu', '1300')
+    t.commit_all('second')
+    rsync_calls.clear()
+    results = t.co.activate_nodeconfigs([11, 12], '1')
+    assert [ result.status for result in results ] == ['ok', 'ok']
+    assert len(rsync_calls) == 2
+    assert all([ is_symlink_flip(command) and f'--rsync-path={filesync.RSYNC_PATH_SPECIAL}' in command for command in rsync_calls ])
+    assert get_active(t, 11) == 'v1'
+    rsync_calls.clear()
+    t.co.activate_nodeconfigs([11], 'latest')
+    assert is_symlink_flip(rsync_calls[0])
+    assert get_active(t, 11) == 'v2'
+
+
+def test_activation_mirrors_versions_not_known_to_be_present(tlm, rsync_calls, attach_all):
+    t = tlm()
+    attach_all(t)
+    t.commit_all('first')
+    t.co.mirror_state.set(11, None)
+    t.set_node('12', 'attach_mgmt_address', 'fe80::99')
+    rsync_calls.clear()
+    t.co.activate_nodeconfigs([11, 12, 13])
+    mirrored = [ command for command in rsync_calls if not is_symlink_flip(command) ]
+    assert len(mirrored) == 2
+    assert all([ '--delay-updates' in command for command in mirrored ])
+    assert '[fe80::11]' in ' '.join(mirrored) and '[fe80::99]' in ' '.join(mirrored)
+    assert t.co.is_mirrored(11, 'fe80::11')
+    rsync_calls.clear()
+    t.co.activate_nodeconfigs([11, 12])
+    assert all([ is_symlink_flip(command) for command in rsync_calls ])
+
+
+@pytest.mark.parametrize('version', ['v9', 'x1', ''])
+def test_activation_of_invalid_versions(tlm, rsync_calls, attach_all, version):
+    t = tlm()
+    attach_all(t)
+    t.commit_all('first')
+    rsync_calls.clear()
+    try:
+        results = t.co.activate_nodeconfigs([11], version)
+    except ValueError:
+        results = list()
+    assert all([ result.status == 'skipped' for result in results ])
+    assert rsync_calls == []
+    assert not os.path.lexists(os.path.join(t.co.get_node_dir(11), 'active'))
+
+
+def test_activation_of_unattached_node_is_skipped(tlm, rsync_calls):
+    t = tlm()
+    t.commit_all('first')
+    assert [ result.status for result in t.co.activate_nodeconfigs([11]) ] == ['skipped']
+    assert rsync_calls == []
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for allocating node addresses out of one or more network pools"""
+
+import ipaddress
+
+import pytest
+
+from tlm import addressallocator
+
+
+def address(allocator, node_id):
+    return str(ipaddress.ip_address(allocator.allocate(node_id)))
+
+
+def test_first_pool_matches_offset_addressing():
+    allocator = addressallocator.AddressAllocator('test', '192.88.99.0/24')
+    assert address(allocator, 11) == '192.88.99.11'
+    assert address(allocator, 254) == '192.88.99.254'
+    with pytest.raises(ValueError):
+        allocator.allocate(255)  # broadcast address
+
+
+def test_allocation_continues_in_next_pool():
+    allocator = addressallocator.AddressAllocator('test', ['10.0.0.0/28', '10.1.0.0/24'])
+    assert address(allocator, 14) == '10.0.0.14'
+    assert address(allocator, 15) == '10.1.0.1'
+
+
+def test_allocations_are_kept_when_pools_are_added():
+    allocator = addressallocator.AddressAllocator('test', '10.0.0.0/24')
+    allocator.load({11: '10.0.0.20'})
+    assert address(allocator, 11) == '10.0.0.20'
+    extended = addressallocator.AddressAllocator('test', ['10.0.0.0/24', '10.1.0.0/24'])
+    extended.load(allocator.get_index())
+    assert address(extended, 11) == '10.0.0.20'
+    assert extended.get_node('10.0.0.20') == 11
+
+
+def test_allocations_outside_pools_are_dropped():
+    allocator = addressallocator.AddressAllocator('test', '10.0.0.0/24')
+    allocator.load({11: '10.9.0.11', 12: 'invalid'})
+    assert allocator.get_index() == dict()
+
+
+def test_designated_address_in_use_falls_back_to_free_one():
+    allocator = addressallocator.AddressAllocator('test', '10.0.0.0/24')
+    allocator.load({11: '10.0.0.12'})
+    assert address(allocator, 12) == '10.0.0.11'  # first free address
+    allocator.release(11)
+    assert address(allocator, 11) == '10.0.0.12'
+
+
+def test_ipv6_pool():
+    allocator = addressallocator.AddressAllocator('test', 'fd00::/64')
+    network, offset = allocator.get(11)
+    assert (str(network), offset) == ('fd00::/64', 11)
+
+
+@pytest.mark.parametrize('pools', [[], ['10.0.0.1/24'], ['10.0.0.0/24', 'fd00::/64'], ['10.0.0.0/16', '10.0.1.0/24']])
+def test_invalid_pools_are_rejected(pools):
+    with pytest.raises(ValueError):
+        addressallocator.AddressAllocator('test', pools)
+
+
+def test_uniform_site_settings_are_used(tlm):
+    t = tlm()
+    for site in t.co.cm.sites.values():
+        site.set_item('loopbacknet_ipv4', '10.10.0.0/24')
+        site.save_config()
+    assert t.co.get_node_address('loopback_ipv4', 11, add_prefixlen=False) == '10.10.0.11'
+    assert t.co.get_node_address('transfer_ipv4', 11, add_prefixlen=False) == '10.10.0.11'  # defaults to the loopback network
+
+
+def test_differing_node_settings_are_rejected(tlm):
+    t = tlm()
+    node = t.co.cm.nodes[12]
+    node.set_item('internode_transfernet_ipv4', '10.20.0.0/24')
+    node.save_config()
+    with pytest.raises(ValueError, match='internode_transfernet_ipv4'):
+        t.co.update_generated_config()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for allocating autonomous system numbers and WireGuard listen ports"""
+
+import pytest
+
+from tlm import asnallocator
+from tlm import portallocator
+
+
+def test_asn_within_2byte_range():
+    allocator = asnallocator.ASNAllocator()
+    assert allocator.get(11) == 65011
+    assert allocator.get(534) == 65534
+
+
+def test_asn_beyond_2byte_range_uses_4byte_range():
+    allocator = asnallocator.ASNAllocator()
+    allocator.allocate_all([11, 535])
+    assert allocator.get(535) == asnallocator.ASN_BASE_4BYTE + 535
+
+
+def test_asn_with_4byte_base():
+    assert asnallocator.ASNAllocator(4200000000).get(11) == 4200000011
+
+
+def test_default_ports():
+    allocator = portallocator.PortAllocator()
+    allocator.allocate_links([(11, 12)])
+    assert (allocator.get(11, 12), allocator.get(12, 11)) == (51832, 51831)
+    assert allocator.get_ports() == dict()
+
+
+def test_ports_beyond_range_are_allocated_above_base():
+    allocator = portallocator.PortAllocator(65500)
+    allocator.allocate_links([(11, 40), (11, 50)])
+    assert allocator.get(40, 11) == 65511
+    assert allocator.get(11, 40) == 65501
+    assert allocator.get(11, 50) == 65502
+    assert allocator.get_ports() == {11: {40: 65501, 50: 65502}}
+
+
+def test_ports_wrap_below_base_when_exhausted():
+    allocator = portallocator.PortAllocator(65530)
+    allocator.allocate_links([ (1, peer) for peer in range(10, 20) ])
+    ports = sorted([ allocator.get(1, peer) for peer in range(10, 20) ])
+    assert ports == [ portallocator.PORT_MIN + i for i in range(5) ] + [65531, 65532, 65533, 65534, 65535]
+
+
+def test_exhausted_ports_raise():
+    allocator = portallocator.PortAllocator(1030)
+    with pytest.raises(ValueError):
+        allocator.allocate_links([ (1, peer) for peer in range(portallocator.PORT_MAX, portallocator.PORT_MAX + portallocator.PORT_MAX - portallocator.PORT_MIN + 1) ])
+
+
+def test_persisted_ports_are_kept_and_released():
+    allocator = portallocator.PortAllocator(65500)
+    allocator.load({'11': {'40': '65507'}})
+    allocator.allocate_links([(11, 40), (11, 50)])
+    assert allocator.get(11, 40) == 65507
+    assert allocator.get(11, 50) == 65501
+    allocator.allocate_links([(11, 50)])
+    assert allocator.get_ports() == {11: {50: 65501}}
+
+
+def test_uniform_site_asn_base_is_used(tlm):
+    t = tlm()
+    for site in t.co.cm.sites.values():
+        site.set_item('bgp_as_base', 64600)
+        site.save_config()
+    assert t.co.asn_allocator.get(11) == 64611
+
+
+def test_differing_port_bases_are_rejected(tlm):
+    t = tlm()
+    site = t.co.cm.sites['s1']
+    site.set_item('wg_listenport_base', 40000)
+    site.save_config()
+    with pytest.raises(ValueError, match='wg_listenport_base'):
+        t.co.update_generated_config()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for querying nodes by the attributes of their complete configs"""
+
+import pytest
+
+from tlm import towalinkmanager
+from tlm.configmanager import attributeindex
+
+
+@pytest.mark.parametrize('predicate, expected', [
+    ('wg_mtu=1420', ('wg_mtu', '=', '1420')),
+    (' wg_mtu <= 1400 ', ('wg_mtu', '<=', '1400')),
+    ('node_hostname!=h1*', ('node_hostname', '!=', 'h1*')),
+    ('attach_mgmt_address', ('attach_mgmt_address', None, None)),
+    ('!attach_mgmt_address', ('attach_mgmt_address', '!', None)),
+])
+def test_parse_predicate(predicate, expected):
+    assert attributeindex.parse_predicate(predicate) == expected
+
+
+@pytest.mark.parametrize('predicate', ['', '=x', '!wg_mtu=1'])
+def test_invalid_predicates(predicate):
+    with pytest.raises(ValueError):
+        attributeindex.parse_predicate(predicate)
+
+
+@pytest.fixture
+def t(tlm):
+    t = tlm()
+    t.set_node('11', 'wg_mtu', '1380')
+    t.set_node('12', 'wg_mtu', '1420')
+    t.set_node('13', 'test_flag', 'true')
+    t.set_node('14', 'test_groups', '["a", "b"]')
+    return t
+
+
+@pytest.mark.parametrize('predicates, expected', [
+    (['wg_mtu=1380'], [11]),
+    (['wg_mtu<1400'], [11]),
+    (['wg_mtu>=1380'], [11, 12]),
+    (['wg_mtu!=1380'], [12, 13, 14]),
+    (['wg_mtu'], [11, 12]),
+    (['!wg_mtu'], [13, 14]),
+    (['node_hostname=h1[13].*'], [11, 13]),
+    (['test_flag=true'], [13]),
+    (['test_groups=b'], [14]),
+    (['unknown_attribute'], []),
+    (['!unknown_attribute'], [11, 12, 13, 14]),
+    (['wg_mtu', 'node_hostname=h12.*'], [12]),
+])
+def test_query(t, predicates, expected):
+    assert t.co.cm.query_nodes(predicates) == expected
+
+
+def test_get_value(t):
+    index = t.co.cm.attribute_index
+    assert index.get_value(11, 'wg_mtu') == 1380
+    assert index.get_value(13, 'wg_mtu') is None
+    assert index.get_value(99, 'node_id') is None
+    assert index.get_value(11, 'unknown_attribute') is None
+
+
+def test_query_reflects_set(t):
+    assert t.co.cm.query_nodes(['wg_mtu<1400']) == [11]
+    t.set_site('s1', 'wg_mtu', '1300')
+    assert t.co.cm.query_nodes(['wg_mtu<1400']) == [11, 13, 14]
+    t.set_node('11', 'wg_mtu', '1500')
+    assert t.co.cm.query_nodes(['wg_mtu<1400']) == [13, 14]
+
+
+def test_query_output(t, capsys):
+    t.output_format = towalinkmanager.OUTPUT_FORMAT_TEXT
+    t.query('wg_mtu<1400')
+    assert capsys.readouterr().out.strip() == 'n0.s0 (11): wg_mtu=1380'
+    t.query('wg_mtu<1000')
+    assert 'No node matches the given predicates' in capsys.readouterr().out
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for batch mode applying many operations in one load/save cycle"""
+
+import os
+
+
+def run_batch(t, tmp_path, lines):
+    filename = tmp_path / 'batch.txt'
+    filename.write_text('\n'.join(lines) + '\n')
+    t.batch(str(filename))
+
+
+def test_added_sites_and_nodes_are_created_at_the_end(tlm, load_tlm):
+    t = tlm()
+    cm = t.co.cm
+    cm.begin_batch()
+    cm.add_site('s2')
+    node_id = cm.add_node('n0.s2')
+    assert not os.path.exists(os.path.join(t.confdir, 'site_s2'))
+    assert cm.nodes[node_id].complete_cfg['node_id'] == node_id
+    cm.end_batch()
+    with open(os.path.join(t.confdir, 'site_s2', 'node_n0', 'config.toml')) as f:
+        assert f'node_id={node_id}' in f.read()
+    assert load_tlm(t.confdir).co.cm.nodes[node_id].name == 'n0'
+
+
+def test_settings_within_batch_are_visible(tlm, load_tlm, tmp_path, capsys):
+    t = tlm()
+    cm = t.co.cm
+    cm.begin_batch()
+    t.set_global('test_global', 'g')
+    t.set_site('s0', 'test_site', 's')
+    t.set_node('11', 'test_node.sub', 'n')
+    cfg = cm.nodes[11].complete_cfg
+    assert (cfg['test_global'], cfg['test_site']) == ('g', 's')
+    assert cm.nodes[11].complete_cfg_nested['test_node']['sub'] == 'n'
+    assert cm.nodes[13].complete_cfg.get('test_site') is None
+    with open(os.path.join(t.confdir, 'config.toml')) as f:
+        assert 'test_global' not in f.read()
+    cm.end_batch()
+    assert load_tlm(t.confdir).co.cm.nodes[11].complete_cfg == cfg
+
+
+def test_new_node_inherits_settings_within_batch(tlm, load_tlm, tmp_path, capsys):
+    t = tlm()
+    run_batch(t, tmp_path, ['add site s2', 'set site s2 test_site s', 'add node n0.s2', 'show_all node n0.s2'])
+    out = capsys.readouterr().out
+    assert 'test_site' in out
+    assert load_tlm(t.confdir).co.cm.sites['s2'].get_item('test_site') == 's'
+
+
+def test_delete_and_add_again_within_batch(tlm, load_tlm, tmp_path):
+    t = tlm()
+    t.set_node('11', 'test_old', 'x')
+    run_batch(t, tmp_path, ['del node n0.s0', 'add node n0.s0', 'set node n0.s0 test_new y', 'del site s1', 'add site s1'])
+    cm = load_tlm(t.confdir).co.cm
+    node = [ node for node in cm.nodes.values() if node.record.fullname == 'n0.s0' ][0]
+    assert node.get_item('test_old') is None
+    assert node.get_item('test_new') == 'y'
+    assert cm.sites['s1'].site_nodes == list()
+    assert sorted([ node.record.fullname for node in cm.nodes.values() ]) == ['n0.s0', 'n1.s0']
+
+
+def test_add_and_delete_within_batch_leaves_nothing(tlm, tmp_path):
+    t = tlm()
+    run_batch(t, tmp_path, ['add site s2', 'add node n0.s2', 'del node n0.s2', 'del site s2'])
+    assert not os.path.exists(os.path.join(t.confdir, 'site_s2'))
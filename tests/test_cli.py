@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for parsing the command line arguments"""
+
+import pytest
+
+import tlm
+
+
+@pytest.mark.parametrize('argv', [
+    ['tlm', '--pipeline', 'commit', '-m', 'msg', 'all'],
+    ['tlm', 'commit', '-m', 'msg', '--pipeline', 'all'],
+    ['tlm', '-m', 'msg', 'commit', '--pipeline', 'all'],
+    ['tlm', '-l', 'debug', '--pipeline', 'commit', '-m', 'msg', 'all'],
+])
+def test_options_before_and_after_operation(monkeypatch, argv):
+    monkeypatch.setattr('sys.argv', argv)
+    loglevel, method, method_args, method_kwargs, output_format = tlm.parseopts()
+    assert method == 'commit_all'
+    assert method_kwargs['message'] == 'msg'
+    assert method_kwargs['pipeline']
+
+
+def test_options_of_node_commit(monkeypatch):
+    monkeypatch.setattr('sys.argv', ['tlm', '-m', 'msg', 'commit', 'node', 's0.n0'])
+    loglevel, method, method_args, method_kwargs, output_format = tlm.parseopts()
+    assert method == 'commit_node'
+    assert list(method_args) == ['s0.n0']
+    assert method_kwargs['message'] == 'msg'
+
+
+def test_git_arguments_are_passed_unchanged():
+    argv = ['tlm', 'git', 'log', '-m', '--oneline']
+    assert tlm.reorder_options(argv) == argv
+
+
+def test_reorder_keeps_arguments_after_operation():
+    assert tlm.reorder_options(['tlm', 'commit', '--workers', '4', 'all']) == ['tlm', '--workers', '4', 'commit', 'all']
+
+
+@pytest.mark.parametrize('argv', [
+    ['tlm', 'batch', '-'],
+    ['tlm', '-l', 'debug', 'batch', '-'],
+    ['tlm', 'batch', '-l', 'debug', '-'],
+])
+def test_batch_from_stdin(monkeypatch, argv):
+    monkeypatch.setattr('sys.argv', argv)
+    loglevel, method, method_args, method_kwargs, output_format = tlm.parseopts()
+    assert method == 'batch'
+    assert list(method_args) == ['-']
+
+
+def test_end_of_options():
+    assert tlm.reorder_options(['tlm', '--', 'list', 'sites']) == ['tlm', '--', 'list', 'sites']
+    assert tlm.reorder_options(['tlm', 'show', '--', '-x']) == ['tlm', 'show', '--', '-x']
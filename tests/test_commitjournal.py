@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the journal that allows resuming an interrupted commit"""
+
+import os
+
+from tlm import commitjournal
+
+
+def test_progress_survives_reload(tmp_path):
+    journal = commitjournal.CommitJournal(str(tmp_path))
+    journal.start([11, 12, 13], 'hash', 'msg')
+    journal.record(11, commitjournal.STAGE_RENDERED)
+    journal.record(11, commitjournal.STAGE_VERSIONED, changed=True)
+    journal.record(12, commitjournal.STAGE_RENDERED)
+    journal = commitjournal.CommitJournal(str(tmp_path))
+    assert journal.load()
+    assert (journal.node_ids, journal.generated_hash, journal.message) == ([11, 12, 13], 'hash', 'msg')
+    assert journal.get_pending(commitjournal.STAGE_RENDERED) == [13]
+    assert journal.get_pending(commitjournal.STAGE_VERSIONED) == [12, 13]
+    assert journal.changed == {11}
+    assert not journal.committed
+
+
+def test_incomplete_record_is_ignored(tmp_path):
+    journal = commitjournal.CommitJournal(str(tmp_path))
+    journal.start([11, 12], 'hash')
+    journal.record(11, commitjournal.STAGE_RENDERED)
+    with open(journal.filename, 'a') as f:
+        f.write('{"node": 12, "sta')  # interrupted while writing
+    assert journal.load()
+    assert journal.get_pending(commitjournal.STAGE_RENDERED) == [12]
+
+
+def test_finish_removes_journal(tmp_path):
+    journal = commitjournal.CommitJournal(str(tmp_path))
+    assert not journal.load()
+    journal.start([11], 'hash')
+    journal.record(None, commitjournal.STAGE_COMMITTED)
+    assert journal.exists()
+    journal.finish()
+    assert not os.path.exists(journal.filename)
+
+
+def test_resume_mirrors_remaining_nodes(tlm, rsync_calls, attach_all, capsys):
+    t = tlm()
+    attach_all(t)
+    rsync_calls.failing.add('fe80::12')
+    t.commit_all('msg')
+    assert 'Committing failed for 1 node(s): 12 (mirror)' in capsys.readouterr().out
+    journal = commitjournal.CommitJournal(t.co.confdir_effective)
+    assert journal.exists()
+    rsync_calls.clear()
+    rsync_calls.failing.clear()
+    t.commit_resume()
+    assert len(rsync_calls) == 1 and '[fe80::12]' in rsync_calls[0]
+    assert not os.path.exists(os.path.join(t.co.get_node_dir(11), 'v2'))
+    assert not journal.exists()
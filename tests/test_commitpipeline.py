@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for committing node configs in a pipeline of overlapping stages"""
+
+import threading
+
+import pytest
+
+from tlm import commitpipeline
+from tlm import mirrorstate
+
+
+@pytest.mark.parametrize('streaming', ['false', 'true'])
+def test_all_nodes_pass_all_stages(tlm, rsync_calls, attach_all, streaming):
+    t = tlm(settings=f'update_streaming={streaming}')
+    attach_all(t)
+    cp = commitpipeline.CommitPipeline(t.co, t.confdir, message='test')
+    changed, failed = cp.run(list(t.co.cm.nodes.keys()))
+    assert failed == dict()
+    assert sorted(changed.keys()) == [11, 12, 13, 14]
+    assert len(rsync_calls) == 4
+    assert all([ f'[fe80::{node_id}]:' in ' '.join(rsync_calls) for node_id in changed ])
+
+
+def test_unchanged_nodes_are_not_reported(tlm, rsync_calls, attach_all):
+    t = tlm()
+    attach_all(t)
+    commitpipeline.CommitPipeline(t.co, t.confdir, message='first').run(list(t.co.cm.nodes.keys()))
+    changed, failed = commitpipeline.CommitPipeline(t.co, t.confdir, message='second').run(list(t.co.cm.nodes.keys()))
+    assert (changed, failed) == (dict(), dict())
+
+
+class RecordingDict(dict):
+    """Dictionary recording the names of the threads looking up items"""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.threads = set()
+
+    def __getitem__(self, key):
+        self.threads.add(threading.current_thread().name)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.threads.add(threading.current_thread().name)
+        return super().get(key, default)
+
+
+def test_node_objects_are_just_accessed_by_render_stage(tlm, rsync_calls, attach_all):
+    t = tlm(settings='update_streaming=true')
+    attach_all(t)
+    t.co.cm.nodes = RecordingDict(t.co.cm.nodes)
+    cp = commitpipeline.CommitPipeline(t.co, t.confdir, message='test', mirror_workers=4)
+    changed, failed = cp.run(list(t.co.cm.nodes.keys()))
+    assert failed == dict()
+    assert sorted(changed.keys()) == [11, 12, 13, 14]
+    assert t.co.cm.nodes.threads - {threading.current_thread().name} == {'commit-render-0'}
+
+
+def test_mirror_state_is_saved_once(tlm, rsync_calls, attach_all, monkeypatch):
+    t = tlm()
+    attach_all(t)
+    saves = list()
+    save = mirrorstate.MirrorState.save
+    def counting_save(self):
+        saves.append(True)
+        return save(self)
+    monkeypatch.setattr(mirrorstate.MirrorState, 'save', counting_save)
+    cp = commitpipeline.CommitPipeline(t.co, t.confdir, message='test')
+    cp.run(list(t.co.cm.nodes.keys()))
+    assert len(saves) == 1
+
+
+def test_failed_mirroring_is_reported(tlm, rsync_calls, attach_all):
+    t = tlm()
+    attach_all(t)
+    rsync_calls.failing.add('fe80::12')
+    cp = commitpipeline.CommitPipeline(t.co, t.confdir, message='test')
+    changed, failed = cp.run(list(t.co.cm.nodes.keys()))
+    assert list(failed.keys()) == [12]
+    assert failed[12][0] == 'mirror'
+    assert len(changed) == 4
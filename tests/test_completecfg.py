@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the memoized read-only views of the complete config"""
+
+import os
+
+import pytest
+import yaml
+
+
+def test_complete_cfg_is_read_only_and_memoized(tlm):
+    node = tlm().co.cm.nodes[11]
+    cfg = node.complete_cfg
+    assert cfg is node.complete_cfg
+    assert cfg['node_name'] == 'n0'
+    with pytest.raises(TypeError):
+        cfg['node_name'] = 'other'
+
+
+def test_complete_cfg_nested_is_read_only(tlm):
+    node = tlm().co.cm.nodes[11]
+    node.set_item('a.b', 1)
+    node.save_config()
+    nested = node.complete_cfg_nested
+    assert nested is node.complete_cfg_nested
+    with pytest.raises(TypeError):
+        nested['a']['b'] = 2
+    copy = node.copy_complete_cfg_nested()
+    copy['a']['b'] = 2
+    assert node.complete_cfg_nested['a']['b'] == 1
+
+
+def test_change_of_node_config_invalidates_view(tlm):
+    node = tlm().co.cm.nodes[11]
+    cfg = node.complete_cfg
+    node.set_item('node_hostname', 'other.example.net')
+    node.save_config()
+    assert node.complete_cfg is not cfg
+    assert node.complete_cfg['node_hostname'] == 'other.example.net'
+
+
+def test_change_of_parent_configs_invalidates_views_of_nodes(tlm):
+    cm = tlm().co.cm
+    node = cm.nodes[11]
+    assert node.complete_cfg.get('test_attribute') is None
+    cm.sites['s0'].set_item('test_attribute', 'site')
+    cm.sites['s0'].save_config()
+    assert node.complete_cfg['test_attribute'] == 'site'
+    assert cm.nodes[13].complete_cfg.get('test_attribute') is None
+    cm.globalconf.set_item('test_attribute2', 'global')
+    cm.globalconf.save_config()
+    assert cm.nodes[13].complete_cfg['test_attribute2'] == 'global'
+
+
+def test_tables_are_part_of_effective_config(tlm):
+    t = tlm()
+    node = t.co.cm.nodes[11]
+    node.set_item('a.b', 1)
+    node.save_config()
+    t.commit_all('test')
+    with open(os.path.join(t.co.get_node_dir(11), 'v1', 'config.yaml')) as f:
+        assert yaml.safe_load(f)['a'] == {'b': 1}
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for exporting the complete node configs"""
+
+import json
+
+import pytest
+
+import tlm as tlm_module
+from tlm import towalinkmanager
+
+
+def export(t, capsys, output_format, method, *args):
+    """Runs the given export method and returns its output"""
+    t.output_format = output_format
+    capsys.readouterr()
+    getattr(t, method)(*args)
+    return capsys.readouterr()
+
+
+def test_export_ndjson(tlm, capsys):
+    t = tlm()
+    out = export(t, capsys, towalinkmanager.OUTPUT_FORMAT_NDJSON, 'export_all').out
+    lines = out.splitlines()
+    assert len(lines) == 4
+    records = [ json.loads(line) for line in lines ]
+    assert [ record['node_id'] for record in records ] == [11, 12, 13, 14]
+    assert records[0]['node_fullname'] == 'n0.s0'
+    assert records[0]['node_sshauthkeys'] == ['ssh-ed25519 AAAA test']
+
+
+def test_export_json(tlm, capsys):
+    t = tlm()
+    out = export(t, capsys, towalinkmanager.OUTPUT_FORMAT_JSON, 'export_site', 's1').out
+    records = json.loads(out)
+    assert [ record['node_id'] for record in records ] == [13, 14]
+
+
+def test_export_empty_selection_as_json(tlm, capsys):
+    t = tlm()
+    out = export(t, capsys, towalinkmanager.OUTPUT_FORMAT_JSON, 'export_select', 'id:99').out
+    assert json.loads(out) == []
+
+
+def test_export_select(tlm, capsys):
+    t = tlm()
+    out = export(t, capsys, towalinkmanager.OUTPUT_FORMAT_NDJSON, 'export_select', 'node:n1').out
+    assert [ json.loads(line)['node_id'] for line in out.splitlines() ] == [12, 14]
+
+
+@pytest.mark.parametrize('method, arg, message', [
+    ('export_site', 'unknown', 'A site with this name does not exist'),
+    ('export_select', 'id:x', 'Invalid node identifier'),
+])
+def test_export_errors_go_to_stderr(tlm, capsys, method, arg, message):
+    t = tlm()
+    captured = export(t, capsys, towalinkmanager.OUTPUT_FORMAT_NDJSON, method, arg)
+    assert captured.out == ''
+    assert message in captured.err
+
+
+def test_export_releases_complete_configs(tlm, capsys):
+    t = tlm()
+    export(t, capsys, towalinkmanager.OUTPUT_FORMAT_NDJSON, 'export_all')
+    assert all([ node._complete_cfg is None for node in t.co.cm.nodes.values() ])
+
+
+@pytest.mark.parametrize('argv, method, output_format', [
+    (['tlm', 'export'], 'export_all', 'ndjson'),
+    (['tlm', '--format', 'json', 'export', 'site', 's0'], 'export_site', 'json'),
+    (['tlm', 'export', '--format', 'ndjson', 'select', 'group:g'], 'export_select', 'ndjson'),
+    (['tlm', '--format', 'json', 'query', 'wg_mtu'], 'query', 'json'),
+])
+def test_export_options(monkeypatch, argv, method, output_format):
+    monkeypatch.setattr('sys.argv', argv)
+    result = tlm_module.parseopts()
+    assert (result[1], result[4]) == (method, output_format)
+
+
+@pytest.mark.parametrize('argv', [
+    ['tlm', '--format', 'text', 'export'],
+    ['tlm', '--format', 'ndjson', 'list', 'sites'],
+    ['tlm', '--format', 'json', 'commit', 'all'],
+])
+def test_invalid_output_formats(monkeypatch, argv):
+    monkeypatch.setattr('sys.argv', argv)
+    with pytest.raises(SystemExit):
+        tlm_module.parseopts()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for importing inventories and allocating node identifiers"""
+
+import os
+
+import pytest
+
+from tlm.configmanager import inventory
+from tlm.configmanager import nodeidallocator
+
+
+def test_lowest_free_identifiers_are_allocated():
+    allocator = nodeidallocator.NodeIdAllocator([11, 12, 14])
+    assert [ allocator.allocate() for i in range(3) ] == [13, 15, 16]
+    allocator.release(12)
+    assert allocator.allocate() == 12
+
+
+def test_reserved_identifiers_are_not_released():
+    allocator = nodeidallocator.NodeIdAllocator()
+    allocator.release(5)
+    assert allocator.is_used(5)
+    assert allocator.allocate() == 11
+
+
+def test_allocation_beyond_full_bytes():
+    allocator = nodeidallocator.NodeIdAllocator(range(11, 100))
+    assert allocator.get_free() == 100
+    allocator.release(50)
+    assert allocator.allocate() == 50
+    assert allocator.allocate() == 100
+
+
+def test_yaml_inventory(tmp_path):
+    filename = tmp_path / 'inv.yaml'
+    filename.write_text('sites:\n  a:\n    groups: [g1]\n    nodes:\n      n1: {node_hostname: n1.example.net}\n      n2:\n  b:\n')
+    inv = inventory.Inventory(str(filename))
+    assert inv.sites == {'a': {'groups': ['g1']}, 'b': dict()}
+    assert inv.nodes == {'n1.a': {'node_hostname': 'n1.example.net'}, 'n2.a': dict()}
+
+
+def test_csv_inventory(tmp_path):
+    filename = tmp_path / 'inv.csv'
+    filename.write_text('site,node,node_hostname,wg_mtu,groups\na,,,,"[\'g1\']"\na,n1,n1.example.net,1400,\nb,n2,,,\n')
+    inv = inventory.Inventory(str(filename))
+    assert inv.sites == {'a': {'groups': ['g1']}, 'b': dict()}
+    assert inv.nodes == {'n1.a': {'node_hostname': 'n1.example.net', 'wg_mtu': 1400}, 'n2.b': dict()}
+
+
+@pytest.mark.parametrize('name, content', [('inv.txt', ''), ('inv.yaml', 'sites: [a]\n'), ('inv.csv', 'node\nn1\n'), ('inv.yaml', 'sites:\n  a:\n    nodes:\n      n.1:\n')])
+def test_invalid_inventories_are_rejected(tmp_path, name, content):
+    filename = tmp_path / name
+    filename.write_text(content)
+    with pytest.raises(ValueError):
+        inventory.Inventory(str(filename))
+
+
+def test_import_creates_sites_and_nodes(tlm):
+    t = tlm()
+    inv = inventory.Inventory()
+    inv.add_site('s2', {'groups': ['g2']})
+    inv.add_node('n0', 's2', {'node_hostname': 'new.example.net'})
+    inv.add_node('n2', 's0')
+    assert t.co.cm.import_inventory(inv) == (1, 2)
+    t.co.cm.load_all()
+    fullnames = sorted([ node.record.fullname for node in t.co.cm.nodes.values() ])
+    assert fullnames == ['n0.s0', 'n0.s1', 'n0.s2', 'n1.s0', 'n1.s1', 'n2.s0']
+    assert sorted(t.co.cm.nodes.keys()) == [11, 12, 13, 14, 15, 16]
+    assert os.path.isfile(os.path.join(t.confdir, 'site_s2', 'node_n0', 'config.toml'))
+
+
+def test_import_checks_inventory_before_creating_anything(tlm):
+    t = tlm()
+    inv = inventory.Inventory()
+    inv.add_node('n9', 's3')
+    inv.add_node('n0', 's0')  # exists already
+    with pytest.raises(ValueError):
+        t.co.cm.import_inventory(inv)
+    assert not os.path.exists(os.path.join(t.confdir, 'site_s3'))
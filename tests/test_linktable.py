@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the array-backed link table and the compact node records"""
+
+import pytest
+
+from tlm.configmanager import linktable
+from tlm.configmanager import noderecord
+
+
+def test_links_are_stored_independent_of_direction():
+    table = linktable.LinkTable()
+    table.add(12, 11, True, False, 1400)
+    assert table.get(11, 12) == (11, 12, True, False, 1400)
+    assert table.get(12, 11) == (11, 12, True, False, 1400)
+    assert table.get(11, 13) is None
+
+
+def test_adding_existing_link_updates_it():
+    table = linktable.LinkTable()
+    table.add(11, 12, True, True, 1400)
+    table.add(12, 11, False, True)
+    assert len(table) == 1
+    assert table.get(11, 12) == (11, 12, False, True, None)
+
+
+def test_links_of_node_are_ordered_by_peer():
+    table = linktable.LinkTable()
+    table.add(13, 11, True, True)
+    table.add(11, 12, True, False)
+    table.add(12, 13, False, False)
+    assert list(table.iter_node_links(11)) == [(12, True, False, None), (13, True, True, None)]
+    table.add(11, 14, True, True)  # the rows per node are built again after adding a link
+    assert [ peer for peer, _, _, _ in table.iter_node_links(11) ] == [12, 13, 14]
+    assert list(table.iter_node_links(15)) == list()
+
+
+def test_table_from_generated_links_is_read_only():
+    table = linktable.LinkTable.from_links({'11-12': {'active': True, 'wg_active': True, 'wg_mtu': 1380}, '12-13': {}})
+    assert sorted(table) == [(11, 12, True, True, 1380), (12, 13, False, False, None)]
+    with pytest.raises(ValueError):
+        table.add(11, 13, True, True)
+
+
+def test_node_record_is_read_only():
+    record = noderecord.NodeRecord(11, 'n0', 's0', 'h11.example.net', ['g1'], wg_allowedips=['10.0.0.0/8'])
+    assert record.fullname == 'n0.s0'
+    assert record.groups == frozenset(['g1'])
+    assert record.wg_allowedips == ('10.0.0.0/8',)
+    with pytest.raises(AttributeError):
+        record.name = 'n1'
+
+
+def test_node_record_from_config(tlm):
+    t = tlm(settings='wg_mtu=1400\nwg_allowedips="10.1.0.0/16"')
+    record = t.co.cm.nodes[12].record
+    assert (record.node_id, record.fullname, record.hostname) == (12, 'n1.s0', 'h12.example.net')
+    assert record.wg_mtu == 1400
+    assert record.wg_allowedips == ('10.1.0.0/16',)
+    assert not record.route_reflector
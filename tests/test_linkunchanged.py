@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for hardlinking unchanged files between config versions"""
+
+import os
+
+
+def write(path, content, mode=0o644):
+    with open(path, 'w') as f:
+        f.write(content)
+    os.chmod(path, mode)
+
+
+def is_linked(path1, path2):
+    return os.stat(path1).st_ino == os.stat(path2).st_ino
+
+
+def test_link_unchanged_files(tlm, tmp_path):
+    t = tlm()
+    latest, next = tmp_path / 'v1', tmp_path / 'v2'
+    latest.mkdir()
+    next.mkdir()
+    for name in ['same', 'changed', 'mode', 'symlink']:
+        write(latest / name, 'a')
+    write(next / 'same', 'a')
+    write(next / 'changed', 'b')
+    write(next / 'mode', 'a', 0o600)
+    write(next / 'new', 'a')
+    os.symlink('same', next / 'symlink')
+    (next / 'subdir').mkdir()
+    t.co.link_unchanged_files(str(latest), str(next))
+    assert is_linked(latest / 'same', next / 'same')
+    assert not is_linked(latest / 'changed', next / 'changed')
+    assert not is_linked(latest / 'mode', next / 'mode')
+    assert os.path.islink(next / 'symlink')
+    assert (next / 'changed').read_text() == 'b'
+    assert sorted(os.listdir(next)) == ['changed', 'mode', 'new', 'same', 'subdir', 'symlink']  # no temporary files left
+
+
+def test_new_versions_link_unchanged_files(tlm, rsync_calls):
+    t = tlm()
+    t.set_node('11', 'attach_mgmt_address', 'fe80::11')
+    t.commit_all('first')
+    t.set_node('11', 'node_hostname', '"changed.example.net"')
+    t.commit_all('second')
+    nodedir = t.co.get_node_dir(11)
+    v1, v2 = os.path.join(nodedir, 'v1'), os.path.join(nodedir, 'v2')
+    linked = [ file for file in os.listdir(v2) if os.path.isfile(os.path.join(v1, file)) and is_linked(os.path.join(v1, file), os.path.join(v2, file)) ]
+    assert len(linked) > 0
+    assert 'config.yaml' not in linked
+    with open(os.path.join(v1, linked[0])) as f1, open(os.path.join(v2, linked[0])) as f2:
+        assert f1.read() == f2.read()
+    assert all([ ' -H ' in command for command in rsync_calls ])
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for skipping nodes whose config versions have already been mirrored"""
+
+import json
+import os
+
+import pytest
+
+from tlm import mirrorstate
+from tlm import transferengine
+
+
+def test_signature():
+    signature = mirrorstate.MirrorState.get_signature('fe80::1', ['v1', 'v2'])
+    assert signature == mirrorstate.MirrorState.get_signature('fe80::1', ['v2', 'v1'])
+    assert signature != mirrorstate.MirrorState.get_signature('fe80::2', ['v1', 'v2'])
+    assert signature != mirrorstate.MirrorState.get_signature('fe80::1', ['v1', 'v2', 'v3'])
+
+
+def test_save_and_load(tmp_path):
+    state = mirrorstate.MirrorState(str(tmp_path))
+    assert state.get(11) is None
+    assert not state.save()  # nothing changed
+    state.set(11, 'a')
+    state.set(12, 'b')
+    assert state.save()
+    assert not state.save()
+    state = mirrorstate.MirrorState(str(tmp_path))
+    assert (state.get(11), state.get(12)) == ('a', 'b')
+    state.set(11, None)
+    state.set(13, None)
+    assert state.save()
+    with open(tmp_path / mirrorstate.MIRROR_STATE_FILENAME) as f:
+        assert json.load(f) == {'12': 'b'}
+
+
+@pytest.mark.parametrize('content', ['{broken', '[1, 2]'])
+def test_unreadable_file_is_ignored(tmp_path, content):
+    (tmp_path / mirrorstate.MIRROR_STATE_FILENAME).write_text(content)
+    assert mirrorstate.MirrorState(str(tmp_path)).get(11) is None
+
+
+def statuses(results):
+    return { result.node_id: result.status for result in results }
+
+
+@pytest.fixture
+def t(tlm, rsync_calls, attach_all):
+    t = tlm()
+    attach_all(t)
+    t.commit_all('first')
+    rsync_calls.clear()
+    return t
+
+
+def test_nodes_in_sync_are_not_mirrored(t, rsync_calls):
+    assert set(statuses(t.co.mirror_nodes([11, 12])).values()) == {transferengine.STATUS_CURRENT}
+    assert rsync_calls == []
+    assert set(statuses(t.co.mirror_nodes([11, 12], force=True)).values()) == {transferengine.STATUS_OK}
+    assert len(rsync_calls) == 2
+
+
+def test_changed_address_is_mirrored(t, rsync_calls):
+    t.set_node('13', 'attach_mgmt_address', 'fe80::99')
+    assert statuses(t.co.mirror_nodes([11, 13])) == {11: transferengine.STATUS_CURRENT, 13: transferengine.STATUS_OK}
+    assert len(rsync_calls) == 1 and '[fe80::99]' in rsync_calls[0]
+
+
+def test_failed_mirroring_forgets_the_state(t, rsync_calls):
+    rsync_calls.failing.add('fe80::12')
+    assert statuses(t.co.mirror_nodes([12], force=True)) == {12: transferengine.STATUS_FAILED}
+    assert t.co.mirror_state.get(12) is None
+    rsync_calls.failing.clear()
+    assert statuses(t.co.mirror_nodes([12])) == {12: transferengine.STATUS_OK}
+    assert statuses(t.co.mirror_nodes([12])) == {12: transferengine.STATUS_CURRENT}
+
+
+def test_new_version_is_mirrored(t, rsync_calls):
+    t.set_global('wg_mtu', '1300')
+    t.commit_all('second')
+    assert os.path.isdir(os.path.join(t.co.get_node_dir(11), 'v2'))
+    assert len(rsync_calls) == 4  # the commit mirrored the new versions
+    assert set(statuses(t.co.mirror_nodes([11, 12, 13, 14])).values()) == {transferengine.STATUS_CURRENT}
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for keeping a bounded window of config versions on the nodes"""
+
+import os
+import re
+
+import pytest
+
+from tlm import filesync
+
+
+def test_version_filters():
+    fs = filesync.FileSync('/src', '/dst')
+    assert fs.get_version_filters(['v3', 'v7']) == ['--delete', '"--filter=+ /v3"', '"--filter=+ /v7"',
+                                                    '"--filter=H /v*"', '"--filter=R /v*"', '"--filter=P /*"']
+
+
+def make_versions(tlm, node_id, versions, active=None):
+    """Creates the given version directories (and the "active" symlink) for the given node"""
+    nodedir = tlm.co.get_node_dir(node_id)
+    for version in versions:
+        os.makedirs(os.path.join(nodedir, version))
+    open(os.path.join(nodedir, 'v99x'), 'w').close()  # not a version directory
+    if active is not None:
+        os.symlink(active, os.path.join(nodedir, 'active'))
+
+
+@pytest.mark.parametrize('mirror_versions, active, expected', [
+    (0, None, ['v1', 'v2', 'v3', 'v10']),
+    (2, None, ['v3', 'v10']),
+    (2, 'v1', ['v1', 'v3', 'v10']),
+    (2, 'v3', ['v3', 'v10']),
+    (9, 'v1', ['v1', 'v2', 'v3', 'v10']),
+])
+def test_get_mirror_versions(tlm, mirror_versions, active, expected):
+    t = tlm()
+    t.set_global('mirror_versions', str(mirror_versions))
+    make_versions(t, 11, ['v1', 'v2', 'v3', 'v10'], active)
+    assert t.co.get_config_versions(11) == ['v1', 'v2', 'v3', 'v10']
+    assert t.co.get_mirror_versions(11) == expected
+
+
+def test_no_versions(tlm):
+    t = tlm()
+    t.set_global('mirror_versions', '2')
+    assert t.co.get_mirror_versions(11) == []
+
+
+@pytest.mark.parametrize('mirror_versions, expected_filters', [(0, []), (2, ['+ /v2', '+ /v3'])])
+def test_mirroring_uses_filters(tlm, rsync_calls, mirror_versions, expected_filters):
+    t = tlm()
+    t.set_global('mirror_versions', str(mirror_versions))
+    t.set_node('11', 'attach_mgmt_address', 'fe80::11')
+    make_versions(t, 11, ['v1', 'v2', 'v3'])
+    assert t.co.mirror_node(11) == 'ok'
+    filters = re.findall(r'"--filter=(\+ [^"]*)"', rsync_calls[0])
+    assert filters == expected_filters
+    assert ('--delete' in rsync_calls[0].split(' ')) == (mirror_versions > 0)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for selecting nodes for bulk operations"""
+
+import pytest
+
+
+@pytest.mark.parametrize('selector, expected', [
+    ('site:s0', [11, 12]),
+    ('node:n1', [12, 14]),
+    ('node:n1.s1', [14]),
+    ('node:n*.s*', [11, 12, 13, 14]),
+    ('id:13', [13]),
+    ('id:99', []),
+    ('site:s1,node:n0', [13]),
+    ('node_hostname=h1[23].*', [12, 13]),
+    ('site:s0,node_hostname=h12.*', [12]),
+])
+def test_selectors(tlm, selector, expected):
+    assert tlm().co.cm.select_nodes(selector) == expected
+
+
+@pytest.mark.parametrize('selector', ['', 'id:x', '!a=b', '=b'])
+def test_invalid_selectors(tlm, selector):
+    with pytest.raises(ValueError):
+        tlm().co.cm.select_nodes(selector)
+
+
+def test_groups_are_indexed(tlm):
+    t = tlm()
+    t.set_site('s1', 'groups', '["g1", "g2"]')
+    t.co.cm.load_all()
+    assert t.co.cm.select_nodes('group:g2') == [13, 14]
+
+
+def test_selection_reflects_set(tlm):
+    t = tlm()
+    assert t.co.cm.select_nodes('group:g9') == []
+    assert t.co.cm.select_nodes('wg_mtu<1400') == []
+    t.set_node('12', 'groups', '["g9"]')
+    t.set_site('s1', 'wg_mtu', '1380')
+    assert t.co.cm.select_nodes('group:g9') == [12]
+    assert t.co.cm.select_nodes('wg_mtu<1400') == [13, 14]
+
+
+def test_set_select(tlm, capsys):
+    t = tlm()
+    t.set_select('site:s1', 'test_attribute', 'x')
+    assert 'Attribute set for [2] nodes' in capsys.readouterr().out
+    assert t.co.cm.select_nodes('test_attribute=x') == [13, 14]
+    assert t.co.cm.nodes[13].get_item('test_attribute') == 'x'
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for re-rendering just the templates whose inputs changed"""
+
+import os
+
+from tlm import jinjatransformer
+from tlm import rendercache
+
+
+def render(templatedir, cachedir, data):
+    """Renders all templates of the given directory using a render cache; returns the cache"""
+    cache = rendercache.RenderCache(cachedir)
+    jt = jinjatransformer.JinjaTransformer(templatedir=templatedir)
+    jt.render_templatefiles_to_files(templatedir, data=data, cache=cache)
+    cache.save()
+    return cache
+
+
+def write_templates(templatedir):
+    os.makedirs(templatedir, exist_ok=True)
+    with open(os.path.join(templatedir, 'a.conf.jinja'), 'w') as f:
+        f.write('a={{ a }}\n')
+    with open(os.path.join(templatedir, 'b.conf.jinja'), 'w') as f:
+        f.write('b={{ b }}\n')
+
+
+def test_unchanged_inputs_are_restored(tmp_path):
+    templatedir, cachedir = str(tmp_path / 'templates'), str(tmp_path / 'cache')
+    write_templates(templatedir)
+    cache = render(templatedir, cachedir, {'a': 1, 'b': 2})
+    assert (cache.hits, cache.misses) == (0, 2)
+    cache = render(templatedir, cachedir, {'a': 1, 'b': 2, 'unused': 3})
+    assert (cache.hits, cache.misses) == (2, 0)
+    with open(os.path.join(templatedir, 'a.conf')) as f:
+        assert f.read() == 'a=1'
+
+
+def test_changed_input_is_rendered_again(tmp_path):
+    templatedir, cachedir = str(tmp_path / 'templates'), str(tmp_path / 'cache')
+    write_templates(templatedir)
+    render(templatedir, cachedir, {'a': 1, 'b': 2})
+    cache = render(templatedir, cachedir, {'a': 5, 'b': 2})
+    assert (cache.hits, cache.misses) == (1, 1)
+    with open(os.path.join(templatedir, 'a.conf')) as f:
+        assert f.read() == 'a=5'
+
+
+def test_changed_template_is_rendered_again(tmp_path):
+    templatedir, cachedir = str(tmp_path / 'templates'), str(tmp_path / 'cache')
+    write_templates(templatedir)
+    render(templatedir, cachedir, {'a': 1, 'b': 2})
+    with open(os.path.join(templatedir, 'a.conf.jinja'), 'w') as f:
+        f.write('a is {{ a }}\n')
+    cache = render(templatedir, cachedir, {'a': 1, 'b': 2})
+    assert cache.misses == 1
+    with open(os.path.join(templatedir, 'a.conf')) as f:
+        assert f.read() == 'a is 1'
+
+
+def test_unused_entries_are_removed(tmp_path):
+    templatedir, cachedir = str(tmp_path / 'templates'), str(tmp_path / 'cache')
+    write_templates(templatedir)
+    render(templatedir, cachedir, {'a': 1, 'b': 2})
+    os.unlink(os.path.join(templatedir, 'b.conf.jinja'))
+    render(templatedir, cachedir, {'a': 1})
+    assert [ item.split('.')[0] for item in sorted(os.listdir(cachedir)) ] == ['a', 'index']
+
+
+def test_corrupt_index_is_ignored(tmp_path):
+    cachedir = tmp_path / 'cache'
+    cachedir.mkdir()
+    (cachedir / rendercache.INDEX_FILENAME).write_text('{broken')
+    cache = rendercache.RenderCache(str(cachedir))
+    assert not cache.restore('a.conf', 'key', str(tmp_path / 'a.conf'))
+
+
+def test_interrupted_render_keeps_cached_output_consistent(tmp_path):
+    cachedir = str(tmp_path / 'cache')
+    (tmp_path / 'a.conf').write_text('OLD')
+    cache = rendercache.RenderCache(cachedir)
+    cache.store('a.conf', 'k1', str(tmp_path / 'a.conf'))
+    cache.save()
+    (tmp_path / 'a.conf').write_text('NEW')
+    cache = rendercache.RenderCache(cachedir)
+    cache.store('a.conf', 'k2', str(tmp_path / 'a.conf'))  # rendering fails afterwards; the index is not saved
+    cache = rendercache.RenderCache(cachedir)
+    assert cache.restore('a.conf', 'k1', str(tmp_path / 'restored.conf'))
+    assert (tmp_path / 'restored.conf').read_text() == 'OLD'
+    assert not cache.restore('a.conf', 'k2', str(tmp_path / 'restored.conf'))
+    cache.save()
+    assert sorted(os.listdir(cachedir)) == ['a.conf.k1', rendercache.INDEX_FILENAME]
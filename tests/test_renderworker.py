@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for distributing the rendering of node configs to worker processes"""
+
+import os
+import threading
+
+import pytest
+
+from tlm import configorchestrator
+from tlm import renderworker
+
+
+def coordinator(tlm, chunk_size=renderworker.CHUNK_SIZE):
+    """Returns a render coordinator for all nodes that accepts worker connections in a thread"""
+    tlm.co.update_generated_config()
+    rc = renderworker.RenderCoordinator(tlm.co, list(tlm.co.cm.nodes.keys()), tlm.co.cm.generated.get_hash(), chunk_size=chunk_size)
+    threading.Thread(target=rc.accept_connections, daemon=True).start()
+    return rc
+
+
+def test_workers_render_all_nodes(tlm):
+    t = tlm()
+    rc = coordinator(t, chunk_size=1)
+    workers = [ threading.Thread(target=renderworker.run_worker, args=(t.confdir, rc.address, rc.token, f'w{i}')) for i in range(2) ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+    assert rc.finished.is_set()
+    rc.sock.close()
+    assert sorted(rc.rendered.keys()) == [11, 12, 13, 14]
+    assert rc.failed == dict()
+    outputdir = os.path.join(t.co.get_node_dir(11), configorchestrator.NAME_OUTPUT_DIRECTORY)
+    assert rc.rendered[11] == renderworker.get_manifest(outputdir)
+
+
+def test_worker_with_invalid_token_is_rejected(tlm):
+    t = tlm()
+    rc = coordinator(t)
+    assert renderworker.run_worker(t.confdir, rc.address, 'invalid') == 0
+    rc.sock.close()
+    assert rc.rendered == dict()
+    assert rc.chunks.qsize() == 1
+
+
+def test_worker_with_different_generated_config_exits(tlm):
+    t = tlm()
+    rc = coordinator(t)
+    rc.generated_hash = 'other'
+    assert renderworker.run_worker(t.confdir, rc.address, rc.token) == 0
+    rc.sock.close()
+    assert rc.rendered == dict()
+
+
+def test_coordinator_renders_without_workers(tlm):
+    t = tlm()
+    t.co.update_generated_config()
+    rc = renderworker.RenderCoordinator(t.co, list(t.co.cm.nodes.keys()), t.co.cm.generated.get_hash())
+    rendered, failed = rc.run(num_workers=0)
+    assert sorted(rendered.keys()) == [11, 12, 13, 14]
+    assert failed == dict()
+
+
+def test_mismatching_manifest_fails_node(tlm):
+    t = tlm()
+    t.co.update_generated_config()
+    rc = renderworker.RenderCoordinator(t.co, [11], t.co.cm.generated.get_hash())
+    rc.sock.close()
+    rc.process_result([11], {'manifests': {'11': {'tlwg.conf': 'wrong'}}, 'failed': dict()})
+    assert list(rc.failed.keys()) == [11]
+    assert rc.finished.is_set()
+
+
+@pytest.mark.parametrize('address, expected', [('127.0.0.1:4000', ('127.0.0.1', 4000)), ('[::1]:4000', ('::1', 4000))])
+def test_parse_address(address, expected):
+    assert renderworker.parse_address(address) == expected
+
+
+def test_parse_address_without_port():
+    with pytest.raises(ValueError):
+        renderworker.parse_address('127.0.0.1')
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the single WireGuard interface mode"""
+
+import os
+
+import yaml
+
+
+def read_effective(tlm, node_id, version='v1'):
+    with open(os.path.join(tlm.co.get_node_dir(node_id), version, 'config.yaml')) as f:
+        return yaml.safe_load(f)
+
+
+def test_single_interface_has_peer_per_link(tlm):
+    t = tlm(settings='wg_interface_mode="single"')
+    t.commit_all('test')
+    cfg = read_effective(t, 11)
+    assert cfg['wg_interface']['wg_ifname'] == 'tlwg_mesh'
+    assert sorted(cfg['wg_interface']['wg_peers'].keys()) == [12, 13, 14]
+    assert 'wg_links' not in cfg
+
+
+def test_node_added_after_first_commit(tlm, load_tlm):
+    t = tlm(settings='wg_interface_mode="single"')
+    t.commit_all('first')
+    t = load_tlm(t.confdir)  # the generated config is loaded from disk
+    t.co.cm.add_node('n2.s0', attrs={'node_hostname': 'h15.example.net'})
+    t.commit_all('second')
+    node_id = max(t.co.cm.nodes.keys())
+    assert sorted(read_effective(t, node_id)['wg_interface']['wg_peers'].keys()) == [11, 12, 13, 14]
+    assert node_id in read_effective(t, 11, 'v2')['wg_interface']['wg_peers']
+
+
+def test_switch_existing_install_to_single_interface(tlm, load_tlm):
+    t = tlm()
+    t.commit_all('first')
+    t = load_tlm(t.confdir)
+    t.set_global('wg_interface_mode', 'single')
+    t.commit_all('second')
+    cfg = read_effective(t, 11, 'v2')
+    assert cfg['wg_interface']['wg_private'] == t.co.cm.generated.get_nodedata(11)['wg_private']
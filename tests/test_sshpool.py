@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the pool of multiplexed SSH master connections"""
+
+import os
+
+import pytest
+
+from tlm import filesync
+from tlm import sshpool
+
+
+def test_ssh_options(tmp_path):
+    pool = sshpool.SSHPool(control_dir=str(tmp_path / 'ssh'), persist=30, connect_timeout=5)
+    assert os.stat(pool.control_dir).st_mode & 0o777 == 0o700
+    assert pool.get_ssh_options() == ['-o', 'ConnectTimeout=5', '-o', 'ControlMaster=auto',
+                                      '-o', f'ControlPath={tmp_path}/ssh/%C', '-o', 'ControlPersist=30s']
+    assert pool.get_ssh_command() == f'ssh -o ConnectTimeout=5 -o ControlMaster=auto -o ControlPath={tmp_path}/ssh/%C -o ControlPersist=30s'
+
+
+def test_ansible_env(tmp_path):
+    pool = sshpool.SSHPool(control_dir=str(tmp_path), persist=0)
+    env = pool.get_ansible_env()
+    assert env['ANSIBLE_SSH_ARGS'] == '-o ConnectTimeout=2 -o ControlMaster=auto -o ControlPersist=yes'
+    assert env['ANSIBLE_SSH_CONTROL_PATH'] == f'{tmp_path}/%%C'
+
+
+@pytest.mark.parametrize('persist, alive, expected_commands, expected_sockets', [
+    (0, True, ['exit', 'exit'], []),
+    (60, False, ['check', 'check'], []),
+    (60, True, ['check', 'check'], ['a', 'b']),
+])
+def test_close(tmp_path, monkeypatch, persist, alive, expected_commands, expected_sockets):
+    controldir = tmp_path / 'ssh'
+    pool = sshpool.SSHPool(control_dir=str(controldir), persist=persist)
+    (controldir / 'a').touch()
+    (controldir / 'b').touch()
+    commands = list()
+    def control(self, socket, command):
+        commands.append(command)
+        return alive
+    monkeypatch.setattr(sshpool.SSHPool, 'control', control)
+    pool.close()
+    assert commands == expected_commands
+    assert pool.get_sockets() == [ str(controldir / item) for item in expected_sockets ]
+    assert controldir.exists() == (len(expected_sockets) > 0)
+
+
+def test_orchestrator_without_multiplexing(tlm):
+    t = tlm()
+    assert t.co.ssh_pool is None
+    assert t.co.get_ansible_env() is None
+    assert t.co.get_filesync(11, 10).ssh_command == filesync.SSH_COMMAND_DEFAULT
+
+
+def test_orchestrator_with_multiplexing(tlm, tmp_path):
+    t = tlm(settings=f'ssh_control_dir="{tmp_path}/ssh"\nssh_control_persist=0')
+    t.set_global('ssh_multiplexing', 'true')
+    assert 'ControlPersist=yes' in t.co.get_filesync(11, 10).ssh_command
+    assert t.co.get_ansible_env()['ANSIBLE_SSH_CONTROL_PATH'] == f'{tmp_path}/ssh/%%C'
+    t.co.close()
+    assert t.co._ssh_pool is None
+    assert not (tmp_path / 'ssh').exists()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the memory-bounded streaming mode for rendering node configs"""
+
+import gc
+import os
+import tracemalloc
+
+import pytest
+
+from tlm import configorchestrator
+
+
+NODES_PER_SITE = 4
+SITES_SMALL = 1
+SITES_LARGE = 12
+PADDING = '\n'.join([ f'padding{i}="{"x" * 100}"' for i in range(100) ])  # makes the complete node configs big (about 36 kB each when loaded)
+MAX_RETAINED_PER_NODE = 8 * 1024  # bytes
+MAX_PEAK_PER_NODE = 16 * 1024  # bytes
+
+
+def measure(confdir, load_tlm, nsites):
+    """Returns the memory retained and the peak memory allocated for rendering the configs of all nodes in streaming mode
+
+    Each site forms its own group, so that the number of links per node doesn't depend on the number of sites.
+    """
+    confdir = confdir(nsites, NODES_PER_SITE, f'update_streaming=true\n{PADDING}')
+    for filename in os.listdir(confdir):
+        if filename.startswith('bird') or filename.startswith('startup'):
+            os.unlink(os.path.join(confdir, filename))  # rendering just the WireGuard configs keeps the test fast
+    for site in range(nsites):
+        with open(os.path.join(confdir, f'site_s{site}', 'config.toml'), 'w') as f:
+            f.write(f'groups=["g{site}"]\n')
+    tlm = load_tlm(confdir)
+    tlm.co.update_generated_config()
+    for node in tlm.co.cm.nodes.values():
+        node.release()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        tlm.co.update_all()
+        gc.collect()
+        return tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+
+def test_streaming_bounds_memory(confdir, load_tlm):
+    small_current, small_peak = measure(confdir, load_tlm, SITES_SMALL)
+    large_current, large_peak = measure(confdir, load_tlm, SITES_LARGE)
+    nodes = (SITES_LARGE - SITES_SMALL) * NODES_PER_SITE
+    # Just the compact node records are kept; the configs of the nodes are released after rendering
+    assert (large_current - small_current) / nodes < MAX_RETAINED_PER_NODE
+    # The peak grows just by what is kept per node anyway (records, generated links), not by a complete config per node
+    assert (large_peak - small_peak) / nodes < MAX_PEAK_PER_NODE
+
+
+@pytest.mark.parametrize('setting, value', [
+    ('update_streaming', 'true'),
+    ('render_listen_address', '127.0.0.2'),
+    ('wg_interface_mode', 'link'),
+    ('bgp_topology', 'mesh'),
+    ('site_topology', 'mesh'),
+    ('max_parallel_transfers', '4'),
+    ('transfer_timeout', '30'),
+    ('ssh_control_persist', '30'),
+    ('mirror_versions', '3'),
+])
+def test_controller_settings_are_not_part_of_node_configs(tlm, capsys, setting, value):
+    assert setting in configorchestrator.CONTROLLER_SETTINGS
+    t = tlm()
+    t.commit_all('first')
+    t.set_global(setting, value)
+    capsys.readouterr()
+    t.commit_all('second')
+    assert 'No node configuration has changed' in capsys.readouterr().out
+    assert not os.path.exists(os.path.join(t.co.get_node_dir(11), 'v2'))
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the BGP and site topologies"""
+
+import os
+
+import pytest
+import yaml
+
+
+def read_effective(tlm, node_id):
+    with open(os.path.join(tlm.co.get_node_dir(node_id), 'v1', 'config.yaml')) as f:
+        return yaml.safe_load(f)
+
+
+def test_route_reflector_just_drops_bgp_sessions(tlm):
+    t = tlm(settings='bgp_topology="route_reflector"')
+    t.commit_all('test')
+    hub, client = read_effective(t, 11), read_effective(t, 12)
+    assert sorted(hub['bgp_peers'].keys()) == [12, 13, 14]
+    assert sorted(client['bgp_peers'].keys()) == [11]
+    assert sorted(client['wg_links'].keys()) == [11, 13, 14]
+
+
+def test_flagged_route_reflector_is_hub(tlm):
+    t = tlm(settings='bgp_topology="route_reflector"')
+    t.set_node('13', 'bgp_route_reflector', 'true')
+    t.commit_all('test')
+    assert sorted(read_effective(t, 11)['bgp_peers'].keys()) == [13]
+    assert sorted(read_effective(t, 13)['bgp_peers'].keys()) == [11, 12, 14]
+
+
+def test_route_reflector_with_single_interface_keeps_all_peers(tlm):
+    t = tlm(settings='bgp_topology="route_reflector"\nwg_interface_mode="single"')
+    t.commit_all('test')
+    client = read_effective(t, 12)
+    assert sorted(client['bgp_peers'].keys()) == [11]
+    peers = client['wg_interface']['wg_peers']
+    assert sorted(peers.keys()) == [11, 13, 14]  # traffic to the other nodes doesn't pass the hub
+    assert t.co.get_node_address('loopback_ipv4', 13, keep_prefixlen=False) in peers[13]['wg_peer_allowedips']
+
+
+def test_invalid_bgp_topology_is_rejected(tlm):
+    t = tlm(settings='bgp_topology="star"')
+    with pytest.raises(ValueError):
+        t.co.update_generated_config()
+
+
+def test_sites_are_just_linked_via_gateways(tlm):
+    t = tlm(settings='site_topology="gateway"')
+    t.set_node('14', 'site_gateway', 'true')
+    t.commit_all('test')
+    assert sorted(read_effective(t, 11)['wg_links'].keys()) == [12, 14]
+    assert sorted(read_effective(t, 12)['wg_links'].keys()) == [11]
+    assert sorted(read_effective(t, 13)['wg_links'].keys()) == [14]
+    assert sorted(read_effective(t, 14)['bgp_peers'].keys()) == [11, 13]
+
+
+def test_gateway_topology_with_single_interface_is_rejected(tlm):
+    t = tlm(settings='site_topology="gateway"\nwg_interface_mode="single"')
+    with pytest.raises(ValueError, match='site_topology'):
+        t.co.update_generated_config()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for transferring configs to many nodes in parallel"""
+
+import subprocess
+import threading
+
+from tlm import transferengine
+
+
+def test_results_of_all_nodes(monkeypatch):
+    threads = set()
+    def func(node_id):
+        threads.add(threading.current_thread().name)
+        if node_id == 12:
+            return transferengine.STATUS_FAILED, 'rsync exit code 23'
+        if node_id == 13:
+            raise subprocess.TimeoutExpired('rsync', 5)
+        if node_id == 14:
+            raise RuntimeError('broken')
+        return transferengine.STATUS_OK
+    callbacks = list()
+    engine = transferengine.TransferEngine(max_parallel=4, timeout=5)
+    results = engine.run([11, 12, 13, 14, 15], func, callback=callbacks.append)
+    assert len(callbacks) == 5
+    results = { result.node_id: result for result in results }
+    assert [ results[node_id].status for node_id in sorted(results) ] == ['ok', 'failed', 'timeout', 'failed', 'ok']
+    assert results[13].message == 'no response within 5 s'
+    assert results[14].message == 'broken'
+    assert all([ name.startswith('transfer') for name in threads ])
+
+
+def test_sequential_for_single_worker():
+    threads = set()
+    def func(node_id):
+        threads.add(threading.current_thread().name)
+        return transferengine.STATUS_OK
+    results = transferengine.TransferEngine(max_parallel=0).run([11, 12], func)
+    assert [ result.node_id for result in results ] == [11, 12]
+    assert threads == {threading.current_thread().name}
+
+
+def test_format_summary():
+    results = [
+        transferengine.TransferResult(13, transferengine.STATUS_OK, 1.0),
+        transferengine.TransferResult(11, transferengine.STATUS_OK, 3.0),
+        transferengine.TransferResult(14, transferengine.STATUS_TIMEOUT, 60.0, 'no response within 60 s'),
+        transferengine.TransferResult(12, transferengine.STATUS_FAILED, 0.5),
+        transferengine.TransferResult(15, transferengine.STATUS_SKIPPED, 0.0),
+    ]
+    lines = transferengine.TransferEngine.format_summary(results, action='Mirroring', names={14: 'n1.s1'})
+    assert lines[0].split() == ['Status', 'Nodes', 'Min', '[s]', 'Avg', '[s]', 'Max', '[s]']
+    assert [ line.split() for line in lines[1:5] ] == [
+        ['ok', '2', '1.00', '2.00', '3.00'],
+        ['failed', '1', '0.50', '0.50', '0.50'],
+        ['timeout', '1', '60.00', '60.00', '60.00'],
+        ['skipped', '1', '0.00', '0.00', '0.00'],
+    ]
+    assert lines[5:] == [
+        'Mirroring failed for node 12: failed',
+        'Mirroring failed for node n1.s1 (14): timeout (no response within 60 s)',
+    ]
+
+
+def test_format_summary_without_results():
+    assert len(transferengine.TransferEngine.format_summary([])) == 1
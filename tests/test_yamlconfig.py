@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the canonical serialization of effective configs"""
+
+import json
+
+import tomlkit
+import yaml
+
+from tlm.configmanager import yamlconfig
+
+
+def make_cfg(num_peers):
+    """Returns a node config with the given number of peers"""
+    cfg = { 'node_name': 'primary', 'site_name': 'site_a', 'bgp_as': 65001, 'bgp_peers': dict(), 'wg_links': dict() }
+    for peer in range(2, num_peers + 2):
+        cfg['bgp_peers'][peer] = { 'as': 65000 + peer, 'name': f'site_node_{peer}', 'ip': f'192.88.99.{peer}' }
+        cfg['wg_links'][peer] = { 'wg_ifname': f'tlwg_{peer}', 'wg_peer_allowedips': ['0.0.0.0/0', '0::0/0'], 'wg_peer_keepalive': 25 }
+    return cfg
+
+
+def test_dump_matches_previous_serialization_of_plain_types():
+    cfg = make_cfg(20)
+    assert yamlconfig.YAMLConfig(d=cfg).dump() == yaml.dump(cfg, default_flow_style=False)
+
+
+def test_tomlkit_items_are_dumped_as_plain_types():
+    doc = tomlkit.parse('bgp_as=65001\nname="n"\nenabled=true\nmtu=1.5\nlist=[1, 2]\n[sub]\nx=1\n')
+    text = yamlconfig.YAMLConfig(d=dict(doc)).dump()
+    assert '!!python' not in text
+    assert yaml.safe_load(text) == {'bgp_as': 65001, 'name': 'n', 'enabled': True, 'mtu': 1.5, 'list': [1, 2], 'sub': {'x': 1}}
+
+
+def test_json_sidecar_matches_yaml(tmp_path):
+    cfg = make_cfg(5)
+    yc = yamlconfig.YAMLConfig(d=cfg, filename=str(tmp_path / 'config.yaml'))
+    yc.save_config()
+    yc.save_json(str(tmp_path / 'config.json'))
+    with open(tmp_path / 'config.json') as f:
+        from_json = json.load(f)
+    loaded = yamlconfig.YAMLConfig(filename=str(tmp_path / 'config.yaml'))
+    loaded.load_config()
+    assert from_json == json.loads(json.dumps(loaded.cfg))  # JSON has string keys only
+
+
+def test_numeric_keys():
+    yc = yamlconfig.YAMLConfig()
+    yc.set_item('nodes.11.wg_private', 'key')
+    assert yc.cfg == {'nodes': {11: {'wg_private': 'key'}}}
+    assert yc.get_item('nodes.11.wg_private') == 'key'
+    assert yc.get_item('nodes.12.wg_private', 'default') == 'default'